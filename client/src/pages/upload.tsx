@@ -37,7 +37,7 @@ export default function Upload() {
   const { data: job, isLoading: isJobLoading } = useQuery<ProcessingJob>({
     queryKey: ["/api/jobs", jobId],
     enabled: !!jobId,
-    refetchInterval: jobId && !["completed", "error"].includes(
+    refetchInterval: jobId && !["completed", "error", "cancelled"].includes(
       queryClient.getQueryData<ProcessingJob>(["/api/jobs", jobId])?.status || ""
     ) ? 2000 : false,
   });
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+End-to-end processing benchmark
+Runs the full PowerPointProcessor pipeline on a synthetic deck against stub providers
+and compares per-stage wall time and memory with a stored baseline
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import platform
+import statistics
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+SERVER_DIR = BENCHMARKS_DIR.parent
+sys.path.append(str(SERVER_DIR))
+
+from benchmarks.synthetic_deck import build_deck
+from benchmarks.stub_providers import StubProviderServer
+
+DEFAULT_BASELINES = BENCHMARKS_DIR / "baselines.json"
+
+SCENARIOS = {
+    'small': {'slides': 5, 'pictures': 1, 'text_words': 40, 'notes_words': 30},
+    'medium': {'slides': 30, 'pictures': 2, 'text_words': 80, 'notes_words': 60},
+    'large': {'slides': 120, 'pictures': 3, 'text_words': 120, 'notes_words': 100},
+}
+
+def _run_job(deck_path: str, config: Dict[str, Any], work_root: str) -> Dict[str, Any]:
+    """Process one deck in a fresh interpreter, so peak RSS belongs to this run alone"""
+    sys.path.append(str(SERVER_DIR / "services"))
+    os.chdir(work_root)
+    from powerpoint_processor import PowerPointProcessor
+    
+    job_id = str(uuid.uuid4())
+    start = time.perf_counter()
+    processor = PowerPointProcessor(deck_path, job_id, config)
+    processor.process()
+    wall_seconds = time.perf_counter() - start
+    
+    snapshot = processor.metrics.snapshot()
+    snapshot['completed'] = (Path(work_root) / "outputs" / job_id / "metrics.json").exists()
+    snapshot['total_wall_seconds'] = round(wall_seconds, 3)
+    return snapshot
+
+def summarize(runs: List[Dict[str, Any]], slides: int) -> Dict[str, Any]:
+    """Median stage times over the repetitions, as seconds and slides per second"""
+    stages = {}
+    for name in runs[0]['stages']:
+        wall = statistics.median(run['stages'][name].get('wall_seconds', 0.0) for run in runs if name in run['stages'])
+        stages[name] = {
+            'wall_seconds': round(wall, 3),
+            'slides_per_second': round(slides / wall, 3) if wall > 0 else None,
+            'cpu_seconds': round(statistics.median(run['stages'][name].get('cpu_seconds', 0.0) for run in runs if name in run['stages']), 3),
+            'subprocess_cpu_seconds': round(statistics.median(run['stages'][name].get('subprocess_cpu_seconds', 0.0) for run in runs if name in run['stages']), 3),
+        }
+    
+    return {
+        'total_wall_seconds': round(statistics.median(run['total_wall_seconds'] for run in runs), 3),
+        'peak_rss_bytes': max(run['peak_rss_bytes'] for run in runs),
+        'stages': stages,
+    }
+
+def compare(summary: Dict[str, Any], baseline: Dict[str, Any], threshold: float, memory_threshold: float,
+            min_seconds: float) -> List[str]:
+    """Regressions against a baseline summary; small absolute changes are treated as noise"""
+    regressions = []
+    
+    def check(label: str, current: float, previous: float):
+        if previous and current > previous * (1 + threshold) and current - previous > min_seconds:
+            regressions.append(f"{label}: {previous:.3f}s -> {current:.3f}s (+{(current / previous - 1) * 100:.0f}%)")
+    
+    check('total', summary['total_wall_seconds'], baseline.get('total_wall_seconds'))
+    for name, stage in summary['stages'].items():
+        previous = baseline.get('stages', {}).get(name)
+        if previous:
+            check(name, stage['wall_seconds'], previous['wall_seconds'])
+    
+    previous_rss = baseline.get('peak_rss_bytes')
+    if previous_rss and summary['peak_rss_bytes'] > previous_rss * (1 + memory_threshold):
+        regressions.append(f"peak RSS: {previous_rss / 2**20:.0f} MiB -> {summary['peak_rss_bytes'] / 2**20:.0f} MiB")
+    return regressions
+
+def print_summary(name: str, summary: Dict[str, Any], baseline: Dict[str, Any] = None):
+    print(f"\nBenchmark {name}: {summary['total_wall_seconds']:.2f}s total, "
+          f"peak RSS {summary['peak_rss_bytes'] / 2**20:.0f} MiB")
+    print(f"  {'stage':<22} {'wall s':>9} {'slides/s':>9} {'cpu s':>8} {'subproc s':>10} {'baseline s':>11}")
+    for stage_name, stage in summary['stages'].items():
+        previous = ((baseline or {}).get('stages') or {}).get(stage_name)
+        previous_text = f"{previous['wall_seconds']:.3f}" if previous else '-'
+        print(f"  {stage_name:<22} {stage['wall_seconds']:>9.3f} {stage['slides_per_second'] or 0:>9.2f} "
+              f"{stage['cpu_seconds']:>8.3f} {stage['subprocess_cpu_seconds']:>10.3f} {previous_text:>11}")
+
+def load_baselines(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the processing pipeline end to end")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='small')
+    parser.add_argument('--name', help="Baseline name; defaults to the scenario")
+    parser.add_argument('--slides', type=int)
+    parser.add_argument('--pictures', type=int, help="Pictures per slide")
+    parser.add_argument('--text-words', type=int, help="Body words per slide")
+    parser.add_argument('--notes-words', type=int, help="Speaker note words per slide")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--llm-latency-ms', type=float, default=800)
+    parser.add_argument('--tts-latency-ms', type=float, default=400)
+    parser.add_argument('--jitter-ms', type=float, default=100)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of provider requests failing with HTTP 500")
+    parser.add_argument('--audio-seconds', type=float, default=5.0, help="Length of each stub narration clip")
+    parser.add_argument('--output-mode', choices=['mp4', 'hls'], default='mp4')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baselines', type=Path, default=DEFAULT_BASELINES)
+    parser.add_argument('--save-baseline', action='store_true', help="Store this result as the baseline")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed relative slowdown per stage")
+    parser.add_argument('--memory-threshold', type=float, default=0.2, help="Allowed relative growth of peak RSS")
+    parser.add_argument('--min-seconds', type=float, default=0.5, help="Slowdowns smaller than this are ignored")
+    parser.add_argument('--output', type=Path, help="Write the full results as JSON")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    deck_params = dict(SCENARIOS[args.scenario])
+    for key in deck_params:
+        if getattr(args, key) is not None:
+            deck_params[key] = getattr(args, key)
+    name = args.name or args.scenario
+    
+    with tempfile.TemporaryDirectory(prefix="pptx-benchmark-") as temp_dir:
+        temp_dir = Path(temp_dir)
+        deck_path = temp_dir / "deck.pptx"
+        deck = build_deck(deck_path, seed=args.seed, **deck_params)
+        
+        stub = StubProviderServer(
+            llm_latency_ms=args.llm_latency_ms,
+            tts_latency_ms=args.tts_latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            audio_seconds=args.audio_seconds,
+            seed=args.seed,
+        ).start()
+        
+        # Inherited by the job processes
+        os.environ['OPENAI_BASE_URL'] = f"{stub.url}/v1"
+        os.environ['JOB_STATUS_URL'] = stub.url
+        os.environ['JOB_CHECKPOINT_DIR'] = str(temp_dir / "jobs")
+        
+        config = {
+            'openai_api_key': 'benchmark',
+            'tts_provider': 'openai',
+            'voice_settings': {'voice': 'alloy'},
+            'output_mode': args.output_mode,
+            # Repetitions must not be served from the previous run's segments
+            'segment_cache': False,
+        }
+        
+        runs = []
+        context = multiprocessing.get_context('spawn')
+        try:
+            for repetition in range(args.repeat):
+                work_root = temp_dir / f"run_{repetition}"
+                work_root.mkdir()
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    run = executor.submit(_run_job, str(deck_path), config, str(work_root)).result()
+                if not run['completed']:
+                    raise Exception(f"Benchmark job failed in repetition {repetition + 1}; see the output above")
+                print(f"Repetition {repetition + 1}/{args.repeat}: {run['total_wall_seconds']:.2f}s")
+                runs.append(run)
+        finally:
+            stub.stop()
+    
+    summary = summarize(runs, deck['slides'])
+    baselines = load_baselines(args.baselines)
+    baseline = baselines.get(name)
+    print_summary(name, summary, baseline)
+    
+    results = {
+        'name': name,
+        'recorded_at': time.time(),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'deck': deck,
+        'providers': {
+            'llm_latency_ms': args.llm_latency_ms,
+            'tts_latency_ms': args.tts_latency_ms,
+            'jitter_ms': args.jitter_ms,
+            'error_rate': args.error_rate,
+            'requests': stub.stats,
+        },
+        'summary': summary,
+        'runs': runs,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    
+    if args.save_baseline:
+        baselines[name] = {key: results[key] for key in ('recorded_at', 'host', 'deck', 'providers')}
+        baselines[name].update(summary)
+        with open(args.baselines, 'w') as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Saved baseline {name} to {args.baselines}")
+        return
+    
+    if not baseline:
+        print(f"No baseline named {name} in {args.baselines}; run with --save-baseline to record one")
+        return
+    
+    regressions = compare(summary, baseline, args.threshold, args.memory_threshold, args.min_seconds)
+    if regressions:
+        print("\nRegressions against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nNo regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Processor startup benchmark
+Measures the time from launching a processor to its first stage, and which heavy modules it loaded by then
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, Any
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+SERVER_DIR = BENCHMARKS_DIR.parent
+sys.path.append(str(SERVER_DIR))
+
+from benchmarks.synthetic_deck import build_deck
+
+DEFAULT_BUDGET_MS = 500
+
+# Only the stage that uses one of these should import it
+DEFERRED_MODULES = ('openai', 'google.cloud.texttospeech', 'requests', 'pptx', 'PIL', 'pytesseract', 'lxml')
+
+def _child(deck_path: str, launched_at: float):
+    """Import and construct a processor as a spawned job would, then report timings"""
+    sys.path.append(str(SERVER_DIR / "services"))
+    imported_at = time.time()
+    from powerpoint_processor import PowerPointProcessor
+    import_seconds = time.time() - imported_at
+    
+    constructed_at = time.time()
+    config = {'openai_api_key': 'benchmark', 'tts_provider': 'openai', 'voice_settings': {}}
+    PowerPointProcessor(deck_path, str(uuid.uuid4()), config)
+    ready_at = time.time()
+    
+    print(json.dumps({
+        'time_to_first_stage_seconds': ready_at - launched_at,
+        'import_seconds': import_seconds,
+        'init_seconds': ready_at - constructed_at,
+        'loaded_modules': [module for module in DEFERRED_MODULES if module in sys.modules],
+    }))
+
+def measure(deck_path: Path, work_dir: Path) -> Dict[str, Any]:
+    launched_at = time.time()
+    result = subprocess.run(
+        [sys.executable, __file__, '--child', str(deck_path), str(launched_at)],
+        cwd=work_dir, capture_output=True, text=True,
+        env=dict(os.environ, JOB_CHECKPOINT_DIR=str(work_dir / "jobs"))
+    )
+    if result.returncode != 0:
+        raise Exception(f"Startup measurement failed: {result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark processor startup")
+    parser.add_argument('--child', nargs=2, metavar=('DECK', 'LAUNCHED_AT'), help=argparse.SUPPRESS)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help="Fail when the median time to the first stage exceeds this")
+    args = parser.parse_args()
+    
+    if args.child:
+        _child(args.child[0], float(args.child[1]))
+        return
+    
+    with tempfile.TemporaryDirectory(prefix="pptx-startup-") as temp_dir:
+        temp_dir = Path(temp_dir)
+        deck_path = temp_dir / "deck.pptx"
+        build_deck(deck_path, slides=3)
+        runs = [measure(deck_path, temp_dir) for _ in range(args.repeat)]
+    
+    median = {
+        key: statistics.median(run[key] for run in runs) * 1000
+        for key in ('time_to_first_stage_seconds', 'import_seconds', 'init_seconds')
+    }
+    loaded = sorted({module for run in runs for module in run['loaded_modules']})
+    print(f"Time to first stage: {median['time_to_first_stage_seconds']:.0f} ms "
+          f"(imports {median['import_seconds']:.0f} ms, constructor {median['init_seconds']:.0f} ms, "
+          f"median of {args.repeat})")
+    print(f"Deferred modules loaded before the first stage: {', '.join(loaded) or 'none'}")
+    
+    failures = []
+    if median['time_to_first_stage_seconds'] > args.budget_ms:
+        failures.append(f"time to first stage exceeds the {args.budget_ms:.0f} ms budget")
+    if loaded:
+        failures.append(f"{', '.join(loaded)} should only be imported by the stage that uses it")
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Local stand-ins for the LLM, TTS and job status APIs
+Answers like the real services after a configurable latency, with optional injected errors
+"""
+
+import json
+import time
+import random
+import shutil
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any
+
+STUB_TRANSCRIPT = (
+    "In this part of the module we look at how the process works in practice. "
+    "First, we review the key steps and who is responsible for each of them. "
+    "Next, we see how the results are checked, recorded and reported. "
+    "Finally, we summarise what you should remember before moving on."
+)
+
+def silent_mp3(seconds: float) -> bytes:
+    """MP3 of silence, so the rest of the pipeline gets real audio to work with"""
+    if not shutil.which('ffmpeg'):
+        raise Exception("ffmpeg is required to generate stub TTS audio")
+    result = subprocess.run([
+        'ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'anullsrc=r=24000:cl=mono',
+        '-t', str(seconds), '-c:a', 'libmp3lame', '-b:a', '48k', '-f', 'mp3', 'pipe:1'
+    ], capture_output=True, check=True)
+    return result.stdout
+
+class StubProviderServer:
+    """OpenAI-compatible chat and speech endpoints plus the job status PATCH route
+    
+    Point the processor at it with OPENAI_BASE_URL=<url>/v1 and JOB_STATUS_URL=<url>.
+    Provider requests wait latency_ms (plus up to jitter_ms) and fail with HTTP 500
+    at error_rate, which exercises the client's retries. Status updates always succeed.
+    """
+    
+    def __init__(self, llm_latency_ms: float = 800, tts_latency_ms: float = 400, jitter_ms: float = 100,
+                 error_rate: float = 0.0, audio_seconds: float = 5.0, seed: int = 0):
+        self.llm_latency = llm_latency_ms / 1000
+        self.tts_latency = tts_latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.audio = silent_mp3(audio_seconds)
+        self.stats = {'chat': 0, 'speech': 0, 'status': 0, 'injected_errors': 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if self.path.endswith('/chat/completions'):
+                    stub._handle(self, 'chat', stub.llm_latency, body)
+                elif self.path.endswith('/audio/speech'):
+                    stub._handle(self, 'speech', stub.tts_latency, body)
+                else:
+                    self.send_error(404)
+            
+            def do_PATCH(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                stub._count('status')
+                stub._respond(self, 200, b'{}', 'application/json')
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = None
+    
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stub-providers", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+    
+    def _handle(self, handler, kind: str, latency: float, body: bytes):
+        self._count(kind)
+        with self._lock:
+            delay = max(0.0, latency + self._rng.uniform(-self.jitter, self.jitter))
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.stats['injected_errors'] += 1
+        time.sleep(delay)
+        
+        if fail:
+            self._respond(handler, 500, b'{"error": {"message": "Injected stub error", "type": "server_error"}}', 'application/json')
+        elif kind == 'chat':
+            self._respond(handler, 200, json.dumps(self._chat_response(body)).encode(), 'application/json')
+        else:
+            self._respond(handler, 200, self.audio, 'audio/mpeg')
+    
+    def _chat_response(self, body: bytes) -> Dict[str, Any]:
+        request = json.loads(body or b'{}')
+        prompt_tokens = len(json.dumps(request.get('messages', []))) // 4
+        return {
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': STUB_TRANSCRIPT},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(STUB_TRANSCRIPT) // 4,
+                'total_tokens': prompt_tokens + len(STUB_TRANSCRIPT) // 4,
+            },
+        }
+    
+    def _respond(self, handler, status: int, payload: bytes, content_type: str):
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
@@ -0,0 +1,79 @@
+"""
+Synthetic PowerPoint decks for benchmarking
+Builds reproducible decks of a given size, picture count and text density
+"""
+
+import io
+import random
+from pathlib import Path
+from typing import Dict, Any
+
+WORDS = (
+    "learning module process quality customer safety policy review data system "
+    "training compliance report team project risk control audit standard practice "
+    "objective outcome measure performance improvement workflow approval security "
+    "privacy incident response record evidence requirement guideline principle"
+).split()
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = ' '.join(rng.choice(WORDS) for _ in range(max(1, words)))
+    return text[0].upper() + text[1:] + '.'
+
+def _picture(rng: random.Random, width: int = 800, height: int = 450) -> bytes:
+    """A PNG with printed text, so OCR has real work to do"""
+    from PIL import Image, ImageDraw
+    
+    image = Image.new('RGB', (width, height), (rng.randint(200, 255), rng.randint(200, 255), rng.randint(200, 255)))
+    draw = ImageDraw.Draw(image)
+    for line in range(6):
+        draw.text((20, 20 + line * 60), _sentence(rng, 6), fill='black')
+    draw.rectangle([width // 2, height // 2, width - 20, height - 20], outline='navy', width=4)
+    
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def build_deck(path: Path, slides: int = 10, pictures: int = 1, text_words: int = 60,
+               notes_words: int = 40, seed: int = 0) -> Dict[str, Any]:
+    """Write a deck to path and describe what it contains
+    
+    Every slide gets a title, a bulleted body of about text_words words,
+    speaker notes of notes_words words and the given number of pictures.
+    The same arguments always produce the same deck.
+    """
+    from pptx import Presentation
+    from pptx.util import Inches
+    
+    rng = random.Random(seed)
+    prs = Presentation()
+    layout = prs.slide_layouts[1]  # Title and content
+    
+    for slide_number in range(1, slides + 1):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Section {slide_number}: {_sentence(rng, 4)[:-1]}"
+        
+        body = slide.placeholders[1].text_frame
+        bullets = max(1, text_words // 15)
+        body.text = _sentence(rng, text_words // bullets)
+        for _ in range(bullets - 1):
+            body.add_paragraph().text = _sentence(rng, text_words // bullets)
+        
+        for index in range(pictures):
+            slide.shapes.add_picture(
+                io.BytesIO(_picture(rng)),
+                Inches(0.5 + index * 3), Inches(5), width=Inches(2.8)
+            )
+        
+        if notes_words:
+            slide.notes_slide.notes_text_frame.text = _sentence(rng, notes_words)
+    
+    path = Path(path)
+    prs.save(str(path))
+    return {
+        'slides': slides,
+        'pictures_per_slide': pictures,
+        'text_words': text_words,
+        'notes_words': notes_words,
+        'seed': seed,
+        'bytes': path.stat().st_size,
+    }
@@ -3,9 +3,80 @@ import { createServer, type Server } from "http";
 import { storage } from "./storage";
 import multer from "multer";
 import path from "path";
-import { uploadRequestSchema } from "@shared/schema";
-import { spawn } from "child_process";
+import { uploadRequestSchema, resumeRequestSchema } from "@shared/schema";
+import { spawn, execFile, type ChildProcess } from "child_process";
+import { promisify } from "util";
 import fs from "fs";
+import net from "net";
+
+const execFileAsync = promisify(execFile);
+
+// Reads only the ZIP directory and slide XML, so it is cheap enough to run inline
+async function preflightDeck(filePath: string, ttsProvider: string): Promise<any> {
+  const preflightScript = path.join(process.cwd(), 'server', 'utils', 'preflight.py');
+  try {
+    const { stdout } = await execFileAsync('python3', [preflightScript, filePath, ttsProvider], { timeout: 15000 });
+    return JSON.parse(stdout);
+  } catch (error: any) {
+    // preflight.py reports unreadable decks as JSON on stdout with a non-zero exit code
+    if (error?.stdout) {
+      try {
+        return JSON.parse(error.stdout);
+      } catch {}
+    }
+    return { error: error instanceof Error ? error.message : "Preflight failed" };
+  }
+}
+
+// Jobs go to the long-running worker (server/services/processor_daemon.py) when it is up
+const processorSocket = process.env.PROCESSOR_SOCKET || path.join(process.cwd(), 'cache', 'processor.sock');
+const checkpointDir = process.env.JOB_CHECKPOINT_DIR || path.join(process.cwd(), 'cache', 'jobs');
+
+function submitToDaemon(request: Record<string, any>): Promise<any> {
+  return new Promise((resolve, reject) => {
+    const socket = net.createConnection(processorSocket);
+    let response = '';
+    socket.setTimeout(5000);
+    socket.on('connect', () => {
+      socket.write(JSON.stringify(request) + '\n');
+    });
+    socket.on('data', (chunk) => { response += chunk.toString(); });
+    socket.on('end', () => {
+      try {
+        const result = JSON.parse(response);
+        result.error ? reject(new Error(result.error)) : resolve(result);
+      } catch (error) {
+        reject(error);
+      }
+    });
+    socket.on('timeout', () => socket.destroy(new Error('Processor daemon did not respond')));
+    socket.on('error', reject);
+  });
+}
+
+// One-off processors started by this server, so they can be cancelled with SIGTERM
+const runningProcessors = new Map<string, ChildProcess>();
+
+function spawnProcessor(jobId: string, args: string[]) {
+  const pythonScript = path.join(process.cwd(), 'server', 'services', 'powerpoint_processor.py');
+  const pythonProcess = spawn('python3', [
+    pythonScript,
+    ...args
+  ], {
+    detached: true,
+    stdio: 'pipe'
+  });
+
+  runningProcessors.set(jobId, pythonProcess);
+  pythonProcess.on('exit', () => {
+    if (runningProcessors.get(jobId) === pythonProcess) {
+      runningProcessors.delete(jobId);
+    }
+  });
+  pythonProcess.unref();
+}
+
+const finishedStatuses = ['completed', 'error', 'cancelled'];
 
 const upload = multer({
   dest: 'uploads/',
@@ -36,6 +107,14 @@ export async function registerRoutes(app: Express): Promise<Server> {
         elevenlabs_api_key: req.body.elevenlabs_api_key,
         tts_provider: req.body.tts_provider,
         voice_settings: req.body.voice_settings ? JSON.parse(req.body.voice_settings) : undefined,
+        render_profile: req.body.render_profile || undefined,
+        output_mode: req.body.output_mode || undefined,
+        renditions: req.body.renditions ? JSON.parse(req.body.renditions) : undefined,
+        audio_bundle: req.body.audio_bundle || undefined,
+        priority: req.body.priority || undefined,
+        previous_job_id: req.body.previous_job_id || undefined,
+        profiling: req.body.profiling || undefined,
+        shard_size: req.body.shard_size ? Number(req.body.shard_size) : undefined,
       });
 
       if (!validationResult.success) {
@@ -51,6 +130,17 @@ export async function registerRoutes(app: Express): Promise<Server> {
 
       const uploadData = validationResult.data;
 
+      const preflight = await preflightDeck(req.file.path, uploadData.tts_provider);
+      if (preflight.error || !preflight.slide_count) {
+        if (fs.existsSync(req.file.path)) {
+          fs.unlinkSync(req.file.path);
+        }
+        return res.status(400).json({ 
+          error: "Invalid presentation", 
+          details: preflight.error || "The presentation has no slides" 
+        });
+      }
+
       // Create processing job
       const job = await storage.createJob({
         filename: req.file.originalname,
@@ -58,21 +148,23 @@ export async function registerRoutes(app: Express): Promise<Server> {
         progress: 0,
       });
 
-      // Start Python processing script
-      const pythonScript = path.join(process.cwd(), 'server', 'services', 'powerpoint_processor.py');
-      const pythonProcess = spawn('python3', [
-        pythonScript,
-        req.file.path,
-        job.id,
-        JSON.stringify(uploadData)
-      ], {
-        detached: true,
-        stdio: 'pipe'
-      });
-
-      pythonProcess.unref();
+      // Hand the job to the worker daemon, or start a one-off Python process if it is not running
+      const filePath = path.resolve(req.file.path);
+      try {
+        await submitToDaemon({ command: 'submit', file_path: filePath, job_id: job.id, config: uploadData });
+      } catch (error: any) {
+        if (error?.code !== 'ENOENT' && error?.code !== 'ECONNREFUSED') {
+          // The daemon may already have the job, so starting a second process could run it twice
+          await storage.updateJob(job.id, {
+            status: 'error',
+            error_message: `Failed to queue job: ${error instanceof Error ? error.message : error}`,
+          });
+          throw error;
+        }
+        spawnProcessor(job.id, [filePath, job.id, JSON.stringify(uploadData)]);
+      }
 
-      res.json({ job_id: job.id });
+      res.json({ job_id: job.id, preflight });
     } catch (error) {
       console.error('Upload error:', error);
       
@@ -114,10 +206,101 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // Resume a failed or cancelled job from its checkpoint. API keys are never checkpointed, so they are sent again.
+  app.post("/api/jobs/:id/resume", async (req, res) => {
+    try {
+      const job = await storage.getJob(req.params.id);
+      if (!job) {
+        return res.status(404).json({ error: "Job not found" });
+      }
+      if (job.status !== 'error' && job.status !== 'cancelled') {
+        return res.status(409).json({ error: "Only failed or cancelled jobs can be resumed" });
+      }
+      if (!fs.existsSync(path.join(checkpointDir, job.id, 'manifest.json'))) {
+        return res.status(404).json({ error: "No checkpoint left for this job" });
+      }
+
+      const validationResult = resumeRequestSchema.safeParse(req.body);
+      if (!validationResult.success) {
+        return res.status(400).json({ 
+          error: "Invalid request data", 
+          details: validationResult.error.issues 
+        });
+      }
+      const keys = validationResult.data;
+
+      // Set before handing over so it cannot overwrite the first update from the processor
+      await storage.updateJob(job.id, { status: 'extracting', error_message: '' });
+      try {
+        await submitToDaemon({ command: 'resume', job_id: job.id, config: keys });
+      } catch (error: any) {
+        if (error?.code !== 'ENOENT' && error?.code !== 'ECONNREFUSED') {
+          await storage.updateJob(job.id, {
+            status: 'error',
+            error_message: `Failed to resume job: ${error instanceof Error ? error.message : error}`,
+          });
+          throw error;
+        }
+        spawnProcessor(job.id, ['--resume', job.id, JSON.stringify(keys)]);
+      }
+
+      res.json({ job_id: job.id });
+    } catch (error) {
+      console.error('Resume job error:', error);
+      res.status(500).json({ 
+        error: error instanceof Error ? error.message : "Failed to resume job" 
+      });
+    }
+  });
+
+  // Cancel a queued or running job. Its checkpoint is kept, so it can still be resumed.
+  app.post("/api/jobs/:id/cancel", async (req, res) => {
+    try {
+      const job = await storage.getJob(req.params.id);
+      if (!job) {
+        return res.status(404).json({ error: "Job not found" });
+      }
+      if (finishedStatuses.includes(job.status)) {
+        return res.status(409).json({ error: `Job has already finished with status ${job.status}` });
+      }
+
+      // Marked first, so progress updates still in flight from the processor are rejected
+      const updatedJob = await storage.updateJob(job.id, { status: 'cancelled', error_message: 'Processing was cancelled' });
+
+      try {
+        await submitToDaemon({ command: 'cancel', job_id: job.id });
+      } catch (error: any) {
+        if (error?.code !== 'ENOENT' && error?.code !== 'ECONNREFUSED') {
+          console.error('Failed to cancel job in processor daemon:', error);
+        }
+      }
+      runningProcessors.get(job.id)?.kill('SIGTERM');
+
+      // Reaches processors this server did not start, e.g. after it restarted
+      const jobCheckpointDir = path.join(checkpointDir, job.id);
+      if (fs.existsSync(jobCheckpointDir)) {
+        fs.writeFileSync(path.join(jobCheckpointDir, 'cancel'), new Date().toISOString());
+      }
+
+      res.json(updatedJob);
+    } catch (error) {
+      console.error('Cancel job error:', error);
+      res.status(500).json({ 
+        error: error instanceof Error ? error.message : "Failed to cancel job" 
+      });
+    }
+  });
+
   // Update job status (PATCH endpoint for Python service)
   app.patch("/api/jobs/:id", async (req, res) => {
     try {
       const { status, progress, error_message, output_files } = req.body;
+
+      // A cancelled job stays cancelled, whatever its processor still reports
+      const job = await storage.getJob(req.params.id);
+      if (job?.status === 'cancelled') {
+        return res.status(409).json({ error: "Job was cancelled" });
+      }
       
       const updates: any = {};
       if (status !== undefined) updates.status = status;
@@ -181,8 +364,48 @@ export async function registerRoutes(app: Express): Promise<Server> {
           contentType = 'application/zip';
           filename = 'audio_files.zip';
           break;
+        case 'audio_m4a':
+          filePath = job.output_files.audio_m4a;
+          contentType = 'audio/mp4';
+          filename = 'narration.m4a';
+          break;
         default:
-          return res.status(400).json({ error: "Invalid file type" });
+          // Extra video renditions, e.g. video_720p
+          if (!/^video_\d+p$/.test(fileType)) {
+            return res.status(400).json({ error: "Invalid file type" });
+          }
+          filePath = job.output_files[fileType];
+          contentType = 'video/mp4';
+          filename = `learning_module_${fileType.slice('video_'.length)}.mp4`;
+      }
+
+      // Lazily bundled audio: build the ZIP from the published clips while sending it
+      if (fileType === 'audio_zip' && (!filePath || !fs.existsSync(filePath)) && job.output_files.audio_dir) {
+        const bundleScript = path.join(process.cwd(), 'server', 'utils', 'audio_bundle.py');
+        const bundleProcess = spawn('python3', [bundleScript, path.dirname(job.output_files.audio_dir)]);
+
+        res.setHeader('Content-Type', contentType);
+        res.setHeader('Content-Disposition', `attachment; filename="${filename}"`);
+
+        bundleProcess.stderr.on('data', (data) => console.error(`Audio bundle: ${data}`));
+        bundleProcess.on('error', (error) => {
+          console.error('Audio bundle error:', error);
+          if (!res.headersSent) {
+            res.status(500).json({ error: "Failed to build audio bundle" });
+          } else {
+            res.destroy(error);
+          }
+        });
+        bundleProcess.on('close', (code) => {
+          if (code === 0) return;
+          if (!res.headersSent) {
+            res.status(500).json({ error: "Failed to build audio bundle" });
+          } else {
+            res.destroy(new Error(`Audio bundle exited with code ${code}`));
+          }
+        });
+        bundleProcess.stdout.pipe(res);
+        return;
       }
 
       if (!filePath || !fs.existsSync(filePath)) {
@@ -202,6 +425,41 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // Progressive HLS playback: playlist and chunks are served while the job is still running
+  app.get("/api/stream/:jobId/:fileName", async (req, res) => {
+    try {
+      const { jobId, fileName } = req.params;
+      const job = await storage.getJob(jobId);
+
+      if (!job || !job.output_files?.hls_playlist) {
+        return res.status(404).json({ error: "Stream not found" });
+      }
+
+      // Only serve plain file names from the job's HLS directory
+      const hlsDir = path.dirname(job.output_files.hls_playlist);
+      const filePath = path.join(hlsDir, path.basename(fileName));
+
+      if (!fs.existsSync(filePath)) {
+        return res.status(404).json({ error: "File not found" });
+      }
+
+      if (filePath.endsWith('.m3u8')) {
+        res.setHeader('Content-Type', 'application/vnd.apple.mpegurl');
+        // The playlist grows as slides finish, so players must always refetch it
+        res.setHeader('Cache-Control', 'no-cache');
+      } else {
+        res.setHeader('Content-Type', 'video/mp2t');
+      }
+
+      fs.createReadStream(filePath).pipe(res);
+    } catch (error) {
+      console.error('Stream error:', error);
+      res.status(500).json({ 
+        error: error instanceof Error ? error.message : "Stream failed" 
+      });
+    }
+  });
+
   const httpServer = createServer(app);
   return httpServer;
 }
@@ -4,27 +4,49 @@ Supports OpenAI TTS, Google Cloud TTS, and ElevenLabs
 """
 
 import os
+import sys
 import json
+import time
 from pathlib import Path
 from typing import Dict, Any, Optional
-import requests
 import tempfile
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.clients import openai_client, http_session
+from utils.scheduler import provider_slot
+from utils.cancellation import call_cancellable
+
 class AudioSynthesizer:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], metrics=None, cancellation=None):
         self.config = config
+        self.metrics = metrics
+        self.cancellation = cancellation
         self.provider = config['tts_provider']
         
-        if self.provider == 'openai':
-            from openai import OpenAI
-            self.openai_client = OpenAI(api_key=config['openai_api_key'])
-        elif self.provider == 'google':
-            self.setup_google_tts(config.get('google_tts_api_key'))
+        # SDK clients are created by the first synthesis, so jobs whose audio is reused never load them
+        self._openai_client = None
+        self._google_client = None
+        if self.provider == 'google':
+            if not config.get('google_tts_api_key'):
+                raise ValueError("Google Cloud TTS API key is required")
         elif self.provider == 'elevenlabs':
             self.elevenlabs_api_key = config.get('elevenlabs_api_key')
             if not self.elevenlabs_api_key:
                 raise ValueError("ElevenLabs API key is required")
     
+    @property
+    def openai_client(self):
+        if self._openai_client is None:
+            self._openai_client = openai_client(self.config['openai_api_key'])
+        return self._openai_client
+    
+    @property
+    def google_client(self):
+        if self._google_client is None:
+            self.setup_google_tts(self.config.get('google_tts_api_key'))
+        return self._google_client
+    
     def setup_google_tts(self, api_key: Optional[str]):
         """Setup Google Cloud TTS client"""
         if not api_key:
@@ -32,9 +54,8 @@ class AudioSynthesizer:
         
         try:
             from google.cloud import texttospeech
-            # Set up authentication
-            os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = api_key
-            self.google_client = texttospeech.TextToSpeechClient()
+            # Load credentials per client; setting GOOGLE_APPLICATION_CREDENTIALS would leak across concurrent jobs
+            self._google_client = texttospeech.TextToSpeechClient.from_service_account_file(api_key)
         except ImportError:
             raise Exception("Google Cloud TTS library not installed. Install with: pip install google-cloud-texttospeech")
     
@@ -43,14 +64,22 @@ class AudioSynthesizer:
         
         output_path = output_dir / filename
         
-        if self.provider == 'openai':
-            return self._synthesize_openai(text, output_path)
-        elif self.provider == 'google':
-            return self._synthesize_google(text, output_path)
-        elif self.provider == 'elevenlabs':
-            return self._synthesize_elevenlabs(text, output_path)
-        else:
-            raise ValueError(f"Unsupported TTS provider: {self.provider}")
+        start = time.perf_counter()
+        failed = True
+        try:
+            if self.provider == 'openai':
+                result = self._synthesize_openai(text, output_path)
+            elif self.provider == 'google':
+                result = self._synthesize_google(text, output_path)
+            elif self.provider == 'elevenlabs':
+                result = self._synthesize_elevenlabs(text, output_path)
+            else:
+                raise ValueError(f"Unsupported TTS provider: {self.provider}")
+            failed = False
+            return result
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_api_call(self.provider, 'tts', time.perf_counter() - start, error=failed, characters=len(text))
     
     def _synthesize_openai(self, text: str, output_path: Path) -> str:
         """Synthesize using OpenAI TTS with natural pauses and pacing"""
@@ -62,13 +91,16 @@ class AudioSynthesizer:
             voice_settings = self.config.get('voice_settings', {})
             voice = voice_settings.get('voice', 'alloy')
             
-            response = self.openai_client.audio.speech.create(
-                model="tts-1-hd",  # High quality model
-                voice=voice,       # Professional, clear voice
-                input=enhanced_text,
-                response_format="mp3",
-                speed=0.9          # Slightly slower for educational content
-            )
+            with provider_slot('openai'):
+                response = call_cancellable(
+                    self.cancellation,
+                    self.openai_client.audio.speech.create,
+                    model="tts-1-hd",  # High quality model
+                    voice=voice,       # Professional, clear voice
+                    input=enhanced_text,
+                    response_format="mp3",
+                    speed=0.9          # Slightly slower for educational content
+                )
             
             with open(output_path, 'wb') as f:
                 f.write(response.content)
@@ -123,11 +155,14 @@ class AudioSynthesizer:
                 pitch=0.0
             )
             
-            response = self.google_client.synthesize_speech(
-                input=synthesis_input,
-                voice=voice,
-                audio_config=audio_config
-            )
+            with provider_slot('google'):
+                response = call_cancellable(
+                    self.cancellation,
+                    self.google_client.synthesize_speech,
+                    input=synthesis_input,
+                    voice=voice,
+                    audio_config=audio_config
+                )
             
             with open(output_path, 'wb') as f:
                 f.write(response.audio_content)
@@ -164,7 +199,8 @@ class AudioSynthesizer:
                 }
             }
             
-            response = requests.post(url, json=data, headers=headers)
+            with provider_slot('elevenlabs'):
+                response = call_cancellable(self.cancellation, http_session().post, url, json=data, headers=headers)
             
             if response.status_code != 200:
                 raise Exception(f"ElevenLabs API error: {response.status_code} - {response.text}")
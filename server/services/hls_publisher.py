@@ -0,0 +1,98 @@
+"""
+Progressive HLS publishing for rendered slide segments
+Appends each finished slide to a live playlist so playback can start early
+"""
+
+import os
+import sys
+import math
+import subprocess
+from pathlib import Path
+from typing import List
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.metrics import run_subprocess
+
+class HlsPublisher:
+    def __init__(self, output_dir: Path, chunk_seconds: float, metrics=None, cancellation=None):
+        self.output_dir = Path(output_dir)
+        self.metrics = metrics
+        self.cancellation = cancellation
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.playlist_path = self.output_dir / "playlist.m3u8"
+        self.chunk_seconds = chunk_seconds
+        # Chunks are cut on keyframes, so allow a little slack over the requested length
+        self.target_duration = int(math.ceil(chunk_seconds)) + 1
+        self.entries: List[str] = []
+        self.finished = False
+        
+        # Publish an empty live playlist right away so players can start polling it
+        self._write_playlist()
+    
+    def add_segment(self, segment_file: str, slide_num: int):
+        """Remux one slide segment into HLS chunks and append them to the playlist"""
+        
+        slide_playlist = self.output_dir / f"slide_{slide_num:03d}.m3u8"
+        
+        try:
+            # Stream copy only: the segment is already encoded, we just cut it at keyframes
+            cmd = [
+                "ffmpeg",
+                "-y",
+                "-i", segment_file,
+                "-c", "copy",
+                "-f", "hls",
+                "-hls_time", str(self.chunk_seconds),
+                "-hls_playlist_type", "vod",
+                "-hls_segment_filename", str(self.output_dir / f"slide_{slide_num:03d}_%03d.ts"),
+                str(slide_playlist)
+            ]
+            
+            result = run_subprocess(self.metrics, 'ffmpeg_hls', cmd, cancellation=self.cancellation, capture_output=True, text=True, timeout=120)
+            
+            if result.returncode != 0:
+                raise Exception(f"HLS remux failed for slide {slide_num}: {result.stderr}")
+            
+            # Each slide restarts its timestamps, so mark the boundary for the player
+            if self.entries:
+                self.entries.append("#EXT-X-DISCONTINUITY")
+            
+            with open(slide_playlist, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if line.startswith("#EXTINF") or (line and not line.startswith("#")):
+                        self.entries.append(line)
+            
+            slide_playlist.unlink()
+            self._write_playlist()
+        
+        except subprocess.TimeoutExpired:
+            raise Exception(f"HLS remux timed out for slide {slide_num}")
+        except FileNotFoundError:
+            raise Exception("FFmpeg not found. Please install FFmpeg.")
+    
+    def finalize(self):
+        """Mark the playlist complete so players stop polling for new slides"""
+        
+        self.finished = True
+        self._write_playlist()
+    
+    def _write_playlist(self):
+        """Rewrite the playlist atomically so readers never see a half-written file"""
+        
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{self.target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+        ]
+        lines.extend(self.entries)
+        if self.finished:
+            lines.append("#EXT-X-ENDLIST")
+        
+        temp_path = self.playlist_path.with_suffix(".m3u8.tmp")
+        with open(temp_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.playlist_path)
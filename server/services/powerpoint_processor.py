@@ -8,62 +8,147 @@ import sys
 import json
 import os
 import time
+import signal
 import traceback
-import tempfile
+import threading
+import contextlib
+import subprocess
+import hashlib
 import shutil
 from pathlib import Path
+from functools import cached_property
 from typing import Dict, Any, List
-import requests
 
 # Import from utils directory
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from transcript_generator import TranscriptGenerator
-from audio_synthesizer import AudioSynthesizer
-from video_renderer import VideoRenderer
 from utils.file_manager import FileManager
+from utils.audio_bundle import write_audio_bundle, published_audio_name, AUDIO_DIR_NAME
+from utils.blob_store import BlobStore, PUBLISHED_MARKER
+from utils.slide_records import SlideRecordList, memory_limit_bytes
+from utils.status_reporter import StatusReporter
+from utils.checkpoint import JobCheckpoint, prune_checkpoints
+from utils.metrics import JobMetrics, HOST_METRICS
+from utils.profiling import JobProfiler
+from utils.cancellation import CancellationToken, JobCancelled
+from utils.sharding import ShardSet, deck_slide_count, shard_worker_count
+from utils.work_queue import open_work_queue
+from utils.scratch import ScratchSpace, prune_hot_dirs, HOT_BYTES_PER_SLIDE
+from utils.fingerprint import PreviousJob, slide_fingerprint, narration_fingerprint, write_fingerprints, FINGERPRINTS_NAME
+
+SHARD_POLL_INTERVAL = 2.0
+SHARD_STOP_TIMEOUT = 30.0
+# Intermediates nothing reads once the stage has finished, freed as soon as it does
+SCRATCH_RELEASES = {
+    'extract_content': ["ocr_images"],
+    'generate_transcripts': ["slide_images_for_ai"],
+    'render_segments': ["slide_images"],
+    'render_video': ["render"],
+}
 
 class PowerPointProcessor:
-    def __init__(self, file_path: str, job_id: str, config: Dict[str, Any]):
-        self.file_path = file_path
+    # A shard of a sharded job processes a slice of the deck starting after this many slides
+    slide_offset = 0
+    # Only the process that owns the whole deck converts it to the reference PDF
+    reference_pdf = True
+    
+    def __init__(self, file_path: str, job_id: str, config: Dict[str, Any], resume: bool = False,
+                 cancellation: CancellationToken = None, checkpoint: JobCheckpoint = None):
         self.job_id = job_id
-        self.config = config
-        self.work_dir = Path(tempfile.mkdtemp(prefix=f"ppt_job_{job_id}_"))
-        self.file_manager = FileManager(self.work_dir)
+        self.cancellation = cancellation or CancellationToken(job_id)
         
-        # Initialize services
-        self.transcript_generator = TranscriptGenerator(config['openai_api_key'])
-        self.audio_synthesizer = AudioSynthesizer(config)
-        self.video_renderer = VideoRenderer()
+        # Work happens in a durable checkpoint directory so an interrupted job can be resumed
+        self.checkpoint = checkpoint or JobCheckpoint(job_id)
+        if resume:
+            manifest = self.checkpoint.load()
+            file_path = manifest['file_path']
+            config = {**manifest['config'], **config}
+            # A cancelled job can be resumed; its old cancellation request no longer applies
+            self.checkpoint.cancel_path.unlink(missing_ok=True)
+        else:
+            self.checkpoint.create(file_path, config)
         
-        self.slides_data = []
-        self.transcripts = []
-        self.audio_files = []
+        self.file_path = file_path
+        self.config = config
+        self.work_dir = self.checkpoint.work_dir
+        self.outputs_dir = Path("outputs") / job_id
+        self.blob_store = BlobStore(self.outputs_dir.parent)
+        # Unchanged slides reuse the OCR text, narration and audio of the job this deck revises
+        self.previous_job = PreviousJob.load(self.outputs_dir.parent, config.get('previous_job_id'))
+        self.reuse_audio = bool(self.previous_job) and self.previous_job.narration == narration_fingerprint(config)
+        self.output_mode = config.get('output_mode', 'mp4')
+        # Large decks are split into slide ranges that worker processes handle in parallel
+        self.shard_size = self._shard_size()
+        self.shard_set = ShardSet(self.checkpoint.directory / "shards") if self.shard_size else None
+        # 'lazy' skips audio_files.zip; the download route streams it from the published clips
+        self.audio_bundle = config.get('audio_bundle', 'eager')
+        self.metrics = JobMetrics(job_id)
+        self.profiler = JobProfiler.from_config(config, self.metrics)
+        self.file_manager = FileManager(self.work_dir, metrics=self.metrics, cancellation=self.cancellation)
+        self.status_reporter = StatusReporter(job_id)
+        # When the host has a work queue, OCR, narration, speech and encoding run on stage workers
+        self.work_queue = open_work_queue()
+        # Files handed to stage workers must stay on storage they can reach, never on local tmpfs
+        self.scratch = ScratchSpace(job_id, self.work_dir, self.metrics, shared=bool(self.work_queue))
         
-    def update_job_status(self, status: str, progress: int, error_message: str = ""):
-        """Update job status via API call"""
+        # Per-slide records live on disk; only a bounded working set is kept in memory
+        records_dir = self.work_dir / "records"
+        records_budget = memory_limit_bytes() // 3
+        self.slides_data = SlideRecordList(records_dir / "slides", records_budget)
+        self.transcripts = SlideRecordList(records_dir / "transcripts", records_budget)
+        self.audio_files = SlideRecordList(records_dir / "audio", records_budget)
+        
+    # Services are imported and built by the first stage that needs them
+    @cached_property
+    def transcript_generator(self):
+        from transcript_generator import TranscriptGenerator
+        return TranscriptGenerator(self.config['openai_api_key'], metrics=self.metrics, cancellation=self.cancellation)
+    
+    @cached_property
+    def audio_synthesizer(self):
+        from audio_synthesizer import AudioSynthesizer
+        return AudioSynthesizer(self.config, metrics=self.metrics, cancellation=self.cancellation)
+    
+    @cached_property
+    def video_renderer(self):
+        from video_renderer import VideoRenderer
+        return VideoRenderer(self.config, metrics=self.metrics, cancellation=self.cancellation,
+                             work_queue=self.work_queue, job_id=self.job_id, progress=self._render_progress)
+    
+    def _render_progress(self, done: int, total: int):
+        self.update_job_status('rendering_video', 95 + int(done / total * 3))
+    
+    def _progressive(self) -> bool:
+        """Whether an HLS stream is being encoded, without building a renderer to find out"""
+        return 'video_renderer' in self.__dict__ and self.video_renderer.progressive
+    
+    def _stop_progressive(self):
+        if 'video_renderer' in self.__dict__:
+            self.video_renderer.stop_progressive()
+    
+    def _shard_size(self) -> int:
+        """Slides per shard, or 0 when the whole deck is processed here"""
+        shard_size = int(self.config.get('shard_size') or 0)
+        # HLS publishes slides in order as they are encoded, which shards cannot do
+        if not shard_size or self.output_mode == 'hls':
+            return 0
         try:
-            update_data = {
-                'status': status,
-                'progress': progress
-            }
-            if error_message:
-                update_data['error_message'] = error_message
-            
-            # Make HTTP request to update job status
-            import requests
-            response = requests.patch(
-                f'http://localhost:5000/api/jobs/{self.job_id}',
-                json=update_data,
-                timeout=10
-            )
-            
-            if response.status_code != 200:
-                print(f"Failed to update job status: HTTP {response.status_code}")
-                
+            return shard_size if deck_slide_count(self.file_path) > shard_size else 0
         except Exception as e:
-            print(f"Failed to update job status: {e}")
-
+            print(f"Warning: Could not count slides for sharding: {e}")
+            return 0
+    
+    def update_job_status(self, status: str, progress: int, error_message: str = ""):
+        """Queue a job status update for the API; errors are sent before returning"""
+        update_data = {
+            'status': status,
+            'progress': progress
+        }
+        if error_message:
+            update_data['error_message'] = error_message
+        
+        self.status_reporter.report(update_data, final=(status == 'error'))
+    
     def extract_content(self):
         """Extract text and images from PowerPoint slides with image analysis"""
         try:
@@ -74,66 +159,109 @@ class PowerPointProcessor:
             import pytesseract
             from PIL import Image
             import io
-            import base64
+            from text_extractor import extract_deck_text, extract_slide_text_pptx
             
             prs = Presentation(self.file_path)
             
+            # Text and notes come straight from the slide XML unless the object model is requested
+            deck_text = None
+            if self.config.get('text_extractor', 'xml') == 'xml':
+                try:
+                    deck_text = extract_deck_text(self.file_path)
+                except Exception as e:
+                    print(f"Fast text extraction failed, using python-pptx: {e}")
+            
             # Create slide images directory
             slide_images_dir = self.work_dir / "slide_images_for_ai"
             slide_images_dir.mkdir(exist_ok=True)
             
+            # With a work queue, slides wait here for their OCR tasks and are appended in order afterwards
+            pending_slides = []
+            
             for slide_idx, slide in enumerate(prs.slides):
+                if slide_idx < len(self.slides_data):
+                    # Extracted before the job was interrupted
+                    continue
+                self.cancellation.check()
+                slide_number = self.slide_offset + slide_idx + 1
+                
                 slide_data = {
-                    'slide_number': slide_idx + 1,
+                    'slide_number': slide_number,
                     'text_content': [],
                     'image_text': [],
                     'notes': '',
-                    'slide_image_base64': None
+                    'slide_image_path': None
                 }
                 
                 # Create slide image for AI analysis
                 try:
-                    slide_image = self._create_slide_image(slide, slide_idx + 1)
+                    with self.metrics.operation('slide_image'):
+                        slide_image = self._create_slide_image(slide, slide_number)
                     if slide_image:
-                        slide_image_path = slide_images_dir / f"slide_{slide_idx + 1}.png"
+                        slide_image_path = slide_images_dir / f"slide_{slide_number}.png"
                         slide_image.save(slide_image_path, 'PNG', dpi=(150, 150))
                         
-                        # Convert to base64 for AI analysis
-                        with open(slide_image_path, 'rb') as img_file:
-                            slide_data['slide_image_base64'] = base64.b64encode(img_file.read()).decode()
+                        # The image is read back only when its transcript is generated
+                        slide_data['slide_image_path'] = str(slide_image_path)
                 except Exception as e:
-                    print(f"Failed to create slide image for slide {slide_idx + 1}: {e}")
+                    print(f"Failed to create slide image for slide {slide_number}: {e}")
                 
                 # Extract text from shapes
-                for shape in slide.shapes:
-                    if hasattr(shape, 'text_frame') and shape.text_frame:
-                        text_content = ""
-                        for paragraph in shape.text_frame.paragraphs:
-                            for run in paragraph.runs:
-                                text_content += run.text
-                        if text_content.strip():
-                            slide_data['text_content'].append(text_content.strip())
+                if deck_text and slide_idx < len(deck_text):
+                    slide_text = deck_text[slide_idx]
+                else:
+                    slide_text = extract_slide_text_pptx(slide)
+                slide_data['text_content'] = slide_text['text_content']
+                slide_data['notes'] = slide_text['notes']
+                
+                try:
+                    slide_data['fingerprint'] = slide_fingerprint(slide, slide_number, slide_data['text_content'], slide_data['notes'])
+                except Exception as e:
+                    print(f"Failed to fingerprint slide {slide_number}: {e}")
+                
+                previous = self._previous_slide(slide_data)
+                if previous:
+                    slide_data['image_text'] = previous['image_text']
+                    if self.work_queue:
+                        pending_slides.append((slide_data, []))
+                    else:
+                        self.slides_data.append(slide_data)
+                    continue
                 
                 # Extract images and perform OCR
+                ocr_tasks = []
                 for shape in slide.shapes:
                     if shape.shape_type == 13:  # Picture shape type
                         try:
-                            if hasattr(shape, 'image') and hasattr(shape.image, 'blob'):
+                            if hasattr(shape, 'image') and hasattr(shape.image, 'blob') and self.work_queue:
+                                ocr_tasks.append(self._submit_ocr(shape.image))
+                            elif hasattr(shape, 'image') and hasattr(shape.image, 'blob'):
                                 image = Image.open(io.BytesIO(shape.image.blob))
-                                ocr_text = pytesseract.image_to_string(image).strip()
+                                with self.metrics.operation('ocr'):
+                                    ocr_text = pytesseract.image_to_string(image).strip()
                                 if ocr_text:
                                     slide_data['image_text'].append(ocr_text)
                         except Exception as e:
-                            print(f"OCR failed for slide {slide_idx + 1}: {e}")
-                
-                # Extract notes
-                if hasattr(slide, 'notes_slide') and slide.notes_slide and hasattr(slide.notes_slide, 'notes_text_frame') and slide.notes_slide.notes_text_frame:
-                    slide_data['notes'] = slide.notes_slide.notes_text_frame.text.strip()
+                            print(f"OCR failed for slide {slide_number}: {e}")
                 
+                if self.work_queue:
+                    pending_slides.append((slide_data, ocr_tasks))
+                else:
+                    self.slides_data.append(slide_data)
+            
+            for slide_data, ocr_tasks in pending_slides:
+                for task_id in ocr_tasks:
+                    try:
+                        ocr_text = self.work_queue.wait(task_id, self.cancellation)['text']
+                        if ocr_text:
+                            slide_data['image_text'].append(ocr_text)
+                    except Exception as e:
+                        print(f"OCR failed for slide {slide_data['slide_number']}: {e}")
                 self.slides_data.append(slide_data)
             
             # Convert to PDF for reference
-            self.file_manager.convert_pptx_to_pdf(self.file_path)
+            if self.reference_pdf:
+                self.file_manager.convert_pptx_to_pdf(self.file_path)
             
             self.update_job_status('generating_transcript', 25)
             
@@ -142,6 +270,16 @@ class PowerPointProcessor:
             self.update_job_status('error', 10, error_msg)
             raise Exception(error_msg)
     
+    def _submit_ocr(self, image) -> str:
+        """Queue OCR of a picture; identical pictures in a deck share one task"""
+        digest = hashlib.sha256(image.blob).hexdigest()
+        ocr_dir = self.work_dir / "ocr_images"
+        ocr_dir.mkdir(exist_ok=True)
+        image_path = ocr_dir / f"{digest}.{image.ext}"
+        if not image_path.exists():
+            image_path.write_bytes(image.blob)
+        return self.work_queue.submit(self.job_id, 'ocr', digest[:16], {'image_path': str(image_path)})
+    
     def _create_slide_image(self, slide, slide_number: int):
         """Create a high-quality image of a slide for AI analysis"""
         try:
@@ -244,13 +382,39 @@ class PowerPointProcessor:
         try:
             self.update_job_status('generating_transcript', 30)
             
+            # With a work queue every slide is queued up front and narrated by stage workers in parallel
+            narration_tasks = {}
+            if self.work_queue:
+                for i, slide_data in enumerate(self.slides_data):
+                    previous = self._previous_slide(slide_data)
+                    if i >= len(self.transcripts) and not (previous and previous['transcript']):
+                        narration_tasks[i] = self.work_queue.submit(self.job_id, 'narration', slide_data['slide_number'],
+                                                                    {'slide_data': slide_data})
+            
             for i, slide_data in enumerate(self.slides_data):
-                transcript = self.transcript_generator.generate_slide_transcript(slide_data)
-                self.transcripts.append({
+                if i < len(self.transcripts):
+                    continue
+                self.cancellation.check()
+                
+                previous = self._previous_slide(slide_data)
+                if previous and previous['transcript']:
+                    # Unchanged since the previous job, so its refined narration is reused as is
+                    transcript = previous['transcript']
+                elif i in narration_tasks:
+                    previous = None
+                    transcript = self.work_queue.wait(narration_tasks[i], self.cancellation)['transcript']
+                else:
+                    previous = None
+                    transcript = self.transcript_generator.generate_slide_transcript(slide_data)
+                
+                transcript_data = {
                     'slide_number': slide_data['slide_number'],
                     'transcript': transcript,
                     'duration_estimate': len(transcript.split()) * 0.6  # Rough estimate: 0.6 seconds per word
-                })
+                }
+                if previous:
+                    transcript_data['reused_from'] = self.previous_job.job_id
+                self.transcripts.append(transcript_data)
                 
                 # Update progress
                 progress = 30 + (i + 1) / len(self.slides_data) * 15
@@ -268,12 +432,31 @@ class PowerPointProcessor:
         try:
             self.update_job_status('refining_transcript', 50)
             
+            refined = self.checkpoint.completed_slides('refine_transcripts')
+            refine_tasks = {}
+            if self.work_queue:
+                for i, transcript_data in enumerate(self.transcripts):
+                    if i >= refined and not transcript_data.get('reused_from'):
+                        refine_tasks[i] = self.work_queue.submit(self.job_id, 'refine', transcript_data['slide_number'], {
+                            'transcript': transcript_data['transcript'],
+                            'slide_number': transcript_data['slide_number'],
+                        })
+            
             for i, transcript_data in enumerate(self.transcripts):
-                refined_transcript = self.transcript_generator.refine_transcript(
-                    transcript_data['transcript'],
-                    transcript_data['slide_number']
-                )
+                if i < refined or transcript_data.get('reused_from'):
+                    continue
+                self.cancellation.check()
+                
+                if i in refine_tasks:
+                    refined_transcript = self.work_queue.wait(refine_tasks[i], self.cancellation)['transcript']
+                else:
+                    refined_transcript = self.transcript_generator.refine_transcript(
+                        transcript_data['transcript'],
+                        transcript_data['slide_number']
+                    )
                 transcript_data['transcript'] = refined_transcript
+                self.transcripts[i] = transcript_data
+                self.checkpoint.mark_slides('refine_transcripts', i + 1)
                 
                 # Update progress
                 progress = 50 + (i + 1) / len(self.transcripts) * 10
@@ -291,18 +474,51 @@ class PowerPointProcessor:
         try:
             self.update_job_status('synthesizing_audio', 65)
             
+            # In HLS mode slides are encoded and published while later narration is synthesized
+            if self.output_mode == 'hls':
+                self.start_progressive_video()
+            
+            tts_tasks = {}
+            if self.work_queue:
+                for i, transcript_data in enumerate(self.transcripts):
+                    synthesized = i < len(self.audio_files) and os.path.exists(self.audio_files[i]['audio_file'])
+                    reusable = self.reuse_audio and transcript_data.get('reused_from')
+                    if not synthesized and not reusable:
+                        tts_tasks[i] = self.work_queue.submit(self.job_id, 'tts', transcript_data['slide_number'], {
+                            'text': transcript_data['transcript'],
+                            'filename': f"slide_{transcript_data['slide_number']}.mp3",
+                            'output_dir': str(self.work_dir),
+                            'config': self.config,
+                        })
+            
             for i, transcript_data in enumerate(self.transcripts):
-                audio_file = self.audio_synthesizer.synthesize_text(
-                    transcript_data['transcript'],
-                    f"slide_{transcript_data['slide_number']}.mp3",
-                    self.work_dir
-                )
+                self.cancellation.check()
+                if i < len(self.audio_files) and os.path.exists(self.audio_files[i]['audio_file']):
+                    # Synthesized before the job was interrupted
+                    audio_file = self.audio_files[i]['audio_file']
+                else:
+                    audio_file = self._reuse_previous_audio(i, transcript_data)
+                    if not audio_file and i in tts_tasks:
+                        audio_file = self.work_queue.wait(tts_tasks[i], self.cancellation)['audio_file']
+                    elif not audio_file:
+                        audio_file = self.audio_synthesizer.synthesize_text(
+                            transcript_data['transcript'],
+                            f"slide_{transcript_data['slide_number']}.mp3",
+                            self.work_dir
+                        )
+                    
+                    audio_data = {
+                        'slide_number': transcript_data['slide_number'],
+                        'audio_file': audio_file,
+                        'transcript': transcript_data['transcript']
+                    }
+                    if i < len(self.audio_files):
+                        self.audio_files[i] = audio_data
+                    else:
+                        self.audio_files.append(audio_data)
                 
-                self.audio_files.append({
-                    'slide_number': transcript_data['slide_number'],
-                    'audio_file': audio_file,
-                    'transcript': transcript_data['transcript']
-                })
+                if self._progressive():
+                    self.video_renderer.submit_slide(transcript_data['slide_number'], audio_file)
                 
                 # Update progress
                 progress = 65 + (i + 1) / len(self.transcripts) * 15
@@ -311,10 +527,132 @@ class PowerPointProcessor:
             self.update_job_status('embedding_audio', 80)
             
         except Exception as e:
+            self._stop_progressive()
             error_msg = f"Audio synthesis failed: {str(e)}"
             self.update_job_status('error', 65, error_msg)
             raise Exception(error_msg)
 
+    def process_shards(self):
+        """Extract, narrate, synthesize and encode the deck's slide ranges in parallel worker processes"""
+        try:
+            self.update_job_status('extracting', 10)
+            
+            shards = self.shard_set
+            if shards.exists():
+                # Finished shards of an interrupted attempt are kept, failed ones run again
+                shards.load()
+                shards.reset_failed()
+            else:
+                shards.create(self.job_id, self.checkpoint.manifest['file_path'], self.shard_size,
+                              self.checkpoint.manifest['config'], self.checkpoint.cancel_path)
+            
+            worker_count = min(len(shards.shards), shard_worker_count())
+            workers = [self._start_shard_worker() for _ in range(worker_count)]
+            restarts = len(shards.shards)
+            try:
+                # The whole deck's reference PDF is converted while the shards run
+                self.file_manager.convert_pptx_to_pdf(self.file_path)
+                
+                while True:
+                    self.cancellation.check()
+                    states = shards.states()
+                    if 'failed' in states:
+                        index, error_message = next(iter(shards.errors().items()))
+                        raise Exception(f"Shard {index + 1} of {len(states)} failed: {error_message}")
+                    
+                    done = states.count('done')
+                    if done == len(states):
+                        break
+                    self.update_job_status('generating_transcript', int(10 + done / len(states) * 70))
+                    
+                    # A shard whose worker died is claimable again; make sure someone is left to claim it
+                    workers = [worker for worker in workers if worker.poll() is None]
+                    if worker_count and not workers and 'pending' in states:
+                        if not restarts:
+                            raise Exception("Shard workers keep exiting without finishing their shards")
+                        restarts -= 1
+                        workers.append(self._start_shard_worker())
+                    time.sleep(SHARD_POLL_INTERVAL)
+            finally:
+                self._stop_shard_workers(workers)
+            
+            # Records merged before an interruption are already in the lists
+            results = shards.results()
+            for name, records in (('slides_data', self.slides_data), ('transcripts', self.transcripts), ('audio_files', self.audio_files)):
+                merged = [record for result in results for record in result[name]]
+                for record in merged[len(records):]:
+                    records.append(record)
+            
+            self.update_job_status('embedding_audio', 80)
+        
+        except Exception as e:
+            error_msg = f"Sharded processing failed: {str(e)}"
+            self.update_job_status('error', 10, error_msg)
+            raise Exception(error_msg)
+    
+    def _start_shard_worker(self) -> subprocess.Popen:
+        """Launch a local worker that processes shards until none are left to claim"""
+        env = dict(os.environ)
+        if not self.config.get('segment_workers') and not env.get('SEGMENT_WORKERS'):
+            # The workers' encoders share this host's cores
+            env['SEGMENT_WORKERS'] = str(max(1, self.video_renderer.segment_workers // max(1, shard_worker_count())))
+        
+        worker = subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "shard_worker.py"),
+             "--join", str(self.shard_set.directory)],
+            stdin=subprocess.PIPE, env=env, text=True
+        )
+        # API keys are not written to the shared directory, so they are passed on stdin
+        worker.stdin.write(json.dumps(self.config))
+        worker.stdin.close()
+        return worker
+    
+    def _stop_shard_workers(self, workers: List[subprocess.Popen]):
+        """Stop workers still running, e.g. after a shard failed; SIGTERM cancels their shard"""
+        for worker in workers:
+            if worker.poll() is None:
+                worker.terminate()
+        for worker in workers:
+            try:
+                worker.wait(timeout=SHARD_STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+                worker.wait()
+    
+    def _previous_slide(self, slide_data: Dict[str, Any]):
+        """The previous job's record of an identical slide, if there is one"""
+        if not self.previous_job:
+            return None
+        return self.previous_job.find(slide_data.get('fingerprint'))
+    
+    def _reuse_previous_audio(self, index: int, transcript_data: Dict[str, Any]):
+        """Copy the previous job's narration for a reused transcript; None when it has to be synthesized"""
+        if not self.reuse_audio or not transcript_data.get('reused_from'):
+            return None
+        
+        previous = self._previous_slide(self.slides_data[index])
+        audio_path = self.work_dir / f"slide_{transcript_data['slide_number']}.mp3"
+        if previous and self.previous_job.copy_audio(previous['slide_number'], audio_path):
+            return str(audio_path)
+        return None
+    
+    def start_progressive_video(self):
+        """Begin progressive rendering and advertise the live playlist to the API"""
+        
+        # The stream is written into the job's current outputs version, which save_outputs replaces
+        hls_dir = self.file_manager.open_directory(self.outputs_dir) / "hls"
+        self.video_renderer.start_progressive(self.file_path, self.work_dir, hls_dir)
+        
+        self.status_reporter.report({'output_files': {'hls_playlist': str(hls_dir / "playlist.m3u8")}})
+    
+    def restart_progressive_video(self):
+        """Republish the HLS stream of a resumed job whose audio an earlier attempt synthesized"""
+        
+        # The new playlist replaces the unfinished one the interrupted attempt left behind
+        self.start_progressive_video()
+        for audio_data in self.audio_files:
+            self.video_renderer.submit_slide(audio_data['slide_number'], audio_data['audio_file'])
+    
     def embed_audio_in_pptx(self):
         """Embed audio files into PowerPoint slides"""
         try:
@@ -338,10 +676,25 @@ class PowerPointProcessor:
         try:
             self.update_job_status('rendering_video', 95)
             
+            if self.video_renderer.progressive:
+                return self.video_renderer.finish_progressive()
+            
+            if self.shard_set:
+                # The shards rendered their own segments; they only need joining in slide order
+                results = self.shard_set.results()
+                return self.video_renderer.concatenate_shards(
+                    [segment for result in results for segment in result['segments']],
+                    self.work_dir,
+                    sum(result['cached_segments'] for result in results)
+                )
+            
+            # Slide images and segments are only needed until they are joined, so may go to tmpfs
+            scratch_dir = self.scratch.hot_dir('render', len(self.audio_files) * HOT_BYTES_PER_SLIDE)
             video_file = self.video_renderer.create_video(
                 narrated_pptx_path,
                 self.audio_files,
-                self.work_dir
+                self.work_dir,
+                scratch_dir
             )
             
             return video_file
@@ -353,123 +706,252 @@ class PowerPointProcessor:
 
     def save_outputs(self, narrated_pptx: str, video_file: str):
         """Save all output files including audio zip and update job with file paths"""
+        staging_dir = None
         try:
-            # Create outputs directory
-            outputs_dir = Path("outputs") / self.job_id
-            outputs_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Copy files to outputs directory
-            final_pptx = outputs_dir / "narrated_presentation.pptx"
-            final_video = outputs_dir / "learning_module.mp4"
-            final_pdf = outputs_dir / "original_presentation.pdf"
-            final_transcripts = outputs_dir / "transcripts.json"
-            final_audio_zip = outputs_dir / "audio_files.zip"
+            # Everything is assembled in a staging directory and swapped in at the end,
+            # so a half-written set of outputs is never visible under outputs/<job_id>
+            outputs_dir = self.outputs_dir
+            staging_dir = self.file_manager.create_staging_dir(outputs_dir)
+            
+            file_names = {
+                'narrated_pptx': "narrated_presentation.pptx",
+                'video_mp4': "learning_module.mp4",
+                'pdf': "original_presentation.pdf",
+                'transcripts_json': "transcripts.json",
+                'audio_zip': "audio_files.zip",
+            }
             
-            shutil.copy2(narrated_pptx, final_pptx)
-            shutil.copy2(video_file, final_video)
-            shutil.copy2(self.work_dir / "presentation.pdf", final_pdf)
+            # Linked rather than moved, so the checkpoint stays intact until the outputs are committed
+            self.file_manager.publish_file(narrated_pptx, staging_dir / file_names['narrated_pptx'])
+            self.file_manager.publish_file(video_file, staging_dir / file_names['video_mp4'])
+            self.file_manager.publish_file(self.work_dir / "presentation.pdf", staging_dir / file_names['pdf'])
             
             # Save transcripts as JSON
-            with open(final_transcripts, 'w') as f:
-                json.dump(self.transcripts, f, indent=2)
-            
-            # Create audio files ZIP
-            self._create_audio_zip(final_audio_zip)
+            with open(staging_dir / file_names['transcripts_json'], 'w') as f:
+                json.dump(list(self.transcripts), f, indent=2)
+            
+            # Lets a later upload of a revised deck skip the slides that did not change
+            write_fingerprints(staging_dir / FINGERPRINTS_NAME, self.config, self.slides_data, self.transcripts)
+            
+            # Where the time went; the publishing stage itself is still running at this point
+            self.metrics.add_bytes('input', os.path.getsize(self.file_path))
+            self.metrics.add_bytes('output', sum(path.stat().st_size for path in staging_dir.rglob('*') if path.is_file()))
+            self.metrics.write_json(staging_dir / "metrics.json")
+            if self.profiler:
+                self.profiler.write(staging_dir / "profile")
+            
+            # Record how long the chosen render profile took and what it produced
+            if self.video_renderer.render_report:
+                with open(staging_dir / "render_report.json", 'w') as f:
+                    json.dump(self.video_renderer.render_report, f, indent=2)
+            
+            # Create audio files ZIP, or publish the clips so it can be streamed on demand
+            if self.audio_bundle == 'lazy':
+                self._publish_audio_files(staging_dir / AUDIO_DIR_NAME)
+            else:
+                self._create_audio_zip(staging_dir / file_names['audio_zip'])
             
             # Update job with output file paths
-            output_files = {
-                'narrated_pptx': str(final_pptx),
-                'video_mp4': str(final_video), 
-                'pdf': str(final_pdf),
-                'transcripts_json': str(final_transcripts),
-                'audio_zip': str(final_audio_zip)
-            }
+            output_files = {key: str(outputs_dir / name) for key, name in file_names.items()}
+            output_files['metrics_json'] = str(outputs_dir / "metrics.json")
+            if self.profiler:
+                output_files['profile_dir'] = str(outputs_dir / "profile")
+            if self.audio_bundle == 'lazy':
+                output_files['audio_dir'] = str(outputs_dir / AUDIO_DIR_NAME)
+            if self.video_renderer.progressive:
+                output_files['hls_playlist'] = str(outputs_dir / "hls" / "playlist.m3u8")
+            
+            # Extra renditions produced in the same encode as the main video
+            for name, rendition_file in self.video_renderer.rendition_outputs.items():
+                if name == 'audio':
+                    key, rendition_name = 'audio_m4a', "narration.m4a"
+                else:
+                    key, rendition_name = f'video_{name}', f"learning_module_{name}.mp4"
+                self.file_manager.publish_file(rendition_file, staging_dir / rendition_name)
+                output_files[key] = str(outputs_dir / rendition_name)
+            
+            # Identical artefacts from earlier jobs (e.g. re-uploads) share one blob on disk
+            dedup_report = self.blob_store.intern_directory(staging_dir)
+            if dedup_report['deduplicated_files']:
+                print(f"Deduplicated {dedup_report['deduplicated_files']} output files "
+                      f"({dedup_report['deduplicated_bytes']} bytes)")
+            
+            # Last, so retention never takes a directory that is still being written for a job
+            with open(staging_dir / PUBLISHED_MARKER, 'w') as f:
+                json.dump({'job_id': self.job_id, 'published_at': time.time()}, f)
+            
+            self.file_manager.commit_directory(staging_dir, outputs_dir)
+            staging_dir = None
+            
+            self._apply_output_retention()
             
             # Update job status with output files via HTTP API
-            import requests
-            try:
-                response = requests.patch(
-                    f'http://localhost:5000/api/jobs/{self.job_id}',
-                    json={
-                        'status': 'completed',
-                        'progress': 100,
-                        'output_files': output_files
-                    },
-                    timeout=10
-                )
-                if response.status_code != 200:
-                    print(f"Failed to update job with output files: HTTP {response.status_code}")
-            except Exception as e:
-                print(f"Failed to update job with output files: {e}")
+            self.status_reporter.report({
+                'status': 'completed',
+                'progress': 100,
+                'output_files': output_files
+            }, final=True)
             
         except Exception as e:
             error_msg = f"Failed to save outputs: {str(e)}"
             self.update_job_status('error', 98, error_msg)
             raise Exception(error_msg)
+        finally:
+            # Also reached on cancellation, which is not an Exception
+            if staging_dir is not None:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+    
+    def _apply_output_retention(self):
+        """Evict old outputs when the host has a retention policy configured"""
+        max_bytes = os.environ.get('OUTPUT_MAX_BYTES')
+        max_age_days = os.environ.get('OUTPUT_MAX_AGE_DAYS')
+        if not max_bytes and not max_age_days:
+            return
+        
+        try:
+            # Never let retention take away the job that was just published
+            report = self.blob_store.compact(
+                int(max_bytes) if max_bytes else None,
+                float(max_age_days) if max_age_days else None,
+                keep=[self.job_id]
+            )
+            print(f"Output retention reclaimed {report['reclaimed_bytes']} bytes")
+        except Exception as e:
+            print(f"Warning: Output retention failed: {e}")
     
     def _create_audio_zip(self, zip_path: Path):
         """Create a ZIP file containing all audio files"""
         import zipfile
         
         try:
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                for audio_data in self.audio_files:
-                    audio_file = audio_data['audio_file']
-                    slide_number = audio_data['slide_number']
-                    
-                    if os.path.exists(audio_file):
-                        # Add audio file with descriptive name
-                        audio_filename = f"slide_{slide_number:02d}_audio.mp3"
-                        zip_file.write(audio_file, audio_filename)
-                        
-                        # Also create a text file with the transcript
-                        transcript_filename = f"slide_{slide_number:02d}_transcript.txt"
-                        transcript_content = audio_data['transcript']
-                        zip_file.writestr(transcript_filename, transcript_content)
+            write_audio_bundle(zip_path, (
+                (audio_data['slide_number'], audio_data['audio_file'], audio_data['transcript'])
+                for audio_data in self.audio_files
+            ))
         
         except Exception as e:
             print(f"Warning: Failed to create audio ZIP: {e}")
             # Create an empty zip file to prevent errors
             with zipfile.ZipFile(zip_path, 'w') as zip_file:
                 zip_file.writestr("readme.txt", "Audio files could not be packaged.")
-
+    
+    def _publish_audio_files(self, audio_dir: Path):
+        """Keep the per-slide clips so the audio ZIP can be built at download time"""
+        audio_dir.mkdir(parents=True, exist_ok=True)
+        
+        for audio_data in self.audio_files:
+            if os.path.exists(audio_data['audio_file']):
+                self.file_manager.publish_file(audio_data['audio_file'], audio_dir / published_audio_name(audio_data['slide_number']))
+    
     def cleanup(self):
-        """Clean up temporary files"""
+        """Remove the job's checkpoint once its outputs are published"""
         try:
-            if self.work_dir.exists():
-                shutil.rmtree(self.work_dir)
+            self.checkpoint.remove()
+            prune_checkpoints(keep=[self.job_id])
+            prune_hot_dirs(keep=[self.job_id])
+            if self.work_queue:
+                self.work_queue.purge_job(self.job_id)
         except Exception as e:
             print(f"Cleanup failed: {e}")
+    
+    def _cancel_queued_tasks(self):
+        """Keep stage workers from picking up tasks of a cancelled job"""
+        if not self.work_queue:
+            return
+        try:
+            withdrawn = self.work_queue.cancel_job(self.job_id)
+            if withdrawn:
+                print(f"Withdrew {withdrawn} queued stage tasks")
+        except Exception as e:
+            print(f"Warning: Could not withdraw queued stage tasks: {e}")
+    
+    def _run_stage(self, stage: str, method, checkpointed: bool = True):
+        """Run and measure a stage, skipping checkpointed ones a previous attempt already finished"""
+        if checkpointed and self.checkpoint.is_done(stage):
+            print(f"Skipping {stage}, already completed")
+            return None
+        self.cancellation.check()
+        profile = self.profiler.stage(stage) if self.profiler else contextlib.nullcontext()
+        with self.metrics.stage(stage), profile:
+            result = method()
+        self.scratch.measure(stage)
+        if checkpointed:
+            self.checkpoint.mark_done(stage)
+        # Only once the stage can no longer be re-run on resume
+        freed = self.scratch.release(*SCRATCH_RELEASES.get(stage, []))
+        if freed:
+            print(f"Freed {freed // 1024 ** 2} MB of {stage} intermediates")
+        return result
 
     def process(self):
         """Main processing pipeline"""
+        completed = False
+        outcome = 'error'
+        self.cancellation.watch(self.checkpoint.cancel_path)
         try:
-            self.extract_content()
-            self.generate_transcripts()
-            self.refine_transcripts()
-            self.synthesize_audio()
-            narrated_pptx = self.embed_audio_in_pptx()
-            video_file = self.render_video(narrated_pptx)
-            self.save_outputs(narrated_pptx, video_file)
+            if self.shard_set:
+                self._run_stage('process_shards', self.process_shards)
+            else:
+                self._run_stage('extract_content', self.extract_content)
+                self._run_stage('generate_transcripts', self.generate_transcripts)
+                self._run_stage('refine_transcripts', self.refine_transcripts)
+                self._run_stage('synthesize_audio', self.synthesize_audio)
+                if self.output_mode == 'hls' and not self._progressive():
+                    self.restart_progressive_video()
+            narrated_pptx = self._run_stage('embed_audio', self.embed_audio_in_pptx, checkpointed=False)
+            video_file = self._run_stage('render_video', lambda: self.render_video(narrated_pptx), checkpointed=False)
+            self._run_stage('save_outputs', lambda: self.save_outputs(narrated_pptx, video_file), checkpointed=False)
+            completed = True
+            outcome = 'completed'
             
             # Final status update is handled in save_outputs
             
+        except JobCancelled:
+            outcome = 'cancelled'
+            self._stop_progressive()
+            print(f"Job {self.job_id} cancelled; checkpoint kept in {self.checkpoint.directory}")
+            self._cancel_queued_tasks()
+            self.status_reporter.report({'status': 'cancelled', 'error_message': 'Processing was cancelled'}, final=True)
         except Exception as e:
+            self._stop_progressive()
             print(f"Processing failed: {e}")
             traceback.print_exc()
+            print(f"Checkpoint kept in {self.checkpoint.directory}; resume with: "
+                  f"python3 powerpoint_processor.py --resume {self.job_id} <config_json>")
+            if self.profiler:
+                # The profile of a failed run is most useful next to its checkpoint
+                self.profiler.write(self.checkpoint.directory / "profile")
         finally:
-            self.cleanup()
+            self.cancellation.close()
+            self.scratch.close()
+            if self.profiler:
+                self.profiler.close()
+            HOST_METRICS.add_job(self.metrics, outcome)
+            self.status_reporter.close()
+            if completed:
+                self.cleanup()
 
 def main():
-    if len(sys.argv) != 4:
+    if len(sys.argv) == 4 and sys.argv[1] == '--resume':
+        # API keys are not checkpointed, so the config must provide them again
+        processor = PowerPointProcessor(None, sys.argv[2], json.loads(sys.argv[3]), resume=True)
+    elif len(sys.argv) == 4:
+        file_path = sys.argv[1]
+        job_id = sys.argv[2]
+        config = json.loads(sys.argv[3])
+        
+        processor = PowerPointProcessor(file_path, job_id, config)
+    else:
         print("Usage: python3 powerpoint_processor.py <file_path> <job_id> <config_json>")
+        print("       python3 powerpoint_processor.py --resume <job_id> <config_json>")
         sys.exit(1)
     
-    file_path = sys.argv[1]
-    job_id = sys.argv[2]
-    config = json.loads(sys.argv[3])
+    def cancel(signum, frame):
+        # The API server cancels one-off processes with SIGTERM. cancel() takes a lock
+        # the interrupted main thread may hold, so it runs on a thread of its own.
+        threading.Thread(target=processor.cancellation.cancel, daemon=True).start()
     
-    processor = PowerPointProcessor(file_path, job_id, config)
+    signal.signal(signal.SIGTERM, cancel)
     processor.process()
 
 if __name__ == "__main__":
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Long-running PowerPoint processing worker
+Keeps modules and API clients warm and runs jobs submitted over a Unix socket
+"""
+
+import os
+import sys
+import json
+import signal
+import argparse
+import importlib
+import threading
+import traceback
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from powerpoint_processor import PowerPointProcessor
+from utils.status_reporter import StatusReporter
+from utils.scheduler import JobScheduler, estimate_job_demand
+from utils.checkpoint import JobCheckpoint
+from utils.metrics import HOST_METRICS
+from utils.cancellation import CancellationToken
+
+DEFAULT_SOCKET_PATH = os.path.join("cache", "processor.sock")
+DEFAULT_CONCURRENCY = 2
+
+# Imported up front so the first job does not pay for them
+PRELOAD_MODULES = ('pptx', 'PIL.Image', 'PIL.ImageDraw', 'pytesseract', 'openai', 'requests', 'lxml.etree', 'text_extractor')
+
+def socket_path() -> str:
+    return os.environ.get('PROCESSOR_SOCKET') or DEFAULT_SOCKET_PATH
+
+def preload_modules():
+    for module in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            print(f"Warning: Could not preload {module}: {e}")
+
+class ProcessorDaemon:
+    """Runs submitted jobs as the host-level scheduler admits them"""
+    
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.scheduler = JobScheduler.from_environment(concurrency)
+        # Cancellation tokens of queued and running jobs
+        self.tokens = {}
+        self._lock = threading.Lock()
+    
+    def submit(self, file_path: str, job_id: str, config: Dict[str, Any], resume: bool = False) -> Dict[str, Any]:
+        if resume:
+            # Raises if there is nothing to resume, so the caller hears about it right away
+            file_path = JobCheckpoint(job_id).load()['file_path']
+        
+        demand = estimate_job_demand(file_path, config)
+        token = CancellationToken(job_id)
+        with self._lock:
+            self.tokens[job_id] = token
+        try:
+            position = self.scheduler.submit(
+                job_id, demand,
+                lambda: self._run_job(file_path, job_id, config, resume, token),
+                priority=config.get('priority', 'normal')
+            )
+        except Exception:
+            # Refused, e.g. for needing more scratch space than the host has
+            with self._lock:
+                self.tokens.pop(job_id, None)
+            raise
+        return {'accepted': True, 'job_id': job_id, 'queue_position': position}
+    
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        """Drop a queued job, or stop a running one and free its slot within seconds"""
+        if self.scheduler.cancel(job_id):
+            with self._lock:
+                self.tokens.pop(job_id, None)
+            return {'cancelled': True, 'job_id': job_id, 'state': 'queued'}
+        
+        with self._lock:
+            token = self.tokens.get(job_id)
+        if token is None:
+            return {'cancelled': False, 'job_id': job_id}
+        token.cancel()
+        return {'cancelled': True, 'job_id': job_id, 'state': 'running'}
+    
+    def status(self) -> Dict[str, Any]:
+        return self.scheduler.status()
+    
+    def _run_job(self, file_path: str, job_id: str, config: Dict[str, Any], resume: bool, token: CancellationToken):
+        try:
+            print(f"{'Resuming' if resume else 'Starting'} job {job_id}")
+            processor = PowerPointProcessor(file_path, job_id, config, resume=resume, cancellation=token)
+            processor.process()
+            print(f"Finished job {job_id}")
+        except Exception as e:
+            # process() reports its own failures; this only catches setup errors such as a missing API key
+            print(f"Job {job_id} failed to start: {e}")
+            traceback.print_exc()
+            self._report_failure(job_id, f"Failed to start processing: {str(e)}")
+        finally:
+            with self._lock:
+                if self.tokens.get(job_id) is token:
+                    del self.tokens[job_id]
+    
+    def _report_failure(self, job_id: str, error_message: str):
+        reporter = StatusReporter(job_id)
+        reporter.report({'status': 'error', 'progress': 0, 'error_message': error_message}, final=True)
+        reporter.close()
+    
+    def shutdown(self):
+        """Wait for the jobs already submitted"""
+        self.scheduler.wait_idle()
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """One JSON request line in, one JSON response line out"""
+    
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            command = request.get('command', 'submit')
+            
+            if command == 'submit':
+                response = self.server.processor.submit(request['file_path'], request['job_id'], request['config'])
+            elif command == 'resume':
+                response = self.server.processor.submit(None, request['job_id'], request.get('config', {}), resume=True)
+            elif command == 'cancel':
+                response = self.server.processor.cancel(request['job_id'])
+            elif command == 'status':
+                response = self.server.processor.status()
+            elif command == 'metrics':
+                response = {'prometheus': HOST_METRICS.prometheus_text()}
+            else:
+                response = {'error': f"Unknown command: {command}"}
+        except (ValueError, KeyError, TypeError) as e:
+            response = {'error': f"Invalid request: {e}"}
+        except Exception as e:
+            response = {'error': str(e)}
+        
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    
+    def __init__(self, path: str, processor: ProcessorDaemon):
+        self.processor = processor
+        super().__init__(path, RequestHandler)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Prometheus scrape endpoint for the worker host"""
+    
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = HOST_METRICS.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the PowerPoint processing worker")
+    parser.add_argument('--socket', default=socket_path(), help="Unix socket to accept jobs on")
+    parser.add_argument('--concurrency', type=int,
+                        default=int(os.environ.get('PROCESSOR_CONCURRENCY') or DEFAULT_CONCURRENCY),
+                        help="Maximum number of jobs processed at the same time")
+    parser.add_argument('--metrics-port', type=int, default=int(os.environ.get('METRICS_PORT') or 0),
+                        help="Serve Prometheus metrics on this port (disabled when 0)")
+    args = parser.parse_args()
+    
+    preload_modules()
+    
+    # A socket left behind by a previous run would make bind() fail
+    os.makedirs(os.path.dirname(os.path.abspath(args.socket)), exist_ok=True)
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    
+    daemon = ProcessorDaemon(max(1, args.concurrency))
+    server = DaemonServer(args.socket, daemon)
+    
+    def stop(signum, frame):
+        # shutdown() blocks until serve_forever() returns, so it cannot run on the serving thread
+        threading.Thread(target=server.shutdown).start()
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    if args.metrics_port:
+        metrics_server = ThreadingHTTPServer(('127.0.0.1', args.metrics_port), MetricsHandler)
+        threading.Thread(target=metrics_server.serve_forever, daemon=True).start()
+        print(f"Serving metrics on http://127.0.0.1:{args.metrics_port}/metrics")
+    
+    print(f"Processor daemon listening on {args.socket} with {daemon.concurrency} workers")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        daemon.shutdown()
+
+if __name__ == "__main__":
+    main()
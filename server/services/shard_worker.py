@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Shard worker for sharded jobs
+Claims slide ranges of a job from its shared shard directory and processes them until none are left
+"""
+
+import sys
+import json
+import os
+import signal
+import argparse
+import threading
+import traceback
+from typing import Dict, Any
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from powerpoint_processor import PowerPointProcessor
+from utils.checkpoint import JobCheckpoint
+from utils.cancellation import CancellationToken, JobCancelled
+from utils.sharding import ShardSet, write_sub_deck
+
+class ShardProcessor(PowerPointProcessor):
+    """Extraction, narration, audio and video segments for one slide range of a sharded job
+
+    The shard's deck holds only its own slides, but records and files are numbered
+    as in the full deck. The coordinating processor merges the published result
+    and does the embedding, concatenation and publishing itself.
+    """
+
+    reference_pdf = False
+
+    def __init__(self, shards: ShardSet, index: int, config: Dict[str, Any], cancellation: CancellationToken = None):
+        self.shards = shards
+        self.index = index
+        shard = shards.shards[index]
+        self.first_slide = shard['first_slide']
+        self.slide_offset = shard['first_slide'] - 1
+
+        # Each shard is checkpointed on its own, so a shard taken over from a dead worker resumes
+        checkpoint = JobCheckpoint("job", root=shards.shard_dir(index))
+        resume = checkpoint.exists()
+        deck_path = None
+        if not resume:
+            deck_path = shards.shard_dir(index) / "slides.pptx"
+            write_sub_deck(shards.file_path, deck_path, shard['first_slide'], shard['last_slide'])
+
+        super().__init__(str(deck_path), shards.job_id, {**shards.config, **config, 'output_mode': 'mp4'},
+                         resume=resume, cancellation=cancellation, checkpoint=checkpoint)
+
+    def update_job_status(self, status: str, progress: int, error_message: str = ""):
+        """Progress is reported by the coordinating processor, not by each shard"""
+
+    def render_segments(self):
+        return self.video_renderer.render_segments(self.file_path, self.audio_files, self.work_dir, self.first_slide)
+
+    def process(self):
+        """Run the shard's stages and publish its records and segments"""
+        self.cancellation.watch(self.shards.cancel_path)
+        try:
+            self._run_stage('extract_content', self.extract_content)
+            self._run_stage('generate_transcripts', self.generate_transcripts)
+            self._run_stage('refine_transcripts', self.refine_transcripts)
+            self._run_stage('synthesize_audio', self.synthesize_audio)
+            segments = self._run_stage('render_segments', self.render_segments, checkpointed=False)
+
+            self.shards.mark_done(self.index, {
+                'slides_data': list(self.slides_data),
+                'transcripts': list(self.transcripts),
+                'audio_files': list(self.audio_files),
+                'segments': segments,
+                'cached_segments': self.video_renderer.cache_hits,
+            })
+            print(f"Shard {self.index + 1} of job {self.job_id} finished")
+
+        except JobCancelled:
+            print(f"Shard {self.index + 1} of job {self.job_id} cancelled")
+        except Exception as e:
+            traceback.print_exc()
+            self.shards.mark_failed(self.index, str(e))
+        finally:
+            self.cancellation.close()
+            self.scratch.close()
+            if self.profiler:
+                self.profiler.close()
+            self.metrics.write_json(self.shards.shard_dir(self.index) / "metrics.json")
+
+def run_worker(shards: ShardSet, config: Dict[str, Any], cancellation: CancellationToken):
+    """Process shards one after another until none are left to claim"""
+    while not cancellation.cancelled:
+        claim = shards.claim_next()
+        if claim is None:
+            return
+
+        try:
+            processor = ShardProcessor(shards, claim.index, config, cancellation)
+        except Exception as e:
+            traceback.print_exc()
+            shards.mark_failed(claim.index, f"Failed to start shard: {e}")
+            claim.release()
+            continue
+
+        try:
+            processor.process()
+        finally:
+            claim.release()
+
+def main():
+    parser = argparse.ArgumentParser(description="Process shards of a sharded job")
+    parser.add_argument('--join', required=True, metavar='SHARDS_DIR',
+                        help="Shard directory of the job, on storage shared with its coordinating processor")
+    args = parser.parse_args()
+
+    # The job's config comes from the shard manifest; stdin supplies the API keys
+    config = json.loads(sys.stdin.read() or "{}")
+    shards = ShardSet(args.join)
+    shards.load()
+    cancellation = CancellationToken(shards.job_id)
+
+    def cancel(signum, frame):
+        threading.Thread(target=cancellation.cancel, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, cancel)
+    run_worker(shards, config, cancellation)
+
+if __name__ == "__main__":
+    main()
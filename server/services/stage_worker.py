@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Stage task worker
+Runs OCR, narration, speech synthesis and segment encoding tasks taken from the work queue
+"""
+
+import sys
+import os
+import uuid
+import signal
+import argparse
+import threading
+import traceback
+from pathlib import Path
+from typing import Dict, Any
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from transcript_generator import TranscriptGenerator
+from audio_synthesizer import AudioSynthesizer
+from video_renderer import VideoRenderer
+from utils.work_queue import WorkQueue, open_work_queue, TASK_QUEUES, POLL_INTERVAL, DEFAULT_LEASE_SECONDS
+
+# Tasks carry no API keys; a worker uses the keys of its own environment
+API_KEY_VARIABLES = {
+    'openai_api_key': 'OPENAI_API_KEY',
+    'google_tts_api_key': 'GOOGLE_TTS_API_KEY',
+    'elevenlabs_api_key': 'ELEVENLABS_API_KEY',
+}
+
+def _with_api_keys(config: Dict[str, Any]) -> Dict[str, Any]:
+    config = dict(config)
+    for key, variable in API_KEY_VARIABLES.items():
+        if os.environ.get(variable):
+            config[key] = os.environ[variable]
+    return config
+
+def _openai_api_key() -> str:
+    api_key = os.environ.get('OPENAI_API_KEY')
+    if not api_key:
+        raise Exception("OPENAI_API_KEY is not set on this worker")
+    return api_key
+
+def run_ocr(payload: Dict[str, Any]) -> Dict[str, Any]:
+    import pytesseract
+    from PIL import Image
+    
+    with Image.open(payload['image_path']) as image:
+        return {'text': pytesseract.image_to_string(image).strip()}
+
+def run_narration(payload: Dict[str, Any]) -> Dict[str, Any]:
+    generator = TranscriptGenerator(_openai_api_key())
+    return {'transcript': generator.generate_slide_transcript(payload['slide_data'])}
+
+def run_refine(payload: Dict[str, Any]) -> Dict[str, Any]:
+    generator = TranscriptGenerator(_openai_api_key())
+    return {'transcript': generator.refine_transcript(payload['transcript'], payload['slide_number'])}
+
+def run_tts(payload: Dict[str, Any]) -> Dict[str, Any]:
+    synthesizer = AudioSynthesizer(_with_api_keys(payload['config']))
+    output_dir = Path(payload['output_dir'])
+    
+    # Synthesized under a private name and renamed, so a redelivered task never leaves a torn file
+    temp_path = synthesizer.synthesize_text(payload['text'], f".{uuid.uuid4().hex}.{payload['filename']}", output_dir)
+    audio_file = output_dir / payload['filename']
+    os.replace(temp_path, audio_file)
+    return {'audio_file': str(audio_file)}
+
+def run_encode(payload: Dict[str, Any]) -> Dict[str, Any]:
+    renderer = VideoRenderer(payload['config'])
+    segment, cache_hit = renderer.encode_segment(
+        payload['image_file'], payload['audio_file'], Path(payload['work_dir']), payload['slide_number']
+    )
+    return {'segment': segment, 'cache_hit': cache_hit}
+
+HANDLERS = {
+    'ocr': run_ocr,
+    'narration': run_narration,
+    'refine': run_refine,
+    'tts': run_tts,
+    'encode': run_encode,
+}
+
+class StageWorker:
+    """Threads that claim tasks from some of the queues and run them until stopped"""
+    
+    def __init__(self, work_queue: WorkQueue, queues, concurrency: int, lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.work_queue = work_queue
+        self.queues = list(queues)
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.stopping = threading.Event()
+    
+    def run(self):
+        threads = [
+            threading.Thread(target=self._work, name=f"stage-worker-{index}", daemon=True)
+            for index in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    
+    def stop(self):
+        """Stop claiming tasks; tasks already running are finished first"""
+        self.stopping.set()
+    
+    def _work(self):
+        while not self.stopping.is_set():
+            try:
+                task = self.work_queue.claim(self.queues, self.lease_seconds)
+            except Exception as e:
+                print(f"Warning: Could not claim a task: {e}")
+                task = None
+            if task is None:
+                self.stopping.wait(POLL_INTERVAL)
+                continue
+            
+            try:
+                with self.work_queue.leased(task, self.lease_seconds):
+                    result = HANDLERS[task['kind']](task['payload'])
+            except Exception as e:
+                print(f"Task {task['id']} failed (attempt {task['attempts']}): {e}")
+                traceback.print_exc()
+                self.work_queue.fail(task, str(e))
+            else:
+                self.work_queue.complete(task, result)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run stage tasks from the work queue")
+    parser.add_argument('--queues', default=",".join(sorted(set(TASK_QUEUES.values()))),
+                        help="Comma-separated queues to take tasks from, e.g. cpu on encoder nodes and api on API nodes")
+    parser.add_argument('--concurrency', type=int, default=4, help="Tasks run at the same time")
+    parser.add_argument('--queue-url', help="Work queue URL; defaults to WORK_QUEUE_URL")
+    args = parser.parse_args()
+    
+    work_queue = open_work_queue(args.queue_url)
+    if work_queue is None:
+        print("No work queue configured; set WORK_QUEUE_URL or pass --queue-url")
+        sys.exit(1)
+    
+    queues = [queue for queue in args.queues.split(",") if queue]
+    worker = StageWorker(work_queue, queues, max(1, args.concurrency))
+    
+    def stop(signum, frame):
+        print("Stopping after the running tasks")
+        worker.stop()
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"Stage worker taking {', '.join(queues)} tasks with {worker.concurrency} threads")
+    worker.run()
+
+if __name__ == "__main__":
+    main()
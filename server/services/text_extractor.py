@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Fast slide text and speaker notes extraction
+Parses the slide XML directly with lxml instead of building python-pptx shape proxies
+"""
+
+import os
+import sys
+import time
+import zipfile
+from typing import Dict, Any, List
+
+from lxml import etree
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.preflight import read_relationships, slide_part_names, NOTES_SLIDE_REL
+
+NS_P = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+NS_A = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+
+def _paragraph_texts(element) -> List[str]:
+    """Text of each a:p below element, with its runs and fields concatenated"""
+    return [
+        ''.join(t.text or '' for t in paragraph.iter(f'{NS_A}t'))
+        for paragraph in element.iter(f'{NS_A}p')
+    ]
+
+def _table_text(graphic_frame) -> str:
+    """Flatten a table into one line per row with cells separated by ' | '"""
+    rows = []
+    for row in graphic_frame.iter(f'{NS_A}tr'):
+        cells = [' '.join(text for text in _paragraph_texts(cell) if text).strip() for cell in row.iter(f'{NS_A}tc')]
+        if any(cells):
+            rows.append(' | '.join(cells))
+    return '\n'.join(rows)
+
+def _release(element):
+    """Drop a handled element and its already-parsed siblings to keep memory flat"""
+    element.clear()
+    while element.getprevious() is not None:
+        del element.getparent()[0]
+
+def _iter_shapes(part):
+    """Yield every text-bearing shape in document order, including grouped shapes and tables"""
+    for _, element in etree.iterparse(part, events=('end',), tag=(f'{NS_P}sp', f'{NS_P}graphicFrame')):
+        yield element
+
+def extract_slide_text(archive: zipfile.ZipFile, part_name: str) -> List[str]:
+    """Text of each shape on a slide, one entry per shape"""
+    
+    text_content = []
+    with archive.open(part_name) as part:
+        for shape in _iter_shapes(part):
+            if shape.tag == f'{NS_P}sp':
+                text = '\n'.join(_paragraph_texts(shape)).strip()
+            else:
+                text = _table_text(shape).strip()
+            if text:
+                text_content.append(text)
+            # Shapes nested in a group are released with the group's other children
+            if shape.getparent() is not None and shape.getparent().tag != f'{NS_P}grpSp':
+                _release(shape)
+    return text_content
+
+def extract_notes_text(archive: zipfile.ZipFile, part_name: str) -> str:
+    """Speaker notes from the body placeholder of a notes slide"""
+    
+    notes = []
+    with archive.open(part_name) as part:
+        for shape in _iter_shapes(part):
+            placeholder = shape.find(f'{NS_P}nvSpPr/{NS_P}nvPr/{NS_P}ph')
+            if placeholder is not None and placeholder.get('type') == 'body':
+                notes.append('\n'.join(_paragraph_texts(shape)))
+            _release(shape)
+    return '\n'.join(notes).strip()
+
+def extract_deck_text(file_path: str) -> List[Dict[str, Any]]:
+    """Text and notes for every slide, in presentation order"""
+    
+    slides = []
+    with zipfile.ZipFile(file_path, 'r') as archive:
+        for slide_idx, slide_part in enumerate(slide_part_names(archive)):
+            notes = ''
+            for rel in read_relationships(archive, slide_part).values():
+                if rel['type'] == NOTES_SLIDE_REL and rel['target'] in archive.NameToInfo:
+                    notes = extract_notes_text(archive, rel['target'])
+            
+            slides.append({
+                'slide_number': slide_idx + 1,
+                'text_content': extract_slide_text(archive, slide_part) if slide_part in archive.NameToInfo else [],
+                'notes': notes,
+            })
+    return slides
+
+def extract_slide_text_pptx(slide) -> Dict[str, Any]:
+    """Text and notes of one python-pptx slide, walking the shape object model"""
+    
+    text_content = []
+    for shape in slide.shapes:
+        if hasattr(shape, 'text_frame') and shape.text_frame:
+            text = ""
+            for paragraph in shape.text_frame.paragraphs:
+                for run in paragraph.runs:
+                    text += run.text
+            if text.strip():
+                text_content.append(text.strip())
+    
+    notes = ''
+    if hasattr(slide, 'notes_slide') and slide.notes_slide and hasattr(slide.notes_slide, 'notes_text_frame') and slide.notes_slide.notes_text_frame:
+        notes = slide.notes_slide.notes_text_frame.text.strip()
+    
+    return {'text_content': text_content, 'notes': notes}
+
+def extract_deck_text_pptx(file_path: str) -> List[Dict[str, Any]]:
+    """python-pptx equivalent of extract_deck_text, kept for comparison"""
+    from pptx import Presentation
+    
+    prs = Presentation(file_path)
+    slides = []
+    for slide_idx, slide in enumerate(prs.slides):
+        slide_text = extract_slide_text_pptx(slide)
+        slide_text['slide_number'] = slide_idx + 1
+        slides.append(slide_text)
+    return slides
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python3 text_extractor.py <file_path> [repeat]")
+        sys.exit(1)
+    
+    file_path = sys.argv[1]
+    repeat = int(sys.argv[2]) if len(sys.argv) == 3 else 3
+    
+    # Benchmark the XML extractor against the python-pptx object model on the same deck
+    results = {}
+    best = {}
+    for name, extractor in (('xml', extract_deck_text), ('python-pptx', extract_deck_text_pptx)):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            slides = extractor(file_path)
+            timings.append(time.perf_counter() - start)
+        results[name] = slides
+        best[name] = min(timings)
+        shapes = sum(len(slide['text_content']) for slide in slides)
+        print(f"{name:12s} best {best[name]:.3f}s over {repeat} runs, {len(slides)} slides, {shapes} text shapes")
+    
+    if best['xml'] > 0:
+        print(f"Speedup: {best['python-pptx'] / best['xml']:.1f}x")
+    missed = sum(
+        len(fast['text_content']) - len(slow['text_content'])
+        for fast, slow in zip(results['xml'], results['python-pptx'])
+    )
+    print(f"Shapes found only by the XML extractor (groups, tables): {missed}")
+
+if __name__ == "__main__":
+    main()
@@ -5,16 +5,34 @@ Uses OpenAI GPT-4o to create engaging, instructional narratives
 
 import json
 import os
+import sys
+import time
+import base64
 from typing import Dict, Any, List
-from openai import OpenAI
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.clients import openai_client
+from utils.scheduler import provider_slot
+from utils.cancellation import call_cancellable
 
 class TranscriptGenerator:
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key: str, metrics=None, cancellation=None):
+        self.api_key = api_key
+        self._client = None
+        self.metrics = metrics
+        self.cancellation = cancellation
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
         self.model = "gpt-4o"
     
+    @property
+    def client(self):
+        """OpenAI client, created by the first request"""
+        if self._client is None:
+            self._client = openai_client(self.api_key)
+        return self._client
+    
     def generate_slide_transcript(self, slide_data: Dict[str, Any]) -> str:
         """Generate educational transcript for a single slide with natural conversation style and image analysis"""
         
@@ -51,17 +69,52 @@ class TranscriptGenerator:
             target_words = "60-100"
             target_seconds = "30-50"
         
+        # Load the slide image only now, so it is not held in memory for the whole job
+        if not slide_data.get('slide_image_base64') and slide_data.get('slide_image_path'):
+            slide_data = dict(slide_data, slide_image_base64=self._load_image_base64(slide_data['slide_image_path']))
+        
         # Use slide image for better context if available
         if slide_data.get('slide_image_base64'):
             return self._generate_transcript_with_image(slide_data, combined_text, target_words, target_seconds, is_title_slide, has_images)
         else:
             return self._generate_transcript_text_only(slide_data, combined_text, target_words, target_seconds, is_title_slide, has_images)
     
+    def _chat(self, **kwargs):
+        """Chat completion within the host-wide OpenAI concurrency limit"""
+        with provider_slot('openai'):
+            start = time.perf_counter()
+            try:
+                response = call_cancellable(self.cancellation, self.client.chat.completions.create, **kwargs)
+            except Exception:
+                self._record_call(start, error=True)
+                raise
+        
+        usage = getattr(response, 'usage', None)
+        self._record_call(
+            start,
+            prompt_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+            completion_tokens=getattr(usage, 'completion_tokens', 0) or 0
+        )
+        return response
+    
+    def _record_call(self, start: float, error: bool = False, **counts):
+        if self.metrics is not None:
+            self.metrics.record_api_call('openai', 'chat', time.perf_counter() - start, error=error, **counts)
+    
+    def _load_image_base64(self, image_path: str) -> str:
+        """Read a slide image from disk as base64 for the vision request"""
+        try:
+            with open(image_path, 'rb') as img_file:
+                return base64.b64encode(img_file.read()).decode()
+        except OSError as e:
+            print(f"Warning: Could not read slide image {image_path}: {e}")
+            return ""
+    
     def _generate_transcript_with_image(self, slide_data: Dict[str, Any], combined_text: str, target_words: str, target_seconds: str, is_title_slide: bool, has_images: bool) -> str:
         """Generate transcript using both text content and slide image for better context"""
         
         try:
-            response = self.client.chat.completions.create(
+            response = self._chat(
                 model=self.model,
                 messages=[
                     {
@@ -161,7 +214,7 @@ Respond with only the transcript text that will sound natural when spoken aloud.
 """
 
         try:
-            response = self.client.chat.completions.create(
+            response = self._chat(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are an expert instructional designer creating engaging educational narration."},
@@ -178,7 +231,7 @@ Respond with only the transcript text that will sound natural when spoken aloud.
             raise Exception(f"Failed to generate transcript for slide {slide_data['slide_number']}: {str(e)}")
 
         try:
-            response = self.client.chat.completions.create(
+            response = self._chat(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are an expert instructional designer creating engaging educational narration."},
@@ -217,7 +270,7 @@ Respond with only the refined transcript text.
 """
 
         try:
-            response = self.client.chat.completions.create(
+            response = self._chat(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are an expert instructional designer focused on creating the highest quality educational narration."},
@@ -264,7 +317,7 @@ Respond with only the introduction transcript.
 """
 
         try:
-            response = self.client.chat.completions.create(
+            response = self._chat(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are an expert instructional designer creating welcoming, engaging course introductions."},
@@ -4,50 +4,369 @@ Combines slide images with audio narration
 """
 
 import os
+import sys
 import subprocess
+import time
+import hashlib
+import uuid
+import shutil
+import threading
 from pathlib import Path
 from typing import List, Dict, Any
 import json
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from hls_publisher import HlsPublisher
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.metrics import run_subprocess
+
+# Encoding profiles for slide videos. Slides are still images, so a low frame
+# rate with a long GOP costs almost nothing visually and saves most of the encode.
+RENDER_PROFILES = {
+    'draft': {
+        'fps': 1,
+        'gop': 10,
+        'preset': 'ultrafast',
+        'crf': 30,
+        'width': 1280,
+        'height': 720,
+        'audio_bitrate': '96k',
+    },
+    'standard': {
+        'fps': 5,
+        'gop': 50,
+        'preset': 'veryfast',
+        'crf': 23,
+        'width': 1920,
+        'height': 1080,
+        'audio_bitrate': '192k',
+    },
+    'archival': {
+        'fps': 25,
+        'gop': 250,
+        'preset': 'slow',
+        'crf': 18,
+        'width': 1920,
+        'height': 1080,
+        'audio_bitrate': '256k',
+    },
+}
+
+DEFAULT_RENDER_PROFILE = 'standard'
+
+# Extra outputs that can be produced alongside the profile's main video.
+# They share the decode of each slide image and are encoded in the same ffmpeg run.
+RENDITIONS = {
+    '1080p': {'width': 1920, 'height': 1080},
+    '720p': {'width': 1280, 'height': 720},
+    '480p': {'width': 854, 'height': 480},
+    'audio': {'audio_only': True},
+}
+
+# Limits of the host segment cache, overridable with SEGMENT_CACHE_MAX_BYTES / SEGMENT_CACHE_MAX_AGE_DAYS
+DEFAULT_SEGMENT_CACHE_MAX_BYTES = 10 * 1024 ** 3
+DEFAULT_SEGMENT_CACHE_MAX_AGE_DAYS = 30
+SEGMENT_CACHE_PRUNE_INTERVAL = 60.0
+STALE_TEMP_SECONDS = 3600
+
+_last_cache_prune = {}
+_cache_prune_lock = threading.Lock()
+
+def prune_segment_cache(cache_dir: Path, max_bytes: int = None, max_age_days: float = None) -> int:
+    """Evict least recently used segments until the cache fits its limits, returning the bytes freed
+    
+    A segment and its renditions share the cache key and are evicted together.
+    Cache hits touch the segment, so its newest atime or mtime is when it was last used.
+    """
+    
+    if max_bytes is None:
+        max_bytes = int(os.environ.get('SEGMENT_CACHE_MAX_BYTES') or DEFAULT_SEGMENT_CACHE_MAX_BYTES)
+    if max_age_days is None:
+        max_age_days = float(os.environ.get('SEGMENT_CACHE_MAX_AGE_DAYS') or DEFAULT_SEGMENT_CACHE_MAX_AGE_DAYS)
+    
+    now = time.time()
+    groups = {}
+    with os.scandir(cache_dir) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith(".tmp"):
+                # Left behind by a process that died while storing a segment
+                if now - stat.st_mtime > STALE_TEMP_SECONDS:
+                    os.unlink(entry.path)
+                continue
+            
+            # <key>.mp4, <key>_720p.mp4, <key>_audio.m4a
+            key = entry.name.split(".")[0].split("_")[0]
+            group = groups.setdefault(key, {'paths': [], 'bytes': 0, 'used': 0})
+            group['paths'].append(entry.path)
+            group['bytes'] += stat.st_size
+            group['used'] = max(group['used'], stat.st_atime, stat.st_mtime)
+    
+    total = sum(group['bytes'] for group in groups.values())
+    cutoff = now - max_age_days * 86400
+    freed = 0
+    for group in sorted(groups.values(), key=lambda group: group['used']):
+        if total <= max_bytes and group['used'] >= cutoff:
+            break
+        for path in group['paths']:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        total -= group['bytes']
+        freed += group['bytes']
+    return freed
 
 class VideoRenderer:
-    def __init__(self):
+    def __init__(self, config: Dict[str, Any] = None, metrics=None, cancellation=None, work_queue=None, job_id: str = None,
+                 progress=None):
+        self.config = config or {}
+        self.metrics = metrics
+        self.cancellation = cancellation
+        # Called with (segments done, segments total) while a video is encoded
+        self.progress = progress
+        # With a work queue, segments are encoded by stage workers instead of local ffmpeg processes
+        self.work_queue = work_queue
+        self.job_id = job_id
         self.temp_dir = None
+        self.segment_workers, self.segment_threads = self._plan_segment_pool()
+        self.profile_name = self.config.get('render_profile') or DEFAULT_RENDER_PROFILE
+        if self.profile_name not in RENDER_PROFILES:
+            raise ValueError(f"Unsupported render profile: {self.profile_name}")
+        self.profile = RENDER_PROFILES[self.profile_name]
+        self.render_report = {}
+        
+        # The profile's own resolution is the main video, so it is never an extra rendition
+        primary_rendition = f"{self.profile['height']}p"
+        self.renditions = [name for name in self.config.get('renditions') or [] if name != primary_rendition]
+        for name in self.renditions:
+            if name not in RENDITIONS:
+                raise ValueError(f"Unsupported rendition: {name}")
+        self.rendition_outputs = {}
+        
+        # Encoded segments are shared by every job on this host
+        self.segment_cache_dir = None
+        if self.config.get('segment_cache', True):
+            cache_root = self.config.get('segment_cache_dir') or os.environ.get('SEGMENT_CACHE_DIR') or os.path.join("cache", "segments")
+            self.segment_cache_dir = Path(cache_root)
+            self.segment_cache_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_hits = 0
+        
+        # State for progressive (HLS) rendering, set up by start_progressive()
+        self.progressive = None
+    
+    def _report_progress(self, done: int, total: int):
+        if self.progress is not None:
+            try:
+                self.progress(done, total)
+            except Exception as e:
+                print(f"Warning: Could not report render progress: {e}")
+    
+    def _available_cores(self) -> int:
+        """Number of CPU cores this process is allowed to run on"""
+        try:
+            return len(os.sched_getaffinity(0))
+        except AttributeError:
+            return os.cpu_count() or 1
+    
+    def _plan_segment_pool(self):
+        """Split available cores between concurrent ffmpeg processes and their -threads"""
+        cores = self._available_cores()
+        
+        # libx264 scales poorly past a few threads on a single still-image stream,
+        # so several narrow encoders beat one wide one. Default to 2 threads each.
+        workers = self.config.get('segment_workers') or os.environ.get('SEGMENT_WORKERS') or max(1, cores // 2)
+        workers = max(1, min(int(workers), cores))
+        threads = max(1, cores // workers)
+        
+        return workers, threads
     
-    def create_video(self, pptx_path: str, audio_files: List[Dict[str, Any]], work_dir: Path) -> str:
-        """Create synchronized MP4 video from actual PowerPoint slides and audio"""
+    def create_video(self, pptx_path: str, audio_files: List[Dict[str, Any]], work_dir: Path, scratch_dir: Path = None) -> str:
+        """Create synchronized MP4 video from actual PowerPoint slides and audio
         
+        Slide images and segments go to scratch_dir, which may be on tmpfs; the
+        concatenated outputs are written to work_dir.
+        """
+        
+        scratch_dir = scratch_dir or work_dir
         try:
             # Convert slides to high-quality images using the actual PowerPoint content
-            slide_images = self._convert_slides_to_images(pptx_path, work_dir)
+            slide_images = self._convert_slides_to_images(pptx_path, scratch_dir)
             
             if not slide_images:
                 raise Exception("No slide images were generated")
             
+            encode_start = time.perf_counter()
+            
             # Create video segments for each slide with audio
-            video_segments = []
-            for audio_data in audio_files:
-                slide_num = audio_data['slide_number']
-                audio_file = audio_data['audio_file']
-                image_file = slide_images.get(slide_num)
-                
-                if image_file and os.path.exists(image_file) and os.path.exists(audio_file):
-                    segment = self._create_video_segment(image_file, audio_file, work_dir, slide_num)
-                    if segment and os.path.exists(segment):
-                        video_segments.append(segment)
-                else:
-                    print(f"Warning: Missing files for slide {slide_num} - Image: {image_file}, Audio: {audio_file}")
+            video_segments = self._create_video_segments(slide_images, audio_files, scratch_dir)
             
             if not video_segments:
                 raise Exception("No video segments were created successfully")
             
             # Concatenate all segments into final video
             final_video = self._concatenate_segments(video_segments, work_dir)
+            self._concatenate_renditions(video_segments, work_dir)
+            
+            self._record_render_report(final_video, len(video_segments), encode_start)
+            
+            return final_video
+            
+        except Exception as e:
+            raise Exception(f"Video rendering failed: {str(e)}")
+    
+    def render_segments(self, pptx_path: str, audio_files: List[Dict[str, Any]], work_dir: Path, first_slide: int = 1) -> List[str]:
+        """Encode the segments of one shard of a sharded job, without concatenating them"""
+        
+        try:
+            slide_images = self._convert_slides_to_images(pptx_path, work_dir)
+            
+            if not slide_images:
+                raise Exception("No slide images were generated")
+            
+            # The shard's deck only holds its own range, so its images are numbered from 1
+            slide_images = {first_slide - 1 + slide_num: image for slide_num, image in slide_images.items()}
+            
+            return self._create_video_segments(slide_images, audio_files, work_dir)
+        
+        except Exception as e:
+            raise Exception(f"Video rendering failed: {str(e)}")
+    
+    def concatenate_shards(self, video_segments: List[str], work_dir: Path, cached_segments: int = 0) -> str:
+        """Join the segments the shards of a job rendered into its final video"""
+        
+        try:
+            if not video_segments:
+                raise Exception("No video segments were created successfully")
+            
+            encode_start = time.perf_counter()
+            final_video = self._concatenate_segments(video_segments, work_dir)
+            self._concatenate_renditions(video_segments, work_dir)
+            
+            # Segments were encoded by the shards, so encode_seconds only covers the concatenation
+            self.cache_hits = cached_segments
+            self._record_render_report(final_video, len(video_segments), encode_start)
+            
+            return final_video
+        
+        except Exception as e:
+            raise Exception(f"Video rendering failed: {str(e)}")
+    
+    def _record_render_report(self, final_video: str, segment_count: int, encode_start: float):
+        """Store encode time and output size for the active render profile"""
+        
+        self.render_report = {
+            'profile': self.profile_name,
+            'settings': dict(self.profile),
+            'segments': segment_count,
+            'cached_segments': self.cache_hits,
+            'encode_seconds': round(time.perf_counter() - encode_start, 3),
+            'output_bytes': os.path.getsize(final_video),
+            'renditions': {
+                name: os.path.getsize(path) for name, path in self.rendition_outputs.items()
+            },
+        }
+    
+    def start_progressive(self, pptx_path: str, work_dir: Path, hls_dir: Path):
+        """Start rendering slides as soon as their narration exists, publishing each to HLS
+        
+        Slide images come from the original deck, since the narrated copy only adds
+        hidden audio shapes and does not exist yet while audio is being synthesized.
+        """
+        
+        executor = ThreadPoolExecutor(max_workers=self.segment_workers)
+        self.progressive = {
+            'work_dir': work_dir,
+            'executor': executor,
+            # Queued first, so every segment task can simply wait on it
+            'images': executor.submit(self._convert_slides_to_images, pptx_path, work_dir),
+            'publisher': HlsPublisher(hls_dir, self.profile['gop'] / self.profile['fps'], metrics=self.metrics, cancellation=self.cancellation),
+            'order': [],
+            'futures': [],
+            'done': {},
+            'published': 0,
+            'lock': threading.Lock(),
+            'started': time.perf_counter(),
+        }
+    
+    def submit_slide(self, slide_num: int, audio_file: str):
+        """Queue one slide's segment for encoding in progressive mode"""
+        
+        state = self.progressive
+        state['order'].append(slide_num)
+        state['futures'].append(state['executor'].submit(self._render_progressive_segment, slide_num, audio_file))
+    
+    def _render_progressive_segment(self, slide_num: int, audio_file: str):
+        """Encode one slide, then publish every segment that is now ready in slide order"""
+        
+        state = self.progressive
+        image_file = state['images'].result().get(slide_num)
+        
+        segment, cache_hit = None, False
+        if image_file and os.path.exists(image_file) and os.path.exists(audio_file):
+            segment, cache_hit = self._render_segment(image_file, audio_file, state['work_dir'], slide_num)
+        else:
+            print(f"Warning: Missing files for slide {slide_num} - Image: {image_file}, Audio: {audio_file}")
+        
+        with state['lock']:
+            state['done'][slide_num] = (segment, cache_hit)
+            self._publish_ready_segments()
+    
+    def _publish_ready_segments(self):
+        """Append finished segments to the playlist without skipping ahead of a pending slide"""
+        
+        state = self.progressive
+        while state['published'] < len(state['order']):
+            slide_num = state['order'][state['published']]
+            if slide_num not in state['done']:
+                break
+            segment, _ = state['done'][slide_num]
+            if segment:
+                state['publisher'].add_segment(segment, slide_num)
+            state['published'] += 1
+    
+    def finish_progressive(self) -> str:
+        """Wait for outstanding segments, close the playlist and build the full MP4"""
+        
+        state = self.progressive
+        
+        try:
+            for future in state['futures']:
+                future.result()
+            
+            results = [state['done'][slide_num] for slide_num in state['order']]
+            video_segments = [segment for segment, _ in results if segment and os.path.exists(segment)]
+            self.cache_hits = sum(1 for _, cache_hit in results if cache_hit)
+            
+            if not video_segments:
+                raise Exception("No video segments were created successfully")
+            
+            state['publisher'].finalize()
+            
+            final_video = self._concatenate_segments(video_segments, state['work_dir'])
+            self._concatenate_renditions(video_segments, state['work_dir'])
+            self._record_render_report(final_video, len(video_segments), state['started'])
             
             return final_video
             
         except Exception as e:
             raise Exception(f"Video rendering failed: {str(e)}")
+        finally:
+            state['executor'].shutdown(wait=True)
+    
+    def stop_progressive(self):
+        """Drop the queued encodes of a job that failed or was cancelled, waiting for running ones"""
+        
+        if self.progressive:
+            self.progressive['executor'].shutdown(wait=True, cancel_futures=True)
     
     def _convert_slides_to_images(self, pptx_path: str, work_dir: Path) -> Dict[int, str]:
         """Convert PowerPoint slides to high-resolution images using LibreOffice and pdftoppm"""
@@ -58,39 +377,6 @@ class VideoRenderer:
         # Use LibreOffice as the primary method for better fidelity
         return self._convert_slides_with_libreoffice(pptx_path, images_dir)
     
-    def _render_shape_to_image(self, shape, draw, offset_x, offset_y, scale):
-        """Render a PowerPoint shape to PIL image"""
-        try:
-            from pptx.shapes.base import BaseShape
-            from pptx.enum.shapes import MSO_SHAPE_TYPE
-            from PIL import ImageFont
-            
-            # Get shape position and size
-            left = int((shape.left * scale) + offset_x) if hasattr(shape, 'left') else 0
-            top = int((shape.top * scale) + offset_y) if hasattr(shape, 'top') else 0
-            width = int(shape.width * scale) if hasattr(shape, 'width') else 100
-            height = int(shape.height * scale) if hasattr(shape, 'height') else 100
-            
-            # Handle text shapes
-            if hasattr(shape, 'text_frame') and shape.text_frame:
-                text = shape.text_frame.text
-                if text.strip():
-                    try:
-                        font = ImageFont.load_default()
-                        draw.text((left, top), text, fill='black', font=font)
-                    except:
-                        draw.text((left, top), text, fill='black')
-            
-            # Handle other shape types (simplified)
-            elif hasattr(shape, 'shape_type'):
-                # Draw a placeholder rectangle for other shapes
-                if width > 0 and height > 0:
-                    draw.rectangle([left, top, left + width, top + height], outline='gray')
-        
-        except Exception as e:
-            # Skip problematic shapes
-            pass
-    
     def _convert_slides_with_libreoffice(self, pptx_path: str, images_dir: Path) -> Dict[int, str]:
         """Primary method using LibreOffice to convert slides to high-quality images"""
         
@@ -106,7 +392,7 @@ class VideoRenderer:
                 pptx_path
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=180)
+            result = run_subprocess(self.metrics, 'libreoffice', cmd, cancellation=self.cancellation, capture_output=True, text=True, timeout=180)
             if result.returncode != 0:
                 raise Exception(f"LibreOffice PDF conversion failed: {result.stderr}")
             
@@ -133,7 +419,7 @@ class VideoRenderer:
                     str(images_dir / "slide")
                 ]
                 
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=180)
+                result = run_subprocess(self.metrics, 'pdftoppm', cmd, cancellation=self.cancellation, capture_output=True, text=True, timeout=180)
                 
                 if result.returncode == 0:
                     print(f"pdftoppm conversion successful")
@@ -161,7 +447,7 @@ class VideoRenderer:
                         str(images_dir / "slide_%03d.png")
                     ]
                     
-                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=180)
+                    result = run_subprocess(self.metrics, 'convert', cmd, cancellation=self.cancellation, capture_output=True, text=True, timeout=180)
                     
                     if result.returncode == 0:
                         print("ImageMagick conversion successful")
@@ -196,8 +482,163 @@ class VideoRenderer:
         except Exception as e:
             raise Exception(f"Failed to convert slides to images with LibreOffice: {str(e)}")
     
-    def _create_video_segment(self, image_file: str, audio_file: str, work_dir: Path, slide_num: int) -> str:
-        """Create a video segment from an image and audio file"""
+    def _create_video_segments(self, slide_images: Dict[int, str], audio_files: List[Dict[str, Any]], work_dir: Path) -> List[str]:
+        """Encode slide segments concurrently, returning them in slide order"""
+        
+        jobs = []
+        for audio_data in audio_files:
+            slide_num = audio_data['slide_number']
+            audio_file = audio_data['audio_file']
+            image_file = slide_images.get(slide_num)
+            
+            if image_file and os.path.exists(image_file) and os.path.exists(audio_file):
+                jobs.append((image_file, audio_file, slide_num))
+            else:
+                print(f"Warning: Missing files for slide {slide_num} - Image: {image_file}, Audio: {audio_file}")
+        
+        if not jobs:
+            return []
+        
+        if self.work_queue:
+            results = self._encode_on_workers(jobs, work_dir)
+        else:
+            with ThreadPoolExecutor(max_workers=self.segment_workers) as executor:
+                # Each worker only waits on its ffmpeg subprocess, so threads are enough here
+                futures = [
+                    executor.submit(self._render_segment, image_file, audio_file, work_dir, slide_num)
+                    for image_file, audio_file, slide_num in jobs
+                ]
+                # Collect in submission order so _concatenate_segments sees slides in sequence
+                results = []
+                for future in futures:
+                    results.append(future.result())
+                    self._report_progress(len(results), len(jobs))
+        
+        segments = [segment for segment, _ in results]
+        self.cache_hits = sum(1 for _, cache_hit in results if cache_hit)
+        
+        # A missing segment would silently drop its slide from the video
+        missing = [
+            str(slide_num) for (_, _, slide_num), segment in zip(jobs, segments)
+            if not segment or not os.path.exists(segment)
+        ]
+        if missing:
+            raise Exception(f"Encoded segments are missing for slides {', '.join(missing)}")
+        
+        return segments
+    
+    def _encode_on_workers(self, jobs, work_dir: Path):
+        """Queue every segment for the encoder nodes, then collect (segment, cache_hit) in slide order"""
+        
+        # Segments of an earlier attempt are deleted with its scratch dir, so its tasks are never reused
+        attempt = uuid.uuid4().hex[:12]
+        task_ids = [
+            self.work_queue.submit(self.job_id, 'encode', f"{slide_num}:{attempt}", {
+                'image_file': image_file,
+                'audio_file': audio_file,
+                'work_dir': str(Path(work_dir).resolve()),
+                'slide_number': slide_num,
+                'config': self.config,
+            })
+            for image_file, audio_file, slide_num in jobs
+        ]
+        
+        results = []
+        for task_id in task_ids:
+            result = self.work_queue.wait(task_id, self.cancellation)
+            results.append((result['segment'], result['cache_hit']))
+            self._report_progress(len(results), len(task_ids))
+        return results
+    
+    def encode_segment(self, image_file: str, audio_file: str, work_dir: Path, slide_num: int):
+        """Encode one slide for a stage worker, returning (segment, cache_hit)"""
+        return self._render_segment(image_file, audio_file, work_dir, slide_num)
+    
+    def _render_segment(self, image_file: str, audio_file: str, work_dir: Path, slide_num: int):
+        """Return (segment, cache_hit) for one slide, reusing a cached encode when inputs are unchanged"""
+        
+        if not self.segment_cache_dir:
+            return self._create_video_segment(image_file, audio_file, work_dir, slide_num, self.segment_threads), False
+        
+        cache_key = self._segment_cache_key(image_file, audio_file)
+        cached_segment = self.segment_cache_dir / f"{cache_key}.mp4"
+        output_file = work_dir / f"segment_{slide_num:03d}.mp4"
+        
+        cached_files = [(str(cached_segment), str(output_file))] + [
+            (self._rendition_file(str(cached_segment), name), self._rendition_file(str(output_file), name))
+            for name in self.renditions
+        ]
+        
+        if all(os.path.exists(cached) for cached, _ in cached_files):
+            try:
+                for cached, local in cached_files:
+                    self._link_or_copy(Path(cached), Path(local))
+                # Marks the entry as recently used for eviction
+                os.utime(cached_segment)
+                return str(output_file), True
+            except FileNotFoundError:
+                # Evicted by another process in the meantime; encode it again
+                pass
+        
+        # Old segments may be hardlinks into the cache; never let ffmpeg overwrite them in place
+        for _, local in cached_files:
+            if os.path.exists(local):
+                os.unlink(local)
+        
+        segment = self._create_video_segment(image_file, audio_file, work_dir, slide_num, self.segment_threads)
+        for cached, local in cached_files:
+            self._store_cached_segment(local, Path(cached))
+        self.prune_segment_cache()
+        return segment, False
+    
+    def prune_segment_cache(self):
+        """Keep the host segment cache within its limits; runs at most once a minute per process"""
+        
+        cache_dir = str(self.segment_cache_dir.resolve())
+        with _cache_prune_lock:
+            if time.time() - _last_cache_prune.get(cache_dir, 0) < SEGMENT_CACHE_PRUNE_INTERVAL:
+                return
+            _last_cache_prune[cache_dir] = time.time()
+        
+        try:
+            prune_segment_cache(self.segment_cache_dir)
+        except OSError as e:
+            print(f"Warning: Could not prune the segment cache: {e}")
+    
+    def _segment_cache_key(self, image_file: str, audio_file: str) -> str:
+        """Hash of the slide image, the narration clip and the render profile"""
+        
+        digest = hashlib.sha256()
+        for path in (image_file, audio_file):
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        digest.update(json.dumps(self.profile, sort_keys=True).encode())
+        return digest.hexdigest()
+    
+    def _store_cached_segment(self, segment: str, cached_segment: Path):
+        """Publish an encoded segment into the host cache"""
+        
+        try:
+            # Write under a unique name then rename, so concurrent jobs never see a partial file
+            temp_path = cached_segment.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            self._link_or_copy(Path(segment), temp_path)
+            os.replace(temp_path, cached_segment)
+        except OSError as e:
+            print(f"Warning: Could not cache segment {segment}: {e}")
+    
+    def _link_or_copy(self, source: Path, destination: Path):
+        """Hardlink when possible, falling back to a copy across filesystems"""
+        
+        if destination.exists():
+            destination.unlink()
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copy2(source, destination)
+    
+    def _create_video_segment(self, image_file: str, audio_file: str, work_dir: Path, slide_num: int, threads: int = 0) -> str:
+        """Create a video segment (plus any extra renditions) from an image and audio file"""
         
         output_file = work_dir / f"segment_{slide_num:03d}.mp4"
         
@@ -205,25 +646,61 @@ class VideoRenderer:
             # Get audio duration
             audio_duration = self._get_audio_duration(audio_file)
             
+            profile = self.profile
+            
+            # Every video output gets its own branch of one split, so the image is decoded once
+            video_outputs = [(str(output_file), profile['width'], profile['height'])]
+            for name in self.renditions:
+                rendition = RENDITIONS[name]
+                if not rendition.get('audio_only'):
+                    video_outputs.append((self._rendition_file(str(output_file), name), rendition['width'], rendition['height']))
+            
+            filter_graph = f"[0:v]split={len(video_outputs)}" + "".join(f"[s{i}]" for i in range(len(video_outputs)))
+            for i, (_, width, height) in enumerate(video_outputs):
+                # Scale and pad each branch to its output size
+                filter_graph += f";[s{i}]scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black[v{i}]"
+            
             # Create video segment using FFmpeg
             cmd = [
                 "ffmpeg",
                 "-y",  # Overwrite output files
                 "-loop", "1",  # Loop the image
+                "-framerate", str(profile['fps']),  # Only generate as many frames as the profile needs
                 "-i", image_file,  # Input image
                 "-i", audio_file,  # Input audio
-                "-c:v", "libx264",  # Video codec
-                "-tune", "stillimage",  # Optimize for still images
-                "-c:a", "aac",  # Audio codec
-                "-b:a", "192k",  # Audio bitrate
-                "-pix_fmt", "yuv420p",  # Pixel format for compatibility
-                "-shortest",  # Stop when shortest input ends
-                "-t", str(audio_duration),  # Duration
-                "-vf", "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2:black",  # Scale and pad to 1080p
-                str(output_file)
+                "-filter_complex", filter_graph,
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            for i, (path, _, _) in enumerate(video_outputs):
+                cmd += [
+                    "-map", f"[v{i}]",
+                    "-map", "1:a",
+                    "-c:v", "libx264",  # Video codec
+                    "-preset", profile['preset'],
+                    "-crf", str(profile['crf']),
+                    "-g", str(profile['gop']),  # Keyframe interval
+                    "-r", str(profile['fps']),
+                    "-tune", "stillimage",  # Optimize for still images
+                    "-c:a", "aac",  # Audio codec
+                    "-b:a", profile['audio_bitrate'],  # Audio bitrate
+                    "-pix_fmt", "yuv420p",  # Pixel format for compatibility
+                    "-shortest",  # Stop when shortest input ends
+                    "-t", str(audio_duration),  # Duration
+                    "-threads", str(threads),  # 0 lets ffmpeg pick; the pool passes its per-process share
+                    path
+                ]
+            
+            if 'audio' in self.renditions:
+                # Narration-only track for audio downloads
+                cmd += [
+                    "-map", "1:a",
+                    "-c:a", "aac",
+                    "-b:a", profile['audio_bitrate'],
+                    "-t", str(audio_duration),
+                    self._rendition_file(str(output_file), 'audio')
+                ]
+            
+            result = run_subprocess(self.metrics, 'ffmpeg_segment', cmd, cancellation=self.cancellation, capture_output=True, text=True, timeout=300)
             
             if result.returncode != 0:
                 raise Exception(f"FFmpeg failed for slide {slide_num}: {result.stderr}")
@@ -237,6 +714,12 @@ class VideoRenderer:
         except Exception as e:
             raise Exception(f"Failed to create video segment for slide {slide_num}: {str(e)}")
     
+    def _rendition_file(self, segment_file: str, name: str) -> str:
+        """Path of a rendition that sits next to a main segment, e.g. segment_001_720p.mp4"""
+        base, _ = os.path.splitext(segment_file)
+        extension = ".m4a" if RENDITIONS[name].get('audio_only') else ".mp4"
+        return f"{base}_{name}{extension}"
+    
     def _get_audio_duration(self, audio_file: str) -> float:
         """Get the duration of an audio file in seconds"""
         
@@ -249,7 +732,7 @@ class VideoRenderer:
                 audio_file
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            result = run_subprocess(self.metrics, 'ffprobe', cmd, cancellation=self.cancellation, capture_output=True, text=True, timeout=30)
             
             if result.returncode != 0:
                 raise Exception(f"FFprobe failed: {result.stderr}")
@@ -261,14 +744,29 @@ class VideoRenderer:
         except (ValueError, FileNotFoundError) as e:
             raise Exception(f"Failed to get audio duration: {str(e)}")
     
-    def _concatenate_segments(self, video_segments: List[str], work_dir: Path) -> str:
+    def _concatenate_renditions(self, video_segments: List[str], work_dir: Path):
+        """Stream-copy the per-slide pieces of every extra rendition into full outputs"""
+        
+        self.rendition_outputs = {}
+        for name in self.renditions:
+            extension = ".m4a" if RENDITIONS[name].get('audio_only') else ".mp4"
+            self.rendition_outputs[name] = self._concatenate_segments(
+                [self._rendition_file(segment, name) for segment in video_segments],
+                work_dir,
+                f"final_{name}{extension}"
+            )
+    
+    def _concatenate_segments(self, video_segments: List[str], work_dir: Path, output_name: str = "final_video.mp4") -> str:
         """Concatenate video segments into final MP4"""
         
         if not video_segments:
             raise Exception("No video segments to concatenate")
         
-        concat_file = work_dir / "concat_list.txt"
-        output_file = work_dir / "final_video.mp4"
+        if output_name == "final_video.mp4":
+            concat_file = work_dir / "concat_list.txt"
+        else:
+            concat_file = work_dir / f"concat_list_{Path(output_name).stem}.txt"
+        output_file = work_dir / output_name
         
         try:
             # Create concatenation file list
@@ -287,7 +785,7 @@ class VideoRenderer:
                 str(output_file)
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+            result = run_subprocess(self.metrics, 'ffmpeg_concat', cmd, cancellation=self.cancellation, capture_output=True, text=True, timeout=600)
             
             if result.returncode != 0:
                 raise Exception(f"Video concatenation failed: {result.stderr}")
@@ -300,19 +798,3 @@ class VideoRenderer:
             raise Exception("FFmpeg not found. Please install FFmpeg.")
         except Exception as e:
             raise Exception(f"Failed to concatenate video segments: {str(e)}")
-    
-    def add_intro_outro(self, video_file: str, intro_text: str = "", outro_text: str = "") -> str:
-        """Add intro and outro slides to the video"""
-        
-        if not intro_text and not outro_text:
-            return video_file
-        
-        try:
-            # This would create intro/outro slides and add them to the video
-            # Implementation would depend on specific requirements
-            # For now, return the original video
-            return video_file
-            
-        except Exception as e:
-            print(f"Warning: Failed to add intro/outro: {e}")
-            return video_file
@@ -0,0 +1,8 @@
+import os
+import sys
+
+SERVER_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+# Modules import each other the way the services do at runtime
+sys.path.append(SERVER_DIR)
+sys.path.append(os.path.join(SERVER_DIR, 'services'))
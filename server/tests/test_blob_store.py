@@ -0,0 +1,65 @@
+import os
+import time
+
+from utils.blob_store import BlobStore, PUBLISHED_MARKER
+
+def _job(outputs, name, age_days, published=True, size=1000):
+    version_dir = outputs / f".{name}.version.test"
+    version_dir.mkdir(parents=True)
+    (version_dir / "video.mp4").write_bytes(os.urandom(size))
+    if published:
+        (version_dir / PUBLISHED_MARKER).write_text("{}")
+    stamp = time.time() - age_days * 86400
+    os.utime(version_dir, (stamp, stamp))
+    job_dir = outputs / name
+    os.symlink(version_dir.name, job_dir)
+    return job_dir
+
+def test_compact_evicts_only_published_jobs_without_checkpoint(tmp_path):
+    outputs = tmp_path / "outputs"
+    checkpoints = tmp_path / "jobs"
+    store = BlobStore(outputs, checkpoints)
+    
+    old = _job(outputs, "old", 30)
+    streaming = _job(outputs, "streaming", 40, published=False)
+    resumable = _job(outputs, "resumable", 50)
+    (checkpoints / "resumable").mkdir(parents=True)
+    current = _job(outputs, "current", 60)
+    
+    report = store.compact(max_bytes=0, max_age_days=1, keep=["current"])
+    
+    assert report['evicted_jobs'] == ["old"]
+    assert not old.exists()
+    assert streaming.exists() and resumable.exists() and current.exists()
+    assert not (outputs / ".old.version.test").exists()
+    assert (outputs / ".streaming.version.test").exists()
+
+def test_compact_evicts_legacy_directories_without_marker(tmp_path):
+    outputs = tmp_path / "outputs"
+    store = BlobStore(outputs, tmp_path / "jobs")
+    
+    legacy = outputs / "legacy"
+    legacy.mkdir(parents=True)
+    (legacy / "video.mp4").write_bytes(os.urandom(1000))
+    stamp = time.time() - 30 * 86400
+    os.utime(legacy, (stamp, stamp))
+    
+    report = store.compact(max_bytes=0, max_age_days=1)
+    
+    assert report['evicted_jobs'] == ["legacy"]
+    assert not legacy.exists()
+
+def test_compact_keeps_live_versions_and_removes_abandoned_ones(tmp_path):
+    outputs = tmp_path / "outputs"
+    store = BlobStore(outputs, tmp_path / "jobs")
+    
+    current = _job(outputs, "current", 2)
+    abandoned = outputs / ".current.version.abandoned"
+    abandoned.mkdir()
+    stamp = time.time() - 2 * 86400
+    os.utime(abandoned, (stamp, stamp))
+    
+    store.compact(max_bytes=None, max_age_days=None, keep=["current"])
+    
+    assert (current / "video.mp4").exists()
+    assert not abandoned.exists()
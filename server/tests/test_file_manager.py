@@ -0,0 +1,171 @@
+import io
+import sys
+import zipfile
+import threading
+
+import pytest
+
+from utils import file_manager
+from utils.file_manager import FileManager
+
+ENTRIES = {
+    'stored.bin': (bytes(range(256)) * 64, zipfile.ZIP_STORED),
+    'deflated.xml': (b'<a>' + b'text ' * 5000 + b'</a>', zipfile.ZIP_DEFLATED),
+    'empty.txt': (b'', zipfile.ZIP_DEFLATED),
+}
+
+SLIDE_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<{p}:sld xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+    'xmlns:{p}="http://schemas.openxmlformats.org/presentationml/2006/main" '
+    'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006" '
+    'xmlns:{ext}="http://schemas.microsoft.com/office/powerpoint/2010/main" mc:Ignorable="{ext}">'
+    '<{p}:cSld><{p}:spTree/></{p}:cSld></{p}:sld>'
+)
+
+class Unseekable(io.RawIOBase):
+    """A stream zipfile cannot seek back in, so every entry gets a data descriptor"""
+    
+    def __init__(self):
+        self.buffer = io.BytesIO()
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        return self.buffer.write(data)
+    
+    def tell(self):
+        raise OSError("not seekable")
+
+def _write_source(path, streamed):
+    stream = Unseekable() if streamed else open(path, 'wb')
+    with zipfile.ZipFile(stream, 'w') as archive:
+        for name, (data, compression) in ENTRIES.items():
+            archive.writestr(name, data, compression)
+    if streamed:
+        path.write_bytes(stream.buffer.getvalue())
+    else:
+        stream.close()
+
+@pytest.mark.parametrize('raw_copy', [True, False])
+@pytest.mark.parametrize('streamed', [False, True])
+def test_copy_zip_entry_round_trip(tmp_path, monkeypatch, raw_copy, streamed):
+    monkeypatch.setattr(file_manager, 'RAW_ZIP_COPY', raw_copy and file_manager.RAW_ZIP_COPY)
+    manager = FileManager(tmp_path / "work")
+    source_path = tmp_path / "source.zip"
+    target_path = tmp_path / "target.zip"
+    _write_source(source_path, streamed)
+    
+    with zipfile.ZipFile(source_path) as source, zipfile.ZipFile(target_path, 'w') as target:
+        assert all(bool(info.flag_bits & 0x08) == streamed for info in source.infolist())
+        for info in source.infolist():
+            manager._copy_zip_entry(source, target, info)
+        target.writestr('added.xml', b'<added/>', zipfile.ZIP_DEFLATED)
+    
+    with zipfile.ZipFile(target_path) as target:
+        assert target.testzip() is None
+        assert target.namelist() == list(ENTRIES) + ['added.xml']
+        for name, (data, compression) in ENTRIES.items():
+            assert target.read(name) == data
+            assert target.getinfo(name).compress_type == compression
+
+def test_raw_copy_falls_back_when_zipfile_internals_change(tmp_path, monkeypatch):
+    if not file_manager.RAW_ZIP_COPY:
+        pytest.skip("raw ZIP copies are disabled on this Python")
+    manager = FileManager(tmp_path / "work")
+    source_path = tmp_path / "source.zip"
+    target_path = tmp_path / "target.zip"
+    _write_source(source_path, streamed=False)
+    
+    with zipfile.ZipFile(source_path) as source, zipfile.ZipFile(target_path, 'w') as target:
+        file_header = zipfile.ZipInfo.FileHeader
+        
+        def changed_header(self, *args):
+            # zipfile's own callers keep working; only the raw copy's call is broken
+            if sys._getframe(1).f_code.co_name == '_copy_zip_entry':
+                raise TypeError("FileHeader() takes 1 positional argument but 2 were given")
+            return file_header(self, *args)
+        
+        monkeypatch.setattr(zipfile.ZipInfo, 'FileHeader', changed_header)
+        for info in source.infolist():
+            manager._copy_zip_entry(source, target, info)
+        monkeypatch.undo()
+    
+    with zipfile.ZipFile(target_path) as target:
+        assert target.testzip() is None
+        assert target.namelist() == list(ENTRIES)
+        for name, (data, compression) in ENTRIES.items():
+            assert target.read(name) == data
+
+def test_serialized_slide_keeps_its_own_prefixes(tmp_path):
+    pytest.importorskip('lxml')
+    manager = FileManager(tmp_path / "work")
+    errors = []
+    
+    def embed(p, ext):
+        try:
+            for _ in range(50):
+                xml = manager._embed_audio_in_slide(SLIDE_XML.format(p=p, ext=ext).encode(), 3)
+                assert f'mc:Ignorable="{ext}"'.encode() in xml
+                assert f'xmlns:{ext}='.encode() in xml
+                assert f'<{p}:sld '.encode() in xml and f'<{p}:sp>'.encode() in xml
+        except AssertionError as e:
+            errors.append(e)
+    
+    # Decks declaring the same namespaces under different prefixes, embedded concurrently
+    threads = [threading.Thread(target=embed, args=args) for args in [('p', 'p14'), ('pml', 'v14')] * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+def test_relationships_created_for_slide_without_any(tmp_path):
+    pytest.importorskip('lxml')
+    manager = FileManager(tmp_path / "work")
+    xml = manager._update_slide_relationships(None, 2, "audio2.mp3")
+    assert b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">' in xml
+    assert b'Id="rId102"' in xml and b'Target="../media/audio2.mp3"' in xml
+
+def _publish(manager, final_dir, files):
+    staging_dir = manager.create_staging_dir(final_dir)
+    for name, data in files.items():
+        (staging_dir / name).write_text(data)
+    manager.commit_directory(staging_dir, final_dir)
+    return staging_dir
+
+def test_commit_directory_flips_a_symlink_between_versions(tmp_path):
+    manager = FileManager(tmp_path / "work")
+    final_dir = tmp_path / "outputs" / "job"
+    
+    # A stream published while the job runs
+    hls_dir = manager.open_directory(final_dir) / "hls"
+    hls_dir.mkdir()
+    (hls_dir / "playlist.m3u8").write_text("#EXTM3U\n")
+    live_version = final_dir.resolve()
+    
+    first = _publish(manager, final_dir, {'video.mp4': "first"})
+    assert final_dir.is_symlink() and final_dir.resolve() == first.resolve()
+    assert (final_dir / "video.mp4").read_text() == "first"
+    assert (final_dir / "hls" / "playlist.m3u8").read_text() == "#EXTM3U\n"
+    assert not live_version.exists()
+    
+    second = _publish(manager, final_dir, {'video.mp4': "second"})
+    assert final_dir.resolve() == second.resolve()
+    assert (final_dir / "video.mp4").read_text() == "second"
+    assert (final_dir / "hls" / "playlist.m3u8").read_text() == "#EXTM3U\n"
+    assert not first.exists()
+    assert sorted(path.name for path in final_dir.parent.iterdir()) == sorted(["job", second.name])
+
+def test_commit_directory_versions_a_legacy_directory(tmp_path):
+    manager = FileManager(tmp_path / "work")
+    final_dir = tmp_path / "outputs" / "job"
+    final_dir.mkdir(parents=True)
+    (final_dir / "old.txt").write_text("old")
+    
+    staging_dir = _publish(manager, final_dir, {'video.mp4': "new"})
+    assert final_dir.is_symlink() and final_dir.resolve() == staging_dir.resolve()
+    assert (final_dir / "old.txt").read_text() == "old"
+    assert sorted(path.name for path in final_dir.parent.iterdir()) == sorted(["job", staging_dir.name])
@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+from utils.metrics import JobMetrics
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/clear_refs'), reason="needs Linux /proc")
+def test_stage_peak_rss_covers_only_that_stage():
+    metrics = JobMetrics("job")
+    with metrics.stage('allocate'):
+        buffer = b'x' * (200 * 1024 ** 2)
+        del buffer
+    with metrics.stage('idle'):
+        pass
+    
+    stages = metrics.snapshot()['stages']
+    assert stages['allocate']['peak_rss_bytes'] - stages['idle']['peak_rss_bytes'] > 100 * 1024 ** 2
+    assert metrics.snapshot()['peak_rss_bytes'] >= stages['allocate']['peak_rss_bytes']
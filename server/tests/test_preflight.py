@@ -0,0 +1,51 @@
+import zipfile
+
+import pytest
+
+from utils.preflight import preflight_deck, slide_part_names
+
+PRESENTATION = (
+    '<p:presentation xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<p:sldIdLst><p:sldId id="256" r:id="rId2"/><p:sldId id="257" r:id="rId3"/></p:sldIdLst>'
+    '</p:presentation>'
+)
+
+SLIDE = (
+    '<p:sld xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main" '
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+    '<p:cSld><p:spTree><p:sp><p:txBody><a:p><a:r><a:t>{text}</a:t></a:r></a:p></p:txBody></p:sp>'
+    '<p:pic/></p:spTree></p:cSld></p:sld>'
+)
+
+SLIDE_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/slide'
+
+def _deck(path, targets):
+    relationships = "".join(
+        f'<Relationship Id="rId{index}" Type="{SLIDE_REL}" Target="{target}"/>'
+        for index, target in enumerate(targets, start=2)
+    )
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('ppt/presentation.xml', PRESENTATION)
+        archive.writestr(
+            'ppt/_rels/presentation.xml.rels',
+            f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{relationships}</Relationships>'
+        )
+        archive.writestr('ppt/slides/slide1.xml', SLIDE.format(text="Hello"))
+        archive.writestr('ppt/slides/slide2.xml', SLIDE.format(text="World!"))
+    return str(path)
+
+@pytest.mark.parametrize('targets', [
+    ["slides/slide1.xml", "slides/slide2.xml"],
+    ["/ppt/slides/slide1.xml", "/ppt/slides/slide2.xml"],
+    ["../ppt/slides/slide1.xml", "/ppt/slides/../slides/slide2.xml"],
+])
+def test_slide_targets_resolve_to_part_names(tmp_path, targets):
+    deck = _deck(tmp_path / "deck.pptx", targets)
+    with zipfile.ZipFile(deck) as archive:
+        assert slide_part_names(archive) == ['ppt/slides/slide1.xml', 'ppt/slides/slide2.xml']
+    
+    info = preflight_deck(deck)
+    assert info['slide_count'] == 2
+    assert info['picture_count'] == 2
+    assert info['text_chars'] == len("Hello") + len("World!")
@@ -0,0 +1,38 @@
+import os
+import time
+
+from video_renderer import prune_segment_cache
+
+def _entry(cache_dir, key, size, used_days_ago, renditions=()):
+    stamp = time.time() - used_days_ago * 86400
+    paths = [cache_dir / f"{key}.mp4"] + [cache_dir / f"{key}_{name}" for name in renditions]
+    for path in paths:
+        path.write_bytes(b"\0" * size)
+        os.utime(path, (stamp, stamp))
+    return paths
+
+def test_prune_evicts_least_recently_used_entries_with_their_renditions(tmp_path):
+    oldest = _entry(tmp_path, "aaa", 100, 3, renditions=["720p.mp4", "audio.m4a"])
+    middle = _entry(tmp_path, "bbb", 100, 2)
+    newest = _entry(tmp_path, "ccc", 100, 1)
+    
+    assert prune_segment_cache(tmp_path, max_bytes=250, max_age_days=30) == 300
+    assert not any(path.exists() for path in oldest)
+    assert all(path.exists() for path in middle + newest)
+
+def test_prune_evicts_entries_older_than_max_age(tmp_path):
+    stale = _entry(tmp_path, "aaa", 100, 40)
+    fresh = _entry(tmp_path, "bbb", 100, 1)
+    
+    assert prune_segment_cache(tmp_path, max_bytes=10 ** 9, max_age_days=30) == 100
+    assert not stale[0].exists() and fresh[0].exists()
+
+def test_prune_removes_only_stale_temp_files(tmp_path):
+    stale = tmp_path / "aaa.123.456.tmp"
+    stale.write_bytes(b"\0")
+    os.utime(stale, (time.time() - 7200, time.time() - 7200))
+    writing = tmp_path / "bbb.123.456.tmp"
+    writing.write_bytes(b"\0")
+    
+    prune_segment_cache(tmp_path, max_bytes=0, max_age_days=30)
+    assert not stale.exists() and writing.exists()
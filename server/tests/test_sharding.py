@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import zipfile
+import threading
+
+import pytest
+
+from utils import sharding
+from utils.sharding import ShardSet, plan_shards, write_sub_deck, CLAIM_TIMEOUT
+from benchmarks.synthetic_deck import build_deck
+
+@pytest.fixture
+def shards(tmp_path):
+    directory = tmp_path / "shards"
+    directory.mkdir()
+    manifest = {
+        'job_id': "job",
+        'file_path': str(tmp_path / "deck.pptx"),
+        'config': {'voice': 'alloy'},
+        'cancel_path': str(tmp_path / "cancel"),
+        'slide_count': 5,
+        'shard_size': 2,
+        'shards': plan_shards(5, 2),
+        'created_at': time.time(),
+    }
+    (directory / "shards.json").write_text(json.dumps(manifest))
+    shard_set = ShardSet(directory)
+    claims = []
+    yield shard_set, claims
+    for claim in claims:
+        claim.release()
+
+def _claim(shard_set, claims):
+    claim = shard_set.claim_next()
+    if claim is not None:
+        claims.append(claim)
+    return claim
+
+def _go_stale(shard_set, index):
+    shard_dir = shard_set.shard_dir(index)
+    stamp = time.time() - CLAIM_TIMEOUT - 1
+    for path in shard_dir.glob("claim.*"):
+        os.utime(path, (stamp, stamp))
+
+def test_plan_shards():
+    assert plan_shards(5, 2) == [
+        {'index': 0, 'first_slide': 1, 'last_slide': 2},
+        {'index': 1, 'first_slide': 3, 'last_slide': 4},
+        {'index': 2, 'first_slide': 5, 'last_slide': 5},
+    ]
+
+def test_claims_are_exclusive_and_in_order(shards):
+    shard_set, claims = shards
+    assert [_claim(shard_set, claims).index for _ in range(3)] == [0, 1, 2]
+    assert _claim(shard_set, claims) is None
+    assert shard_set.states() == ['running'] * 3
+    assert (shard_set.shard_dir(0) / "claim.1").exists()
+
+def test_stale_claim_is_taken_over_once(shards, monkeypatch):
+    shard_set, claims = shards
+    # No heartbeats, so the claim goes stale as soon as it is backdated
+    monkeypatch.setattr(sharding, 'HEARTBEAT_INTERVAL', 3600)
+    _claim(shard_set, claims)
+    _go_stale(shard_set, 0)
+    assert shard_set.states()[0] == 'pending'
+    
+    # Workers racing for the stale claim: only one creates claim.2
+    won = []
+    barrier = threading.Barrier(4)
+    
+    def take_over():
+        barrier.wait()
+        claim = ShardSet(shard_set.directory).claim_next()
+        if claim is not None:
+            claims.append(claim)
+            won.append(claim.index)
+    
+    threads = [threading.Thread(target=take_over) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    # The losers move on to the shards nobody holds yet
+    assert sorted(won) == [0, 1, 2]
+    assert (shard_set.shard_dir(0) / "claim.2").exists()
+    assert not (shard_set.shard_dir(0) / "claim.3").exists()
+
+def test_results_round_trip_paths(shards):
+    shard_set, claims = shards
+    claim, *others = [_claim(shard_set, claims) for _ in range(3)]
+    shard_dir = shard_set.shard_dir(claim.index)
+    audio_file = shard_dir / "job" / "work" / "slide_1.mp3"
+    segment = shard_dir / "job" / "work" / "segment_001.mp4"
+    
+    shard_set.mark_done(claim.index, {
+        'slides_data': [{'slide_number': 1, 'slide_image_path': str(shard_dir / "slide_1.png"), 'text': "Title"}],
+        'transcripts': [{'slide_number': 1, 'transcript': "Hello"}],
+        'audio_files': [{'slide_number': 1, 'audio_file': str(audio_file), 'transcript': "Hello"}],
+        'segments': [str(segment)],
+        'cached_segments': 1,
+    })
+    
+    # Stored relative, so the directory can be mounted elsewhere on another host
+    stored = json.loads((shard_dir / "result.json").read_text())
+    assert stored['audio_files'][0]['audio_file'] == os.path.join("shard_000", "job", "work", "slide_1.mp3")
+    assert stored['segments'] == [os.path.join("shard_000", "job", "work", "segment_001.mp4")]
+    
+    for other in others:
+        shard_set.mark_done(other.index, {'slides_data': [], 'transcripts': [], 'audio_files': [], 'segments': [], 'cached_segments': 0})
+    
+    assert shard_set.states() == ['done'] * 3
+    results = shard_set.results()
+    assert results[0]['audio_files'][0]['audio_file'] == str(audio_file)
+    assert results[0]['slides_data'][0]['slide_image_path'] == str(shard_dir / "slide_1.png")
+    assert results[0]['segments'] == [str(segment)]
+    assert results[0]['cached_segments'] == 1
+
+def test_failed_shards_can_be_reset(shards):
+    shard_set, claims = shards
+    claim = _claim(shard_set, claims)
+    shard_set.mark_failed(claim.index, "TTS quota exceeded")
+    claim.release()
+    claims.remove(claim)
+    
+    assert shard_set.states()[0] == 'failed'
+    assert shard_set.errors() == {0: "TTS quota exceeded"}
+    assert _claim(shard_set, claims).index == 1
+    
+    shard_set.reset_failed()
+    assert shard_set.errors() == {}
+    assert shard_set.states()[0] == 'pending'
+    assert _claim(shard_set, claims).index == 0
+    assert (shard_set.shard_dir(0) / "claim.1").exists()
+
+def test_sub_deck_leaves_out_dropped_slides_and_their_media(tmp_path):
+    pytest.importorskip('pptx')
+    from pptx import Presentation
+    
+    deck_path = tmp_path / "deck.pptx"
+    build_deck(deck_path, slides=5, pictures=1)
+    sub_deck_path = tmp_path / "slides.pptx"
+    write_sub_deck(str(deck_path), sub_deck_path, 2, 3)
+    
+    with zipfile.ZipFile(sub_deck_path) as archive:
+        assert archive.testzip() is None
+        names = archive.namelist()
+    assert len([name for name in names if name.startswith('ppt/slides/slide')]) == 2
+    assert len([name for name in names if name.startswith('ppt/notesSlides/notesSlide')]) == 2
+    assert len([name for name in names if name.startswith('ppt/media/')]) == 2
+    
+    titles = [slide.shapes.title.text for slide in Presentation(str(sub_deck_path)).slides]
+    assert [title.split(':')[0] for title in titles] == ["Section 2", "Section 3"]
@@ -0,0 +1,15 @@
+from utils.slide_records import SlideRecordList
+
+def test_nested_changes_persist_only_when_assigned_back(tmp_path):
+    records = SlideRecordList(tmp_path / "slides", memory_limit_bytes=1024 ** 2)
+    slide = {'slide_number': 1, 'text_content': ["Title"]}
+    records.append(slide)
+    
+    slide['text_content'].append("changed by the caller")
+    read = records[0]
+    read['text_content'].append("changed by a reader")
+    assert records[0]['text_content'] == ["Title"]
+    
+    records[0] = read
+    reopened = SlideRecordList(tmp_path / "slides", memory_limit_bytes=0)
+    assert reopened[0]['text_content'] == ["Title", "changed by a reader"]
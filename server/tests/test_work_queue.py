@@ -0,0 +1,107 @@
+import time
+
+import pytest
+
+from utils.work_queue import WorkQueue, SqliteWorkQueue, MAX_ATTEMPTS
+
+@pytest.fixture
+def work_queue(tmp_path):
+    return SqliteWorkQueue(str(tmp_path / "queue.db"))
+
+def test_work_queue_is_abstract():
+    with pytest.raises(TypeError):
+        WorkQueue()
+
+def test_submit_is_idempotent_and_strips_secrets(work_queue):
+    payload = {'text': "Hello", 'config': {'openai_api_key': 'secret', 'voice': 'alloy'}}
+    task_id = work_queue.submit('job', 'tts', 1, payload)
+    assert work_queue.submit('job', 'tts', 1, payload) == task_id == "job:tts:1"
+    
+    task = work_queue.claim(['api'])
+    assert task['id'] == task_id
+    assert task['payload']['config'] == {'voice': 'alloy'}
+    assert work_queue.claim(['api']) is None
+    
+    # Done tasks are not queued again, so a resumed job reuses their results
+    work_queue.complete(task, {'audio_file': "slide_1.mp3"})
+    work_queue.submit('job', 'tts', 1, payload)
+    assert work_queue.claim(['api']) is None
+    assert work_queue.wait(task_id) == {'audio_file': "slide_1.mp3"}
+
+def test_claim_only_takes_tasks_of_its_queues(work_queue):
+    work_queue.submit('job', 'encode', 1, {})
+    assert work_queue.claim(['api']) is None
+    assert work_queue.claim(['cpu'])['kind'] == 'encode'
+
+def test_expired_lease_is_redelivered(work_queue):
+    task_id = work_queue.submit('job', 'ocr', 'a', {})
+    first = work_queue.claim(['cpu'], lease_seconds=0.05)
+    assert work_queue.claim(['cpu'], lease_seconds=0.05) is None
+    
+    time.sleep(0.1)
+    second = work_queue.claim(['cpu'])
+    assert second['id'] == task_id
+    assert second['attempts'] == 2
+    
+    # The worker that lost its lease can no longer fail the task
+    work_queue.fail(first, "too late")
+    assert work_queue.get(task_id)['state'] == 'leased'
+    work_queue.complete(second, {'text': "ok"})
+    assert work_queue.get(task_id)['state'] == 'done'
+
+def test_leased_keeps_extending_the_lease(work_queue):
+    work_queue.submit('job', 'ocr', 'a', {})
+    task = work_queue.claim(['cpu'], lease_seconds=0.3)
+    with work_queue.leased(task, lease_seconds=0.3):
+        time.sleep(0.6)
+        assert work_queue.claim(['cpu']) is None
+
+def test_task_fails_after_max_attempts(work_queue):
+    task_id = work_queue.submit('job', 'narration', 1, {})
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        task = work_queue.claim(['api'])
+        assert task['attempts'] == attempt
+        work_queue.fail(task, f"error {attempt}")
+    
+    assert work_queue.claim(['api']) is None
+    assert work_queue.get(task_id)['state'] == 'failed'
+    with pytest.raises(Exception, match=f"error {MAX_ATTEMPTS}"):
+        work_queue.wait(task_id)
+    
+    # Submitting a failed task again gives it a fresh set of attempts
+    work_queue.submit('job', 'narration', 1, {})
+    assert work_queue.claim(['api'])['attempts'] == 1
+
+def test_task_abandoned_by_its_workers_fails(work_queue):
+    task_id = work_queue.submit('job', 'refine', 1, {})
+    for _ in range(MAX_ATTEMPTS):
+        assert work_queue.claim(['api'], lease_seconds=0.01) is not None
+        time.sleep(0.02)
+    
+    assert work_queue.claim(['api']) is None
+    assert "abandoned" in work_queue.get(task_id)['error']
+
+def test_cancel_job_withdraws_only_queued_tasks(work_queue):
+    running_id = work_queue.submit('job', 'tts', 1, {})
+    running = work_queue.claim(['api'])
+    queued_id = work_queue.submit('job', 'tts', 2, {})
+    other_id = work_queue.submit('other', 'tts', 1, {})
+    
+    assert work_queue.cancel_job('job') == 1
+    assert work_queue.get(queued_id)['state'] == 'cancelled'
+    assert work_queue.get(other_id)['state'] == 'queued'
+    with pytest.raises(Exception, match="cancelled"):
+        work_queue.wait(queued_id)
+    
+    work_queue.complete(running, {'audio_file': "slide_1.mp3"})
+    assert work_queue.get(running_id)['state'] == 'done'
+    
+    work_queue.purge_job('job')
+    assert work_queue.get(running_id) is None and work_queue.get(queued_id) is None
+    assert work_queue.get(other_id) is not None
+
+def test_wait_times_out_when_no_worker_takes_the_task(work_queue):
+    task_id = work_queue.submit('job', 'ocr', 'a', {})
+    
+    with pytest.raises(Exception, match="timed out"):
+        work_queue.wait(task_id, timeout=0.2)
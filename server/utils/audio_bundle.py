@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Audio bundle packaging for narrated slides
+Builds the per-slide audio ZIP either as a file or streamed on demand
+"""
+
+import os
+import sys
+import json
+import zipfile
+from pathlib import Path
+from typing import Iterable, Tuple, List
+
+AUDIO_DIR_NAME = "audio"
+
+def published_audio_name(slide_number: int) -> str:
+    """File name used for a slide's narration in a job's outputs directory"""
+    return f"slide_{slide_number:02d}.mp3"
+
+def write_audio_bundle(target, audio_entries: Iterable[Tuple[int, str, str]]):
+    """Write a ZIP of (slide_number, audio_file, transcript) entries to a path or stream
+    
+    MP3 is already compressed, so it is stored as-is; only the transcripts are deflated.
+    Non-seekable targets such as stdout are fine, zipfile falls back to data descriptors.
+    """
+    
+    with zipfile.ZipFile(target, 'w') as zip_file:
+        for slide_number, audio_file, transcript in audio_entries:
+            if os.path.exists(audio_file):
+                # Add audio file with descriptive name
+                audio_filename = f"slide_{slide_number:02d}_audio.mp3"
+                zip_file.write(audio_file, audio_filename, compress_type=zipfile.ZIP_STORED)
+                
+                # Also create a text file with the transcript
+                transcript_filename = f"slide_{slide_number:02d}_transcript.txt"
+                zip_file.writestr(transcript_filename, transcript, compress_type=zipfile.ZIP_DEFLATED)
+
+def audio_entries_from_outputs(outputs_dir: Path) -> List[Tuple[int, str, str]]:
+    """Collect bundle entries from a finished job's published audio and transcripts"""
+    
+    with open(outputs_dir / "transcripts.json", 'r') as f:
+        transcripts = json.load(f)
+    
+    audio_dir = outputs_dir / AUDIO_DIR_NAME
+    return [
+        (
+            transcript_data['slide_number'],
+            str(audio_dir / published_audio_name(transcript_data['slide_number'])),
+            transcript_data['transcript']
+        )
+        for transcript_data in transcripts
+    ]
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python3 audio_bundle.py <job_outputs_dir>", file=sys.stderr)
+        sys.exit(1)
+    
+    outputs_dir = Path(sys.argv[1])
+    write_audio_bundle(sys.stdout.buffer, audio_entries_from_outputs(outputs_dir))
+    sys.stdout.buffer.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Content-addressed storage for job outputs
+Identical artefacts from different jobs share one blob on disk
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterable
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.checkpoint import checkpoint_root
+
+BLOB_DIR_NAME = ".blobs"
+# Written as the last file of a job's outputs; directories without it are still being produced
+PUBLISHED_MARKER = "published.json"
+
+class BlobStore:
+    """Deduplicates job output files by hardlinking them to blobs named by their SHA-256
+    
+    The hardlink count doubles as the reference count: a blob with a single link
+    is no longer used by any job and can be removed by compact().
+    """
+    
+    def __init__(self, outputs_root: Path, checkpoint_dir: Path = None):
+        self.outputs_root = Path(outputs_root)
+        self.checkpoint_dir = Path(checkpoint_dir or checkpoint_root())
+        self.blob_dir = self.outputs_root / BLOB_DIR_NAME
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _hash_file(self, path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / digest
+    
+    def intern_file(self, path: Path) -> bool:
+        """Replace a file with a link to its blob; returns True if the blob already existed"""
+        
+        path = Path(path)
+        blob_path = self._blob_path(self._hash_file(path))
+        blob_path.parent.mkdir(exist_ok=True)
+        
+        if blob_path.exists():
+            # Link under a temp name first so the output path is never missing
+            temp_path = path.with_name(f".{path.name}.link")
+            os.link(blob_path, temp_path)
+            os.replace(temp_path, path)
+            return True
+        
+        try:
+            os.link(path, blob_path)
+        except FileExistsError:
+            # Another job stored the same content in the meantime
+            return self.intern_file(path)
+        return False
+    
+    def intern_directory(self, directory: Path) -> Dict[str, int]:
+        """Intern every file below directory, reporting how much was deduplicated"""
+        
+        report = {'files': 0, 'deduplicated_files': 0, 'deduplicated_bytes': 0}
+        
+        for path in sorted(Path(directory).rglob('*')):
+            if not path.is_file() or path.is_symlink():
+                continue
+            try:
+                size = path.stat().st_size
+                if self.intern_file(path):
+                    report['deduplicated_files'] += 1
+                    report['deduplicated_bytes'] += size
+                report['files'] += 1
+            except OSError as e:
+                # Filesystems without hardlinks just keep a private copy
+                print(f"Warning: Could not add {path} to blob store: {e}")
+        
+        return report
+    
+    def _job_dirs(self, keep=()):
+        """Published job directories, oldest first
+        
+        Jobs that still have a checkpoint are running or may be resumed, and can
+        be streaming HLS into their directory, so they are never returned. A plain
+        directory rather than a version symlink was published before the marker
+        existed and counts as published.
+        """
+        job_dirs = [
+            path for path in self.outputs_root.iterdir()
+            if path.is_dir() and not path.name.startswith('.') and path.name not in keep
+            and not (self.checkpoint_dir / path.name).exists()
+            and ((path / PUBLISHED_MARKER).exists() or not path.is_symlink())
+        ]
+        return sorted(job_dirs, key=lambda path: path.stat().st_mtime)
+    
+    def _remove_job_dir(self, job_dir: Path):
+        """Remove a job's outputs: the symlink and the version directory it points at"""
+        if job_dir.is_symlink():
+            version_dir = job_dir.parent / os.readlink(job_dir)
+            job_dir.unlink()
+            shutil.rmtree(version_dir, ignore_errors=True)
+        else:
+            shutil.rmtree(job_dir, ignore_errors=True)
+    
+    def _dir_unique_bytes(self, directory: Path) -> int:
+        """Bytes that would be freed if only this directory referenced its files"""
+        return sum(
+            path.stat().st_size for path in directory.rglob('*')
+            if path.is_file() and path.stat().st_nlink <= 2
+        )
+    
+    def usage_bytes(self) -> int:
+        """Disk space used by all outputs, counting each shared blob once"""
+        
+        seen = set()
+        total = 0
+        for path in self.outputs_root.rglob('*'):
+            if not path.is_file():
+                continue
+            stat = path.stat()
+            if (stat.st_dev, stat.st_ino) not in seen:
+                seen.add((stat.st_dev, stat.st_ino))
+                total += stat.st_size
+        return total
+    
+    def compact(self, max_bytes: Optional[int] = None, max_age_days: Optional[float] = None,
+                keep: Iterable[str] = (), stale_after_seconds: int = 3600) -> Dict[str, Any]:
+        """Evict old jobs per the retention policy and delete unreferenced blobs
+        
+        Jobs named in keep, and jobs that are not published yet, are never evicted.
+        """
+        
+        usage_before = self.usage_bytes()
+        evicted_jobs = []
+        
+        # Age-based eviction
+        if max_age_days is not None:
+            cutoff = time.time() - max_age_days * 86400
+            for job_dir in self._job_dirs(keep):
+                if job_dir.stat().st_mtime < cutoff:
+                    self._remove_job_dir(job_dir)
+                    evicted_jobs.append(job_dir.name)
+        
+        # Size-based eviction, oldest jobs first
+        if max_bytes is not None:
+            usage = self.usage_bytes()
+            for job_dir in self._job_dirs(keep):
+                if usage <= max_bytes:
+                    break
+                usage -= self._dir_unique_bytes(job_dir)
+                self._remove_job_dir(job_dir)
+                evicted_jobs.append(job_dir.name)
+        
+        # Leftovers from interrupted publications; the versions job symlinks point at are live
+        live_versions = {
+            os.readlink(path) for path in self.outputs_root.iterdir()
+            if path.is_symlink() and not path.name.startswith('.')
+        }
+        for path in self.outputs_root.iterdir():
+            if not path.name.startswith('.') or path.name == BLOB_DIR_NAME or path.name in live_versions:
+                continue
+            if time.time() - path.lstat().st_mtime > stale_after_seconds:
+                if path.is_symlink():
+                    path.unlink(missing_ok=True)
+                elif path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+        
+        # A blob whose only link is its own name has no referencing job left
+        removed_blobs = 0
+        for blob_path in self.blob_dir.glob('*/*'):
+            if blob_path.is_file() and blob_path.stat().st_nlink == 1:
+                blob_path.unlink()
+                removed_blobs += 1
+        
+        usage_after = self.usage_bytes()
+        return {
+            'evicted_jobs': evicted_jobs,
+            'removed_blobs': removed_blobs,
+            'bytes_before': usage_before,
+            'bytes_after': usage_after,
+            'reclaimed_bytes': usage_before - usage_after,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact the job outputs blob store")
+    parser.add_argument('command', choices=['compact', 'usage'])
+    parser.add_argument('--outputs', default='outputs', help="Outputs root directory")
+    parser.add_argument('--max-bytes', type=int, help="Evict oldest jobs until outputs fit in this many bytes")
+    parser.add_argument('--max-age-days', type=float, help="Evict jobs older than this many days")
+    args = parser.parse_args()
+    
+    store = BlobStore(Path(args.outputs))
+    
+    if args.command == 'usage':
+        print(json.dumps({'bytes': store.usage_bytes()}, indent=2))
+    else:
+        print(json.dumps(store.compact(args.max_bytes, args.max_age_days), indent=2))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Job cancellation
+Lets a running job be stopped within seconds: child processes are killed and pending API calls abandoned
+"""
+
+import os
+import signal
+import threading
+import subprocess
+from pathlib import Path
+from typing import Optional, Callable, Any
+
+POLL_INTERVAL = 0.5
+
+class JobCancelled(BaseException):
+    """Raised inside a cancelled job
+    
+    Like asyncio.CancelledError it is not an Exception, so the stages' generic
+    error handling lets it through instead of reporting the job as failed.
+    """
+
+class CancellationToken:
+    """Cancellation state of one job, shared by its stages, subprocesses and API calls
+    
+    cancel() is called in-process (a daemon command or SIGTERM), or another process
+    creates the control file passed to watch(). Cancelling kills the job's child
+    processes immediately; the job itself stops at its next check().
+    """
+    
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = set()
+        self._stop_watching = None
+        self._watcher = None
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+    
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            processes = list(self._processes)
+        for process in processes:
+            _kill(process)
+    
+    def check(self):
+        if self._event.is_set():
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+    
+    def watch(self, control_file: Path):
+        """Cancel as soon as control_file appears"""
+        if self._watcher is None:
+            self._stop_watching = threading.Event()
+            self._watcher = threading.Thread(target=self._watch, args=(Path(control_file),),
+                                             name=f"cancel-{self.job_id}", daemon=True)
+            self._watcher.start()
+    
+    def close(self):
+        """Stop watching the control file; the token itself stays usable"""
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher.join()
+            self._watcher = None
+    
+    def _watch(self, control_file: Path):
+        while not self._stop_watching.wait(POLL_INTERVAL) and not self._event.is_set():
+            if control_file.exists():
+                print(f"Cancellation requested for job {self.job_id}")
+                self.cancel()
+    
+    def run(self, cmd, timeout: Optional[float] = None, check: bool = False, input=None,
+            capture_output: bool = False, **kwargs) -> subprocess.CompletedProcess:
+        """subprocess.run whose process (and its children) is killed if the job is cancelled"""
+        
+        self.check()
+        if capture_output:
+            kwargs['stdout'] = kwargs['stderr'] = subprocess.PIPE
+        if input is not None:
+            kwargs['stdin'] = subprocess.PIPE
+        
+        # A session of its own, so LibreOffice's helper processes are killed along with it
+        with subprocess.Popen(cmd, start_new_session=True, **kwargs) as process:
+            with self._lock:
+                self._processes.add(process)
+                if self._event.is_set():
+                    _kill(process)
+            try:
+                stdout, stderr = process.communicate(input, timeout=timeout)
+            except subprocess.TimeoutExpired as e:
+                _kill(process)
+                process.communicate()
+                raise subprocess.TimeoutExpired(process.args, timeout, output=e.output, stderr=e.stderr)
+            except BaseException:
+                _kill(process)
+                raise
+            finally:
+                with self._lock:
+                    self._processes.discard(process)
+        
+        self.check()
+        if check and process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, process.args, output=stdout, stderr=stderr)
+        return subprocess.CompletedProcess(process.args, process.returncode, stdout, stderr)
+    
+    def call(self, function: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking API call, but stop waiting for it once the job is cancelled
+        
+        The request itself is abandoned rather than interrupted: its thread finishes
+        in the background and the result is discarded.
+        """
+        
+        self.check()
+        outcome = {}
+        done = threading.Event()
+        
+        def target():
+            try:
+                outcome['result'] = function(*args, **kwargs)
+            except BaseException as e:
+                outcome['error'] = e
+            finally:
+                done.set()
+        
+        threading.Thread(target=target, name=f"call-{self.job_id}", daemon=True).start()
+        while not done.wait(POLL_INTERVAL):
+            self.check()
+        
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
+
+def _kill(process: subprocess.Popen):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def call_cancellable(cancellation: Optional[CancellationToken], function: Callable[..., Any], *args, **kwargs) -> Any:
+    """function(*args, **kwargs), abandoned on cancellation when the job has a token"""
+    if cancellation is None:
+        return function(*args, **kwargs)
+    return cancellation.call(function, *args, **kwargs)
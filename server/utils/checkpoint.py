@@ -0,0 +1,122 @@
+"""
+Durable per-job checkpoints
+Lets an interrupted job resume without redoing finished stages and slides
+"""
+
+import os
+import json
+import time
+import shutil
+from pathlib import Path
+from typing import Dict, Any
+
+DEFAULT_CHECKPOINT_DIR = os.path.join("cache", "jobs")
+DEFAULT_MAX_AGE_DAYS = 7
+MANIFEST_NAME = "manifest.json"
+INPUT_NAME = "input.pptx"
+# Created by the API server to cancel a job that runs in another process
+CANCEL_NAME = "cancel"
+
+def checkpoint_root() -> Path:
+    return Path(os.environ.get('JOB_CHECKPOINT_DIR') or DEFAULT_CHECKPOINT_DIR)
+
+def without_secrets(config: Dict[str, Any]) -> Dict[str, Any]:
+    """API keys are not written to disk; a resume has to pass them again"""
+    return {key: value for key, value in config.items() if not key.endswith('_api_key')}
+
+class JobCheckpoint:
+    """A job's durable directory: a copy of the input deck, its work dir and a manifest
+    
+    The manifest records finished stages and, for stages that rewrite records in
+    place, how many slides are done. Per-slide results themselves live in the
+    work dir, e.g. the SlideRecordList directories.
+    """
+    
+    def __init__(self, job_id: str, root: Path = None):
+        self.job_id = job_id
+        self.directory = (Path(root or checkpoint_root()) / job_id).resolve()
+        self.work_dir = self.directory / "work"
+        self.manifest_path = self.directory / MANIFEST_NAME
+        self.cancel_path = self.directory / CANCEL_NAME
+        self.manifest = None
+    
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+    
+    def create(self, file_path: str, config: Dict[str, Any]):
+        """Start a fresh checkpoint, keeping a private copy of the uploaded deck"""
+        
+        if self.directory.exists():
+            shutil.rmtree(self.directory)
+        self.work_dir.mkdir(parents=True)
+        
+        input_path = self.directory / INPUT_NAME
+        try:
+            os.link(file_path, input_path)
+        except OSError:
+            shutil.copy2(file_path, input_path)
+        
+        self.manifest = {
+            'job_id': self.job_id,
+            'file_path': str(input_path),
+            'config': without_secrets(config),
+            'completed_stages': [],
+            'completed_slides': {},
+            'created_at': time.time(),
+        }
+        self._save()
+    
+    def load(self) -> Dict[str, Any]:
+        """Read the manifest of an existing checkpoint"""
+        if not self.exists():
+            raise Exception(f"No checkpoint found for job {self.job_id}")
+        with open(self.manifest_path, 'r') as f:
+            self.manifest = json.load(f)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        return self.manifest
+    
+    def _save(self):
+        self.manifest['updated_at'] = time.time()
+        temp_path = self.manifest_path.with_suffix(".tmp")
+        with open(temp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+    
+    def is_done(self, stage: str) -> bool:
+        return stage in self.manifest['completed_stages']
+    
+    def mark_done(self, stage: str):
+        if stage not in self.manifest['completed_stages']:
+            self.manifest['completed_stages'].append(stage)
+            self._save()
+    
+    def completed_slides(self, stage: str) -> int:
+        return self.manifest['completed_slides'].get(stage, 0)
+    
+    def mark_slides(self, stage: str, count: int):
+        self.manifest['completed_slides'][stage] = count
+        self._save()
+    
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+def prune_checkpoints(root: Path = None, max_age_days: float = None, keep=()) -> int:
+    """Delete checkpoints of failed jobs that were not resumed in time"""
+    
+    root = Path(root or checkpoint_root())
+    if max_age_days is None:
+        max_age_days = float(os.environ.get('CHECKPOINT_MAX_AGE_DAYS') or DEFAULT_MAX_AGE_DAYS)
+    if not root.exists():
+        return 0
+    
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for directory in root.iterdir():
+        if directory.name in keep or not directory.is_dir():
+            continue
+        manifest_path = directory / MANIFEST_NAME
+        modified = manifest_path.stat().st_mtime if manifest_path.exists() else directory.stat().st_mtime
+        if modified < cutoff:
+            shutil.rmtree(directory, ignore_errors=True)
+            removed += 1
+    return removed
@@ -0,0 +1,44 @@
+"""
+Shared API clients
+Reused across jobs so a long-running worker keeps its connection pools warm
+openai and requests are imported on first use, so starting a job loads neither
+"""
+
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
+
+MAX_CACHED_CLIENTS = 32
+
+_lock = threading.Lock()
+_openai_clients = OrderedDict()
+_http_session = None
+
+def openai_client(api_key: str):
+    """OpenAI client for an API key, created once and then reused"""
+    
+    with _lock:
+        client = _openai_clients.get(api_key)
+        if client is not None:
+            _openai_clients.move_to_end(api_key)
+            return client
+        
+        from openai import OpenAI
+        client = OpenAI(api_key=api_key)
+        _openai_clients[api_key] = client
+        while len(_openai_clients) > MAX_CACHED_CLIENTS:
+            _openai_clients.popitem(last=False)
+        return client
+
+def http_session() -> 'requests.Session':
+    """Process-wide requests session for plain HTTP APIs"""
+    global _http_session
+    
+    with _lock:
+        if _http_session is None:
+            import requests
+            _http_session = requests.Session()
+        return _http_session
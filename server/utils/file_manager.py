@@ -4,15 +4,30 @@ Handles file operations, conversions, and cleanup
 """
 
 import os
+import sys
+import errno
+import copy
 import shutil
+import struct
 import subprocess
+import zipfile
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import tempfile
 
+from utils.metrics import run_subprocess
+
+# Raw entry copies write through zipfile internals (fp, filelist, NameToInfo, start_dir,
+# _didModify, ZipInfo.FileHeader); only Pythons they were checked against use them
+RAW_ZIP_COPY = (3, 8) <= sys.version_info[:2] <= (3, 13)
+
+EMPTY_RELATIONSHIPS = b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"/>'
+
 class FileManager:
-    def __init__(self, work_dir: Path):
+    def __init__(self, work_dir: Path, metrics=None, cancellation=None):
         self.work_dir = work_dir
+        self.metrics = metrics
+        self.cancellation = cancellation
         self.work_dir.mkdir(parents=True, exist_ok=True)
     
     def convert_pptx_to_pdf(self, pptx_path: str) -> str:
@@ -29,7 +44,7 @@ class FileManager:
                 pptx_path
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+            result = run_subprocess(self.metrics, 'libreoffice', cmd, cancellation=self.cancellation, capture_output=True, text=True, timeout=120)
             
             if result.returncode != 0:
                 raise Exception(f"PDF conversion failed: {result.stderr}")
@@ -51,145 +66,312 @@ class FileManager:
             raise Exception(f"Failed to convert to PDF: {str(e)}")
     
     def embed_audio_in_slides(self, original_pptx: str, audio_files: List[Dict[str, Any]]) -> str:
-        """Embed audio files into PowerPoint slides with auto-play functionality"""
+        """Embed audio files into PowerPoint slides with auto-play functionality
+        
+        The deck is rewritten ZIP-to-ZIP: untouched parts keep their compressed bytes,
+        only the affected slide XML and .rels parts are rebuilt in memory, and the
+        MP3s are appended without compression.
+        """
         
         output_path = self.work_dir / "narrated_presentation.pptx"
         
         try:
-            import zipfile
-            import shutil
-            from xml.etree import ElementTree as ET
-            from pathlib import Path
-            import uuid
-            
-            # Copy original file to output path
-            shutil.copy2(original_pptx, output_path)
-            
             # Create audio mapping
-            audio_map = {af['slide_number']: af['audio_file'] for af in audio_files}
-            
-            # Work with PPTX as a ZIP file
-            temp_extract = self.work_dir / "pptx_temp"
-            if temp_extract.exists():
-                shutil.rmtree(temp_extract)
-            temp_extract.mkdir()
-            
-            # Extract PPTX contents
-            with zipfile.ZipFile(output_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_extract)
-            
-            # Process each slide that has audio
-            for slide_number, audio_file in audio_map.items():
-                if os.path.exists(audio_file):
-                    self._embed_audio_in_slide(temp_extract, slide_number, audio_file)
-            
-            # Repackage the PPTX
-            with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
-                for file_path in temp_extract.rglob('*'):
-                    if file_path.is_file():
-                        arc_name = file_path.relative_to(temp_extract)
-                        zip_ref.write(file_path, arc_name)
+            audio_map = {af['slide_number']: af['audio_file'] for af in audio_files if os.path.exists(af['audio_file'])}
             
-            # Cleanup temp directory
-            shutil.rmtree(temp_extract)
+            with zipfile.ZipFile(original_pptx, 'r') as source, zipfile.ZipFile(output_path, 'w') as target:
+                existing = set(source.namelist())
+                rewritten = {}
+                media = {}
+                
+                # Process each slide that has audio
+                for slide_number, audio_file in sorted(audio_map.items()):
+                    slide_name = f"ppt/slides/slide{slide_number}.xml"
+                    rels_name = f"ppt/slides/_rels/slide{slide_number}.xml.rels"
+                    if slide_name not in existing:
+                        print(f"Warning: Slide {slide_number} not found")
+                        continue
+                    
+                    audio_filename = f"audio{slide_number}{Path(audio_file).suffix}"
+                    
+                    try:
+                        slide_xml = self._embed_audio_in_slide(source.read(slide_name), slide_number)
+                        if slide_xml is None:
+                            continue
+                        rels_xml = self._update_slide_relationships(
+                            source.read(rels_name) if rels_name in existing else None,
+                            slide_number,
+                            audio_filename
+                        )
+                    except Exception as e:
+                        print(f"Warning: Could not embed audio in slide {slide_number}: {e}")
+                        continue
+                    
+                    rewritten[slide_name] = slide_xml
+                    rewritten[rels_name] = rels_xml
+                    media[f"ppt/media/{audio_filename}"] = audio_file
+                
+                if media and "[Content_Types].xml" in existing:
+                    rewritten["[Content_Types].xml"] = self._register_audio_content_types(
+                        source.read("[Content_Types].xml"),
+                        {Path(name).suffix.lstrip('.') for name in media}
+                    )
+                
+                # Keep the original part order; only rewritten parts are recompressed
+                for info in source.infolist():
+                    if info.filename in media:
+                        continue
+                    if info.filename in rewritten:
+                        part = zipfile.ZipInfo(info.filename, info.date_time)
+                        part.external_attr = info.external_attr
+                        target.writestr(part, rewritten.pop(info.filename), zipfile.ZIP_DEFLATED)
+                    else:
+                        self._copy_zip_entry(source, target, info)
+                
+                # Relationship parts for slides that had none before
+                for name, data in rewritten.items():
+                    target.writestr(name, data, zipfile.ZIP_DEFLATED)
+                
+                # MP3 is already compressed, so store it as-is
+                for name, audio_file in media.items():
+                    target.write(audio_file, name, compress_type=zipfile.ZIP_STORED)
             
             return str(output_path)
             
         except Exception as e:
             raise Exception(f"Failed to embed audio in slides: {str(e)}")
     
-    def _embed_audio_in_slide(self, pptx_dir: Path, slide_number: int, audio_file: str):
-        """Embed audio file directly into a specific slide with auto-play"""
+    def _copy_zip_entry(self, source: zipfile.ZipFile, target: zipfile.ZipFile, info: zipfile.ZipInfo):
+        """Copy one ZIP entry's compressed bytes verbatim, without inflating or re-deflating"""
         
+        zip64 = (
+            info.file_size >= zipfile.ZIP64_LIMIT or
+            info.compress_size >= zipfile.ZIP64_LIMIT or
+            info.header_offset >= zipfile.ZIP64_LIMIT
+        )
+        if zip64 or info.flag_bits & 0x1 or not RAW_ZIP_COPY:
+            # Rare in decks; take the slow path rather than rewrite ZIP64/encryption headers
+            self._stream_zip_entry(source, target, info, zip64)
+            return
+        
+        # zipfile has no public raw-copy API, so do what ZipFile.write does by hand:
+        # write a local header, the data, then register the entry for the central directory.
+        # That relies on zipfile internals; if they changed, fall back to the public API.
+        header_offset = target.fp.tell()
         try:
-            slide_path = pptx_dir / "ppt" / "slides" / f"slide{slide_number}.xml"
-            if not slide_path.exists():
-                print(f"Warning: Slide {slide_number} not found")
-                return
-            
-            # Copy audio file to PPTX media folder
-            media_dir = pptx_dir / "ppt" / "media"
-            media_dir.mkdir(exist_ok=True)
-            
-            audio_ext = Path(audio_file).suffix
-            audio_filename = f"audio{slide_number}{audio_ext}"
-            audio_dest = media_dir / audio_filename
-            shutil.copy2(audio_file, audio_dest)
-            
-            # Parse slide XML
-            tree = ET.parse(slide_path)
-            root = tree.getroot()
-            
-            # Define namespaces
-            namespaces = {
-                'p': 'http://schemas.openxmlformats.org/presentationml/2006/main',
-                'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
-                'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
-            }
-            
-            # Find or create cSld element
-            cSld = root.find('.//p:cSld', namespaces)
-            if cSld is None:
-                return
-            
-            spTree = cSld.find('.//p:spTree', namespaces)
-            if spTree is None:
-                return
-            
-            # Create audio shape with auto-play
-            audio_shape = ET.SubElement(spTree, '{http://schemas.openxmlformats.org/presentationml/2006/main}sp')
-            
-            # Add nvSpPr (non-visual shape properties)
-            nvSpPr = ET.SubElement(audio_shape, '{http://schemas.openxmlformats.org/presentationml/2006/main}nvSpPr')
-            cNvPr = ET.SubElement(nvSpPr, '{http://schemas.openxmlformats.org/presentationml/2006/main}cNvPr')
-            cNvPr.set('id', str(1000 + slide_number))
-            cNvPr.set('name', f'Audio {slide_number}')
-            
-            # Add media reference with auto-play
-            audioFile = ET.SubElement(cNvPr, '{http://schemas.openxmlformats.org/drawingml/2006/main}audioFile')
-            audioFile.set('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}link', f'rId{slide_number + 100}')
-            
-            # Add auto-play attributes
-            audioFile.set('autoPlay', '1')
-            audioFile.set('hideInSlideShow', '1')
-            
-            # Update slide relationships
-            self._update_slide_relationships(pptx_dir, slide_number, audio_filename)
-            
-            # Save modified slide
-            tree.write(slide_path, encoding='utf-8', xml_declaration=True)
-            
-        except Exception as e:
-            print(f"Warning: Could not embed audio in slide {slide_number}: {e}")
+            part = copy.copy(info)
+            part.flag_bits &= ~0x08  # Sizes go in the local header, so no data descriptor follows
+            part.header_offset = header_offset
+            local_header = part.FileHeader(False)
+            if not all(hasattr(target, name) for name in ('filelist', 'NameToInfo', 'start_dir', '_didModify')):
+                raise AttributeError("zipfile.ZipFile no longer has the attributes a raw copy updates")
+            
+            source.fp.seek(info.header_offset)
+            source_header = source.fp.read(zipfile.sizeFileHeader)
+            name_length, extra_length = struct.unpack('<HH', source_header[26:30])
+            source.fp.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+            
+            target.fp.write(local_header)
+            remaining = info.compress_size
+            while remaining > 0:
+                chunk = source.fp.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    raise Exception(f"Truncated ZIP entry: {info.filename}")
+                target.fp.write(chunk)
+                remaining -= len(chunk)
+            
+            target.filelist.append(part)
+            target.NameToInfo[part.filename] = part
+            target.start_dir = target.fp.tell()
+            target._didModify = True
+        except (AttributeError, TypeError) as e:
+            print(f"Warning: Raw ZIP copy of {info.filename} failed ({e}); copying it through zipfile")
+            target.fp.seek(header_offset)
+            target.fp.truncate()
+            self._stream_zip_entry(source, target, info, zip64)
+    
+    def _stream_zip_entry(self, source: zipfile.ZipFile, target: zipfile.ZipFile, info: zipfile.ZipInfo, zip64: bool):
+        """Copy one ZIP entry through zipfile's public API, inflating and re-deflating it"""
+        
+        part = zipfile.ZipInfo(info.filename, info.date_time)
+        part.compress_type = info.compress_type
+        part.external_attr = info.external_attr
+        with source.open(info) as src, target.open(part, 'w', force_zip64=zip64) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    
+    def _serialize_xml(self, root) -> bytes:
+        """Serialize a modified part with the prefixes it was parsed with"""
+        from lxml import etree
+        
+        # Office relies on prefix names (e.g. in mc:Ignorable); lxml keeps each document's own
+        return etree.tostring(root, encoding='UTF-8', xml_declaration=True, standalone=True)
+    
+    def _embed_audio_in_slide(self, slide_xml: bytes, slide_number: int) -> Optional[bytes]:
+        """Add an auto-play audio shape to a slide's XML, returning the new XML"""
+        from lxml import etree
+        
+        root = etree.fromstring(slide_xml)
+        
+        # Define namespaces
+        namespaces = {
+            'p': 'http://schemas.openxmlformats.org/presentationml/2006/main',
+            'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+            'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+        }
+        
+        # Find or create cSld element
+        cSld = root.find('.//p:cSld', namespaces)
+        if cSld is None:
+            return None
+        
+        spTree = cSld.find('.//p:spTree', namespaces)
+        if spTree is None:
+            return None
+        
+        # Create audio shape with auto-play
+        audio_shape = etree.SubElement(spTree, '{http://schemas.openxmlformats.org/presentationml/2006/main}sp')
+        
+        # Add nvSpPr (non-visual shape properties)
+        nvSpPr = etree.SubElement(audio_shape, '{http://schemas.openxmlformats.org/presentationml/2006/main}nvSpPr')
+        cNvPr = etree.SubElement(nvSpPr, '{http://schemas.openxmlformats.org/presentationml/2006/main}cNvPr')
+        cNvPr.set('id', str(1000 + slide_number))
+        cNvPr.set('name', f'Audio {slide_number}')
+        
+        # Add media reference with auto-play
+        audioFile = etree.SubElement(cNvPr, '{http://schemas.openxmlformats.org/drawingml/2006/main}audioFile')
+        audioFile.set('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}link', f'rId{slide_number + 100}')
+        
+        # Add auto-play attributes
+        audioFile.set('autoPlay', '1')
+        audioFile.set('hideInSlideShow', '1')
+        
+        return self._serialize_xml(root)
+    
+    def _update_slide_relationships(self, rels_xml: Optional[bytes], slide_number: int, audio_filename: str) -> bytes:
+        """Return slide relationships XML that includes the audio file"""
+        from lxml import etree
+        
+        # Create or update relationships part
+        root = etree.fromstring(rels_xml or EMPTY_RELATIONSHIPS)
+        
+        # Add audio relationship
+        relationship = etree.SubElement(root, '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship')
+        relationship.set('Id', f'rId{slide_number + 100}')
+        relationship.set('Type', 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/audio')
+        relationship.set('Target', f'../media/{audio_filename}')
+        
+        return self._serialize_xml(root)
+    
+    def _register_audio_content_types(self, content_types_xml: bytes, extensions: set) -> bytes:
+        """Make sure [Content_Types].xml declares a MIME type for each embedded audio extension"""
+        from lxml import etree
+        
+        content_types_ns = 'http://schemas.openxmlformats.org/package/2006/content-types'
+        root = etree.fromstring(content_types_xml)
+        
+        declared = {
+            default.get('Extension', '').lower()
+            for default in root.findall(f'{{{content_types_ns}}}Default')
+        }
+        for extension in sorted(extensions):
+            if extension.lower() not in declared:
+                default = etree.SubElement(root, f'{{{content_types_ns}}}Default')
+                default.set('Extension', extension)
+                default.set('ContentType', 'audio/mpeg' if extension.lower() == 'mp3' else f'audio/{extension.lower()}')
+        
+        return self._serialize_xml(root)
     
-    def _update_slide_relationships(self, pptx_dir: Path, slide_number: int, audio_filename: str):
-        """Update slide relationships to include audio file"""
+    def publish_file(self, source: str, destination: Path) -> str:
+        """Hardlink a finished file into place, copying only when it is on another filesystem
+        
+        The source stays where it is: it belongs to the job's checkpoint, which a
+        resumed job still needs if publishing fails, and is removed with it.
+        """
         
         try:
-            rels_dir = pptx_dir / "ppt" / "slides" / "_rels"
-            rels_dir.mkdir(exist_ok=True)
-            
-            rels_file = rels_dir / f"slide{slide_number}.xml.rels"
-            
-            # Create or update relationships file
-            if rels_file.exists():
-                tree = ET.parse(rels_file)
-                root = tree.getroot()
-            else:
-                root = ET.Element('{http://schemas.openxmlformats.org/package/2006/relationships}Relationships')
-                tree = ET.ElementTree(root)
-            
-            # Add audio relationship
-            relationship = ET.SubElement(root, '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship')
-            relationship.set('Id', f'rId{slide_number + 100}')
-            relationship.set('Type', 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/audio')
-            relationship.set('Target', f'../media/{audio_filename}')
-            
-            # Save relationships file
-            tree.write(rels_file, encoding='utf-8', xml_declaration=True)
-            
-        except Exception as e:
-            print(f"Warning: Could not update slide relationships for slide {slide_number}: {e}")
+            os.link(source, destination)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+            # Different device, or no hardlinks here: stream the bytes across
+            with open(source, 'rb') as src, open(destination, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            shutil.copystat(source, destination)
+        
+        return str(destination)
+    
+    def create_staging_dir(self, final_dir: Path) -> Path:
+        """Create a hidden version directory next to final_dir, on the same filesystem"""
+        
+        final_dir = Path(final_dir)
+        final_dir.parent.mkdir(parents=True, exist_ok=True)
+        staging_dir = Path(tempfile.mkdtemp(prefix=f".{final_dir.name}.version.", dir=final_dir.parent))
+        staging_dir.chmod(0o755)
+        return staging_dir
+    
+    def open_directory(self, final_dir: Path) -> Path:
+        """Make final_dir usable for files published while the job runs, e.g. the HLS stream"""
+        
+        final_dir = Path(final_dir)
+        if not final_dir.is_symlink() and not final_dir.exists():
+            self._point_to(final_dir, self.create_staging_dir(final_dir))
+        return final_dir
+    
+    def commit_directory(self, staging_dir: Path, final_dir: Path):
+        """Publish a fully written staging directory as final_dir
+        
+        final_dir is a symlink to the current version directory and is flipped with a
+        single rename, so readers always find either the old or the new outputs. Files
+        only the old version has, e.g. the HLS stream, are hardlinked across; the old
+        version stays intact until nothing points at it any more.
+        """
+        
+        final_dir = Path(final_dir)
+        if final_dir.is_symlink():
+            previous_dir = final_dir.parent / os.readlink(final_dir)
+        elif final_dir.exists():
+            previous_dir = final_dir
+        else:
+            previous_dir = None
+        
+        if previous_dir is not None:
+            # Carry over anything published while the job ran (e.g. the HLS stream)
+            for entry in previous_dir.iterdir():
+                if not (staging_dir / entry.name).exists():
+                    self._link_tree(entry, staging_dir / entry.name)
+            
+            if previous_dir == final_dir:
+                # Published before outputs were versioned; only this first swap leaves a gap
+                retired_dir = final_dir.with_name(f".{final_dir.name}.retired.{os.getpid()}")
+                os.replace(final_dir, retired_dir)
+                previous_dir = retired_dir
+        
+        self._point_to(final_dir, staging_dir)
+        if previous_dir is not None:
+            shutil.rmtree(previous_dir, ignore_errors=True)
+    
+    def _point_to(self, final_dir: Path, version_dir: Path):
+        """Atomically point the final_dir symlink at a version directory next to it"""
+        
+        link_path = final_dir.with_name(f".{final_dir.name}.link.{os.getpid()}")
+        if link_path.is_symlink():
+            link_path.unlink()
+        # Relative, so the outputs root can be moved or mounted elsewhere
+        os.symlink(Path(version_dir).name, link_path)
+        os.replace(link_path, final_dir)
+    
+    def _link_tree(self, source: Path, destination: Path):
+        """Hardlink a file or directory tree, copying where hardlinks are not possible"""
+        
+        if source.is_dir():
+            destination.mkdir()
+            for entry in source.iterdir():
+                self._link_tree(entry, destination / entry.name)
+            return
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copy2(source, destination)
     
     def create_scorm_package(self, output_files: Dict[str, str]) -> str:
         """Create a SCORM package with all outputs (optional feature)"""
@@ -271,8 +453,8 @@ class FileManager:
                 # Remove only temporary processing files, keep outputs
                 temp_patterns = [
                     "slide_images",
-                    "segment_*.mp4",
-                    "concat_list.txt",
+                    "segment_*",
+                    "concat_list*.txt",
                     "*.tmp"
                 ]
                 
@@ -290,16 +472,10 @@ class FileManager:
         """Validate that uploaded file is a valid PPTX"""
         
         try:
-            from pptx import Presentation
-            
-            # Try to open the file with python-pptx
-            prs = Presentation(file_path)
+            from utils.preflight import preflight_deck
             
-            # Basic validation - check if it has slides
-            if len(prs.slides) == 0:
-                return False
-                
-            return True
+            # Basic validation - check if it has slides, without loading the whole deck
+            return preflight_deck(file_path)['slide_count'] > 0
             
         except Exception:
             return False
@@ -308,23 +484,11 @@ class FileManager:
         """Get information about the uploaded PowerPoint file"""
         
         try:
-            from pptx import Presentation
-            
-            prs = Presentation(file_path)
+            from utils.preflight import preflight_deck
             
-            return {
-                'slide_count': len(prs.slides),
-                'file_size': os.path.getsize(file_path),
-                'has_images': any(
-                    any(shape.shape_type == 13 for shape in slide.shapes)
-                    for slide in prs.slides
-                ),
-                'has_notes': any(
-                    slide.notes_slide.notes_text_frame.text.strip()
-                    for slide in prs.slides
-                    if slide.notes_slide.notes_text_frame
-                )
-            }
+            info = preflight_deck(file_path)
+            info['file_size'] = os.path.getsize(file_path)
+            return info
             
         except Exception as e:
             return {'error': str(e)}
@@ -0,0 +1,125 @@
+"""
+Per-slide content fingerprints for incremental re-processing
+A revised deck reuses the narration of every slide that did not change since a previous job
+"""
+
+import json
+import shutil
+import hashlib
+import zipfile
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from utils.audio_bundle import AUDIO_DIR_NAME, published_audio_name
+
+FINGERPRINTS_NAME = "fingerprints.json"
+PICTURE_SHAPE_TYPE = 13
+
+def _digest(data: Any) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+def slide_fingerprint(slide, slide_number: int, text_content: List[str], notes: str) -> str:
+    """Hash of what the narration of a python-pptx slide depends on
+    
+    Covers the text, speaker notes, picture contents and layout, i.e. the layout
+    name and the position and size of every shape. The opening slide is narrated
+    as a title slide, so moving a slide to or from the front changes it too.
+    """
+    
+    shapes = []
+    pictures = []
+    for shape in slide.shapes:
+        shapes.append([str(shape.shape_type), shape.left, shape.top, shape.width, shape.height])
+        if shape.shape_type == PICTURE_SHAPE_TYPE:
+            try:
+                pictures.append(shape.image.sha1)
+            except Exception:
+                # Linked or broken pictures have no embedded blob to hash
+                pictures.append(None)
+    
+    try:
+        layout = slide.slide_layout.name
+    except Exception:
+        layout = None
+    
+    return _digest({
+        'layout': layout,
+        'shapes': shapes,
+        'pictures': pictures,
+        'text': text_content,
+        'notes': notes,
+        'opening_slide': slide_number == 1,
+    })
+
+def narration_fingerprint(config: Dict[str, Any]) -> str:
+    """Hash of the TTS settings; audio is only reused when these match too"""
+    return _digest({
+        'tts_provider': config.get('tts_provider'),
+        'voice_settings': config.get('voice_settings') or {},
+    })
+
+class PreviousJob:
+    """Published outputs of an earlier job, looked up by slide fingerprint"""
+    
+    def __init__(self, outputs_dir: Path):
+        self.job_id = outputs_dir.name
+        self.outputs_dir = outputs_dir
+        with open(outputs_dir / FINGERPRINTS_NAME, 'r') as f:
+            manifest = json.load(f)
+        
+        self.narration = manifest.get('narration')
+        self.slides = {}
+        for slide in manifest['slides']:
+            self.slides.setdefault(slide['fingerprint'], slide)
+    
+    @classmethod
+    def load(cls, outputs_root: Path, job_id: Optional[str]) -> Optional['PreviousJob']:
+        """The previous job, or None when it is unknown or predates fingerprints"""
+        if not job_id:
+            return None
+        if Path(job_id).name != job_id or job_id.startswith('.'):
+            print(f"Warning: Ignoring invalid previous job id {job_id!r}")
+            return None
+        outputs_dir = Path(outputs_root) / job_id
+        try:
+            return cls(outputs_dir)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: Cannot reuse outputs of job {job_id}: {e}")
+            return None
+    
+    def find(self, fingerprint: Optional[str]) -> Optional[Dict[str, Any]]:
+        return self.slides.get(fingerprint) if fingerprint else None
+    
+    def copy_audio(self, slide_number: int, destination: Path) -> bool:
+        """Copy a previous slide's narration from the audio dir or audio ZIP"""
+        
+        audio_path = self.outputs_dir / AUDIO_DIR_NAME / published_audio_name(slide_number)
+        if audio_path.exists():
+            shutil.copyfile(audio_path, destination)
+            return True
+        
+        zip_path = self.outputs_dir / "audio_files.zip"
+        member = f"slide_{slide_number:02d}_audio.mp3"
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zip_file, zip_file.open(member) as source, open(destination, 'wb') as target:
+                shutil.copyfileobj(source, target)
+            return True
+        except (OSError, KeyError, zipfile.BadZipFile):
+            return False
+
+def write_fingerprints(path: Path, config: Dict[str, Any], slides_data, transcripts):
+    """Record fingerprints, OCR text and transcripts so a later job can reuse them"""
+    
+    transcript_by_slide = {transcript['slide_number']: transcript['transcript'] for transcript in transcripts}
+    slides = [
+        {
+            'slide_number': slide_data['slide_number'],
+            'fingerprint': slide_data.get('fingerprint'),
+            'image_text': slide_data['image_text'],
+            'transcript': transcript_by_slide.get(slide_data['slide_number'], ''),
+        }
+        for slide_data in slides_data
+        if slide_data.get('fingerprint')
+    ]
+    with open(path, 'w') as f:
+        json.dump({'narration': narration_fingerprint(config), 'slides': slides}, f, indent=2)
@@ -0,0 +1,297 @@
+"""
+Job instrumentation
+Per-stage and per-operation timings and resource use, exported as JSON and Prometheus text
+"""
+
+import json
+import time
+import resource
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+def _io_bytes():
+    """Bytes this process has read from and written to storage, where Linux reports it"""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            fields = dict(line.split(': ', 1) for line in f.read().splitlines())
+        return int(fields['read_bytes']), int(fields['write_bytes'])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+def _rusage_peak_rss_bytes() -> int:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _hwm_rss_bytes() -> Optional[int]:
+    """Peak RSS since it was last reset through /proc/self/clear_refs, where Linux reports it"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+class _PeakRss:
+    """Peak RSS per stage, by resetting the kernel's high-water mark when a stage starts
+    
+    The mark is process-wide, so it is only reset when no other stage is running;
+    a stage that overlaps another reports the peak since the earliest of them started.
+    Where the mark cannot be reset, stages report the process lifetime peak.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = 0
+        # Highest mark seen before a reset, so the process peak survives resets
+        self._before_reset = 0
+    
+    def current(self) -> int:
+        hwm = _hwm_rss_bytes()
+        return hwm if hwm is not None else _rusage_peak_rss_bytes()
+    
+    def process_peak(self) -> int:
+        with self._lock:
+            return max(self._before_reset, self.current(), _rusage_peak_rss_bytes())
+    
+    def begin(self):
+        with self._lock:
+            if self._active == 0:
+                self._before_reset = max(self._before_reset, self.current())
+                try:
+                    with open('/proc/self/clear_refs', 'w') as f:
+                        f.write('5')
+                except OSError:
+                    pass
+            self._active += 1
+    
+    def end(self) -> int:
+        with self._lock:
+            self._active -= 1
+            return self.current()
+
+_PEAK_RSS = _PeakRss()
+
+def _peak_rss_bytes() -> int:
+    """Peak resident memory over the life of this process"""
+    return _PEAK_RSS.process_peak()
+
+def _children_cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def _accumulate(table: Dict[str, Dict[str, Any]], key: str, seconds: float, **counts):
+    entry = table.setdefault(key, {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+    entry['count'] += 1
+    entry['total_seconds'] += seconds
+    entry['max_seconds'] = max(entry['max_seconds'], seconds)
+    for name, value in counts.items():
+        entry[name] = entry.get(name, 0) + value
+
+class JobMetrics:
+    """Timings and resource use of one job; safe to record into from worker threads
+    
+    CPU time, peak RSS and I/O bytes are process-wide figures, so in the processor
+    daemon they include whatever other jobs ran at the same time. A stage's peak RSS
+    covers that stage only; the job's is the process lifetime peak.
+    """
+    
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.started_at = time.time()
+        self.stages = {}
+        self.operations = {}
+        self.api_calls = {}
+        self.subprocesses = {}
+        self.bytes = {}
+        self.scratch = {'peak_bytes': 0, 'stages': {}}
+        # Timeline of stages, operations and subprocesses, only kept while profiling
+        self.spans = None
+        self._lock = threading.Lock()
+    
+    def enable_spans(self):
+        self.spans = []
+    
+    def _add_span(self, name: str, category: str, seconds: float):
+        """Record a finished interval ending now; caller holds the lock"""
+        if self.spans is not None:
+            self.spans.append({
+                'name': name,
+                'category': category,
+                'start': time.time() - seconds - self.started_at,
+                'seconds': seconds,
+                'thread': threading.get_ident(),
+            })
+    
+    @contextmanager
+    def stage(self, name: str):
+        """Measure one pipeline stage"""
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        start_children = _children_cpu_seconds()
+        start_read, start_written = _io_bytes()
+        _PEAK_RSS.begin()
+        with self._lock:
+            self.stages[name] = {'in_progress': True, 'started_at': time.time(), '_start': start_wall}
+        
+        try:
+            yield
+        finally:
+            peak_rss = _PEAK_RSS.end()
+            end_read, end_written = _io_bytes()
+            with self._lock:
+                self.stages[name] = {
+                    'in_progress': False,
+                    'started_at': self.stages[name]['started_at'],
+                    'wall_seconds': round(time.perf_counter() - start_wall, 3),
+                    'cpu_seconds': round(time.process_time() - start_cpu, 3),
+                    'subprocess_cpu_seconds': round(_children_cpu_seconds() - start_children, 3),
+                    'peak_rss_bytes': peak_rss,
+                    'bytes_read': end_read - start_read,
+                    'bytes_written': end_written - start_written,
+                }
+                self._add_span(name, 'stage', self.stages[name]['wall_seconds'])
+    
+    @contextmanager
+    def operation(self, name: str):
+        """Measure a repeated operation such as a single slide's OCR"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                _accumulate(self.operations, name, seconds)
+                self._add_span(name, 'operation', seconds)
+    
+    def record_api_call(self, provider: str, operation: str, seconds: float, error: bool = False, **counts):
+        """Record an API request; counts are e.g. prompt_tokens, completion_tokens or characters"""
+        with self._lock:
+            _accumulate(self.api_calls, f"{provider}.{operation}", seconds, errors=int(error), **counts)
+            self._add_span(f"{provider}.{operation}", 'api_call', seconds)
+    
+    def record_subprocess(self, name: str, seconds: float, failed: bool = False):
+        with self._lock:
+            _accumulate(self.subprocesses, name, seconds, failures=int(failed))
+            self._add_span(name, 'subprocess', seconds)
+    
+    def add_bytes(self, name: str, count: int):
+        with self._lock:
+            self.bytes[name] = self.bytes.get(name, 0) + count
+    
+    def record_scratch(self, stage: str, used_bytes: int):
+        """Scratch space the job held at the end of a stage"""
+        with self._lock:
+            self.scratch['stages'][stage] = used_bytes
+            self.scratch['peak_bytes'] = max(self.scratch['peak_bytes'], used_bytes)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Everything recorded so far; stages still running report their elapsed time"""
+        with self._lock:
+            stages = {}
+            for name, stage in self.stages.items():
+                stage = dict(stage)
+                start = stage.pop('_start', None)
+                if stage['in_progress'] and start is not None:
+                    stage['wall_seconds'] = round(time.perf_counter() - start, 3)
+                stages[name] = stage
+            
+            return {
+                'job_id': self.job_id,
+                'started_at': self.started_at,
+                'elapsed_seconds': round(time.time() - self.started_at, 3),
+                'peak_rss_bytes': _peak_rss_bytes(),
+                'stages': stages,
+                'operations': json.loads(json.dumps(self.operations)),
+                'api_calls': json.loads(json.dumps(self.api_calls)),
+                'subprocesses': json.loads(json.dumps(self.subprocesses)),
+                'bytes': dict(self.bytes),
+                'scratch': json.loads(json.dumps(self.scratch)),
+            }
+    
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+def run_subprocess(metrics: Optional[JobMetrics], name: str, cmd, cancellation=None, **kwargs) -> subprocess.CompletedProcess:
+    """subprocess.run, timed into metrics when a job is being measured and killed if it is cancelled"""
+    start = time.perf_counter()
+    failed = True
+    try:
+        if cancellation is not None:
+            result = cancellation.run(cmd, **kwargs)
+        else:
+            result = subprocess.run(cmd, **kwargs)
+        failed = result.returncode != 0
+        return result
+    finally:
+        if metrics is not None:
+            metrics.record_subprocess(name, time.perf_counter() - start, failed)
+
+class HostMetrics:
+    """Totals over every job this process has run, rendered in Prometheus text format"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.jobs = {}
+        self.tables = {'stage': {}, 'operation': {}, 'api_call': {}, 'subprocess': {}}
+        self.bytes = {}
+    
+    def add_job(self, metrics: JobMetrics, status: str):
+        snapshot = metrics.snapshot()
+        with self._lock:
+            self.jobs[status] = self.jobs.get(status, 0) + 1
+            for name, stage in snapshot['stages'].items():
+                if 'wall_seconds' in stage:
+                    _accumulate(self.tables['stage'], name, stage['wall_seconds'])
+            for table, source in (('operation', 'operations'), ('api_call', 'api_calls'), ('subprocess', 'subprocesses')):
+                for name, entry in snapshot[source].items():
+                    total = self.tables[table].setdefault(name, {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+                    for key, value in entry.items():
+                        total[key] = max(total[key], value) if key == 'max_seconds' else total.get(key, 0) + value
+            for name, count in snapshot['bytes'].items():
+                self.bytes[name] = self.bytes.get(name, 0) + count
+    
+    def prometheus_text(self) -> str:
+        lines = [
+            '# HELP pptx_jobs_total Processing jobs finished, by final status',
+            '# TYPE pptx_jobs_total counter',
+        ]
+        with self._lock:
+            for status, count in sorted(self.jobs.items()):
+                lines.append(f'pptx_jobs_total{{status="{status}"}} {count}')
+            
+            for table, entries in self.tables.items():
+                metric = f'pptx_{table}_seconds'
+                lines.append(f'# HELP {metric} Wall time per {table.replace("_", " ")}')
+                lines.append(f'# TYPE {metric} summary')
+                counters = {}
+                for name, entry in sorted(entries.items()):
+                    lines.append(f'{metric}_sum{{name="{name}"}} {entry["total_seconds"]:.3f}')
+                    lines.append(f'{metric}_count{{name="{name}"}} {entry["count"]}')
+                    # Extra counters such as tokens, characters, errors and failures
+                    for key, value in entry.items():
+                        if key not in ('count', 'total_seconds', 'max_seconds'):
+                            counters.setdefault(key, []).append((name, value))
+                
+                # Each counter is its own metric family, so it is emitted after the summary
+                for key, values in sorted(counters.items()):
+                    counter = f'pptx_{table}_{key}_total'
+                    lines.append(f'# TYPE {counter} counter')
+                    for name, value in values:
+                        lines.append(f'{counter}{{name="{name}"}} {value}')
+            
+            lines.append('# HELP pptx_bytes_total Bytes moved by jobs, by kind')
+            lines.append('# TYPE pptx_bytes_total counter')
+            for name, count in sorted(self.bytes.items()):
+                lines.append(f'pptx_bytes_total{{kind="{name}"}} {count}')
+        
+        lines.append('# HELP pptx_process_peak_rss_bytes Peak resident memory of the worker process')
+        lines.append('# TYPE pptx_process_peak_rss_bytes gauge')
+        lines.append(f'pptx_process_peak_rss_bytes {_peak_rss_bytes()}')
+        return '\n'.join(lines) + '\n'
+
+HOST_METRICS = HostMetrics()
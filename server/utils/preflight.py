@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Fast preflight analysis of uploaded PowerPoint decks
+Reads only the ZIP central directory and the slide XML parts, without python-pptx
+"""
+
+import sys
+import json
+import zipfile
+import posixpath
+from xml.etree import ElementTree as ET
+from typing import Dict, Any, List
+
+NS_P = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+NS_A = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+NS_R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+NOTES_SLIDE_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/notesSlide'
+
+# Rough per-operation figures used for the processing estimate. They only need to be
+# in the right ballpark for an upload-time prediction, not exact.
+ESTIMATES = {
+    'fixed_seconds': 20.0,           # LibreOffice PDF + slide image conversion
+    'llm_seconds_per_slide': 12.0,   # generate + refine transcript
+    'tts_seconds_per_slide': 5.0,
+    'ocr_seconds_per_picture': 1.5,
+    'encode_seconds_per_slide': 2.0,
+    'llm_input_tokens_per_slide': 2000,   # prompts plus the slide image
+    'llm_output_tokens_per_slide': 650,
+    'llm_input_cost_per_million': 2.50,
+    'llm_output_cost_per_million': 10.00,
+    'narration_chars_per_slide': 550,
+    'tts_cost_per_million_chars': {
+        'openai': 30.0,
+        'google': 16.0,
+        'elevenlabs': 180.0,
+    },
+}
+
+def _part_rels_name(part_name: str) -> str:
+    directory, name = posixpath.split(part_name)
+    return posixpath.join(directory, '_rels', f"{name}.rels")
+
+def read_relationships(archive: zipfile.ZipFile, part_name: str) -> Dict[str, Dict[str, str]]:
+    """Map relationship id to its type and resolved target part name"""
+    
+    rels_name = _part_rels_name(part_name)
+    if rels_name not in archive.NameToInfo:
+        return {}
+    
+    relationships = {}
+    base_dir = posixpath.dirname(part_name)
+    with archive.open(rels_name) as f:
+        for _, element in ET.iterparse(f):
+            if element.tag == f'{NS_REL}Relationship' and element.get('TargetMode') != 'External':
+                target = element.get('Target', '')
+                if target.startswith('/'):
+                    # Absolute targets are part names from the package root
+                    target = posixpath.normpath(target.lstrip('/'))
+                else:
+                    target = posixpath.normpath(posixpath.join(base_dir, target))
+                relationships[element.get('Id')] = {'type': element.get('Type', ''), 'target': target}
+    return relationships
+
+def slide_part_names(archive: zipfile.ZipFile) -> List[str]:
+    """Slide parts in presentation order, from presentation.xml's sldIdLst"""
+    
+    presentation = 'ppt/presentation.xml'
+    relationships = read_relationships(archive, presentation)
+    
+    slide_parts = []
+    with archive.open(presentation) as f:
+        for _, element in ET.iterparse(f):
+            if element.tag == f'{NS_P}sldId':
+                rel = relationships.get(element.get(f'{NS_R}id'))
+                if rel:
+                    slide_parts.append(rel['target'])
+            elif element.tag == f'{NS_P}sldIdLst':
+                break
+    return slide_parts
+
+def _scan_slide(archive: zipfile.ZipFile, part_name: str) -> Dict[str, int]:
+    """Count pictures and text characters on a slide with a streaming parse"""
+    
+    pictures = 0
+    text_chars = 0
+    with archive.open(part_name) as f:
+        for _, element in ET.iterparse(f):
+            if element.tag == f'{NS_P}pic':
+                pictures += 1
+            elif element.tag == f'{NS_A}t' and element.text:
+                text_chars += len(element.text)
+            element.clear()
+    return {'pictures': pictures, 'text_chars': text_chars}
+
+def _notes_text_chars(archive: zipfile.ZipFile, part_name: str) -> int:
+    """Characters of speaker notes, ignoring slide number and header placeholders"""
+    
+    text_chars = 0
+    in_body = False
+    with archive.open(part_name) as f:
+        for event, element in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if element.tag == f'{NS_P}sp':
+                    in_body = False
+                elif element.tag == f'{NS_P}ph' and element.get('type') == 'body':
+                    in_body = True
+            elif element.tag == f'{NS_A}t' and in_body and element.text:
+                text_chars += len(element.text.strip())
+    return text_chars
+
+def estimate_processing(slide_count: int, picture_count: int, tts_provider: str = 'openai') -> Dict[str, float]:
+    """Predict wall time and API cost for a deck of this shape"""
+    
+    e = ESTIMATES
+    seconds = (
+        e['fixed_seconds'] +
+        slide_count * (e['llm_seconds_per_slide'] + e['tts_seconds_per_slide'] + e['encode_seconds_per_slide']) +
+        picture_count * e['ocr_seconds_per_picture']
+    )
+    
+    llm_cost = slide_count * (
+        e['llm_input_tokens_per_slide'] * e['llm_input_cost_per_million'] +
+        e['llm_output_tokens_per_slide'] * e['llm_output_cost_per_million']
+    ) / 1_000_000
+    tts_rate = e['tts_cost_per_million_chars'].get(tts_provider, e['tts_cost_per_million_chars']['openai'])
+    tts_cost = slide_count * e['narration_chars_per_slide'] * tts_rate / 1_000_000
+    
+    return {
+        'predicted_seconds': round(seconds, 1),
+        'predicted_cost_usd': round(llm_cost + tts_cost, 4),
+    }
+
+def preflight_deck(file_path: str, tts_provider: str = 'openai') -> Dict[str, Any]:
+    """Summarize a deck cheaply enough to run inside the upload request"""
+    
+    with zipfile.ZipFile(file_path, 'r') as archive:
+        if 'ppt/presentation.xml' not in archive.NameToInfo:
+            raise ValueError("Not a PowerPoint presentation")
+        
+        media_bytes = sum(
+            info.file_size for info in archive.infolist()
+            if info.filename.startswith('ppt/media/')
+        )
+        
+        slide_count = 0
+        picture_count = 0
+        text_chars = 0
+        notes_slides = 0
+        for slide_part in slide_part_names(archive):
+            if slide_part not in archive.NameToInfo:
+                continue
+            slide_count += 1
+            
+            slide_stats = _scan_slide(archive, slide_part)
+            picture_count += slide_stats['pictures']
+            text_chars += slide_stats['text_chars']
+            
+            for rel in read_relationships(archive, slide_part).values():
+                if rel['type'] == NOTES_SLIDE_REL and rel['target'] in archive.NameToInfo:
+                    if _notes_text_chars(archive, rel['target']) > 0:
+                        notes_slides += 1
+    
+    info = {
+        'slide_count': slide_count,
+        'picture_count': picture_count,
+        'text_chars': text_chars,
+        'notes_slide_count': notes_slides,
+        'has_images': picture_count > 0,
+        'has_notes': notes_slides > 0,
+        'media_bytes': media_bytes,
+    }
+    info.update(estimate_processing(slide_count, picture_count, tts_provider))
+    return info
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python3 preflight.py <file_path> [tts_provider]", file=sys.stderr)
+        sys.exit(1)
+    
+    tts_provider = sys.argv[2] if len(sys.argv) == 3 else 'openai'
+    try:
+        print(json.dumps(preflight_deck(sys.argv[1], tts_provider)))
+    except Exception as e:
+        print(json.dumps({'error': str(e)}))
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
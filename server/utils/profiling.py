@@ -0,0 +1,148 @@
+"""
+Opt-in profiling of the processing pipeline
+Writes pstats or flamegraph-compatible stacks per stage, plus a timeline of subprocess calls
+"""
+
+import os
+import sys
+import json
+import cProfile
+import pstats
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+PROFILING_MODES = ('deterministic', 'sampling')
+DEFAULT_SAMPLE_INTERVAL_MS = 5
+
+class _StackSampler:
+    """Samples one thread's Python stack at a fixed interval into folded-stack counts"""
+    
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stage = None
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                # Root every stack at its stage so the flamegraph splits by stage first
+                stack.append(self.stage or 'pipeline')
+                with self._lock:
+                    self.counts[';'.join(reversed(stack))] += 1
+    
+    def folded_stacks(self):
+        with self._lock:
+            return sorted(self.counts.items())
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+class JobProfiler:
+    """Profiles each pipeline stage of one job
+    
+    'deterministic' runs cProfile around every stage and also merges them into
+    process.pstats. 'sampling' records the job thread's stack every few
+    milliseconds into process.folded, the input format of flamegraph.pl and
+    speedscope. Both write trace.json, a Chrome trace of stages, operations, API
+    calls and subprocesses (LibreOffice, ffmpeg, tesseract via OCR) that opens in
+    Perfetto or chrome://tracing.
+    """
+    
+    def __init__(self, mode: str, metrics):
+        if mode not in PROFILING_MODES:
+            raise ValueError(f"Unsupported profiling mode: {mode}")
+        self.mode = mode
+        self.metrics = metrics
+        self.metrics.enable_spans()
+        self.stage_profiles = {}
+        self.sampler = None
+    
+    @classmethod
+    def from_config(cls, config, metrics) -> Optional['JobProfiler']:
+        mode = config.get('profiling')
+        if not mode or mode == 'off':
+            return None
+        return cls(mode, metrics)
+    
+    @contextmanager
+    def stage(self, name: str):
+        if self.mode == 'deterministic':
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as e:
+                # Another profiler is already active in this thread
+                print(f"Warning: Could not profile stage {name}: {e}")
+                yield
+                return
+            try:
+                yield
+            finally:
+                profile.disable()
+                self.stage_profiles[name] = profile
+        else:
+            if self.sampler is None:
+                interval_ms = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS') or DEFAULT_SAMPLE_INTERVAL_MS)
+                self.sampler = _StackSampler(threading.get_ident(), interval_ms / 1000)
+            self.sampler.stage = name
+            try:
+                yield
+            finally:
+                self.sampler.stage = None
+    
+    def write(self, profile_dir: Path):
+        """Write everything profiled so far into profile_dir"""
+        profile_dir = Path(profile_dir)
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        
+        if self.stage_profiles:
+            merged = None
+            for name, profile in self.stage_profiles.items():
+                profile.dump_stats(str(profile_dir / f"{name}.pstats"))
+                if merged is None:
+                    merged = pstats.Stats(profile)
+                else:
+                    merged.add(profile)
+            merged.dump_stats(str(profile_dir / "process.pstats"))
+        
+        if self.sampler is not None:
+            with open(profile_dir / "process.folded", 'w') as f:
+                for stack, count in self.sampler.folded_stacks():
+                    f.write(f"{stack} {count}\n")
+        
+        self._write_trace(profile_dir / "trace.json")
+    
+    def _write_trace(self, path: Path):
+        events = [
+            {
+                'name': span['name'],
+                'cat': span['category'],
+                'ph': 'X',
+                'ts': int(span['start'] * 1_000_000),
+                'dur': int(span['seconds'] * 1_000_000),
+                'pid': os.getpid(),
+                'tid': span['thread'],
+            }
+            for span in list(self.metrics.spans or [])
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    
+    def close(self):
+        if self.sampler is not None:
+            self.sampler.stop()
@@ -0,0 +1,198 @@
+"""
+Host-level admission control for processing jobs
+Admits jobs against CPU, memory and scratch-disk budgets and caps concurrent API calls per provider
+"""
+
+import os
+import heapq
+import shutil
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Callable
+
+from utils.preflight import preflight_deck
+from utils.checkpoint import checkpoint_root
+
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+
+# Rough per-job resource figures used to reserve capacity before a job starts
+DEMAND_ESTIMATES = {
+    'base_memory_mb': 300,             # interpreter, python-pptx and PIL
+    'memory_per_media_byte': 3,        # decoded pictures held while rendering slide images
+    'scratch_per_deck_byte': 4,        # extracted tree, narrated copy and PDF
+    'scratch_mb_per_slide': 8,         # slide PNG, narration MP3 and video segments
+}
+
+# Concurrent requests allowed per provider across every job in this process
+PROVIDER_CONCURRENCY = {
+    'openai': 8,
+    'google': 8,
+    'elevenlabs': 2,
+}
+
+_provider_lock = threading.Lock()
+_provider_semaphores = {}
+
+def _provider_semaphore(provider: str) -> threading.Semaphore:
+    with _provider_lock:
+        if provider not in _provider_semaphores:
+            limit = os.environ.get(f'PROVIDER_CONCURRENCY_{provider.upper()}') or PROVIDER_CONCURRENCY.get(provider, 4)
+            _provider_semaphores[provider] = threading.Semaphore(max(1, int(limit)))
+        return _provider_semaphores[provider]
+
+@contextmanager
+def provider_slot(provider: str):
+    """Hold one of the provider's request slots for the duration of an API call"""
+    semaphore = _provider_semaphore(provider)
+    with semaphore:
+        yield
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _total_memory_bytes() -> int:
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return 4 * 1024 ** 3
+
+def estimate_job_demand(file_path: str, config: Dict[str, Any]) -> Dict[str, int]:
+    """CPU, memory and scratch space a job is expected to need at its peak"""
+    
+    e = DEMAND_ESTIMATES
+    try:
+        deck = preflight_deck(file_path)
+    except Exception as ex:
+        print(f"Warning: Could not inspect {file_path} for scheduling: {ex}")
+        deck = {'slide_count': 0, 'media_bytes': 0}
+    deck_bytes = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+    
+    # The segment encoder pool is the widest CPU user, see VideoRenderer._plan_segment_pool
+    cpus = config.get('segment_workers') or os.environ.get('SEGMENT_WORKERS') or max(1, _available_cpus() // 2)
+    
+    return {
+        'cpus': int(cpus),
+        'memory_bytes': int(e['base_memory_mb'] * 1024 ** 2 + deck['media_bytes'] * e['memory_per_media_byte']),
+        'scratch_bytes': int(deck_bytes * e['scratch_per_deck_byte'] + deck['slide_count'] * e['scratch_mb_per_slide'] * 1024 ** 2),
+    }
+
+class JobScheduler:
+    """Priority queue of jobs that start only when their estimated demand fits the host budgets
+    
+    Jobs start strictly in priority order, so a large job at the head of the queue is
+    not starved by smaller ones behind it. A job needing more CPU or memory than a whole
+    budget is clamped to it and runs once everything else has finished; one needing more
+    scratch space than the budget is refused, as it would fill the disk part way through.
+    """
+    
+    def __init__(self, max_jobs: int, cpus: int = None, memory_bytes: int = None,
+                 scratch_bytes: int = None, scratch_dir: str = None):
+        self.max_jobs = max_jobs
+        # Job intermediates are written to the checkpoint directories, see PowerPointProcessor
+        self.scratch_dir = scratch_dir or str(checkpoint_root())
+        os.makedirs(self.scratch_dir, exist_ok=True)
+        self.budget = {
+            'cpus': cpus or _available_cpus(),
+            'memory_bytes': memory_bytes or int(_total_memory_bytes() * 0.75),
+            'scratch_bytes': scratch_bytes or int(shutil.disk_usage(self.scratch_dir).free * 0.8),
+        }
+        self.reserved = {key: 0 for key in self.budget}
+        self.running = {}
+        
+        self._queue = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+    
+    @classmethod
+    def from_environment(cls, max_jobs: int) -> 'JobScheduler':
+        def env_int(name, scale=1):
+            value = os.environ.get(name)
+            return int(float(value) * scale) if value else None
+        
+        return cls(
+            max_jobs,
+            cpus=env_int('JOB_CPU_BUDGET'),
+            memory_bytes=env_int('JOB_MEMORY_BUDGET_MB', 1024 ** 2),
+            scratch_bytes=env_int('JOB_SCRATCH_BUDGET_MB', 1024 ** 2),
+        )
+    
+    def submit(self, job_id: str, demand: Dict[str, int], run: Callable[[], None], priority: str = 'normal') -> int:
+        """Queue a job; returns its position in the queue, 0 if it started immediately"""
+        
+        if demand.get('scratch_bytes', 0) > self.budget['scratch_bytes']:
+            raise Exception(f"Job {job_id} needs about {demand['scratch_bytes'] // 1024 ** 2} MB of scratch space, "
+                            f"more than this host's {self.budget['scratch_bytes'] // 1024 ** 2} MB budget")
+        
+        # Clamp oversized demands so the job can still run on an otherwise idle host
+        demand = {key: min(demand.get(key, 0), self.budget[key]) for key in self.budget}
+        
+        with self._condition:
+            heapq.heappush(self._queue, (PRIORITIES.get(priority, PRIORITIES['normal']), next(self._order), job_id, demand, run))
+            self._dispatch()
+            for position, entry in enumerate(sorted(self._queue)):
+                if entry[2] == job_id:
+                    return position + 1
+            return 0
+    
+    def cancel(self, job_id: str) -> bool:
+        """Drop a job that has not started yet; False if it is not in the queue"""
+        with self._condition:
+            remaining = [entry for entry in self._queue if entry[2] != job_id]
+            if len(remaining) == len(self._queue):
+                return False
+            heapq.heapify(remaining)
+            self._queue = remaining
+            # The cancelled job may have been the head that kept smaller jobs waiting
+            self._dispatch()
+            self._condition.notify_all()
+            return True
+    
+    def _fits(self, demand: Dict[str, int]) -> bool:
+        if len(self.running) >= self.max_jobs:
+            return False
+        if not self.running:
+            return True
+        if any(self.reserved[key] + demand[key] > self.budget[key] for key in self.budget):
+            return False
+        # Reservations are estimates, so also check what is actually left on the scratch disk
+        return demand['scratch_bytes'] <= shutil.disk_usage(self.scratch_dir).free
+    
+    def _dispatch(self):
+        """Start queued jobs while the head of the queue fits; caller holds the condition"""
+        while self._queue and self._fits(self._queue[0][3]):
+            _, _, job_id, demand, run = heapq.heappop(self._queue)
+            for key in self.budget:
+                self.reserved[key] += demand[key]
+            self.running[job_id] = demand
+            threading.Thread(target=self._run, args=(job_id, run), name=f"job-{job_id}", daemon=True).start()
+    
+    def _run(self, job_id: str, run: Callable[[], None]):
+        try:
+            run()
+        finally:
+            with self._condition:
+                demand = self.running.pop(job_id)
+                for key in self.budget:
+                    self.reserved[key] -= demand[key]
+                self._dispatch()
+                self._condition.notify_all()
+    
+    def status(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'max_jobs': self.max_jobs,
+                'budget': dict(self.budget),
+                'reserved': dict(self.reserved),
+                'running': sorted(self.running),
+                'queued': [entry[2] for entry in sorted(self._queue)],
+            }
+    
+    def wait_idle(self):
+        """Block until every queued and running job has finished"""
+        with self._condition:
+            while self._queue or self.running:
+                self._condition.wait()
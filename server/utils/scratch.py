@@ -0,0 +1,137 @@
+"""
+Scratch space for job intermediates
+Puts short-lived intermediates on tmpfs when configured, tracks each job's bytes and frees intermediates once consumed
+"""
+
+import os
+import time
+import shutil
+from pathlib import Path
+from typing import Optional
+
+# Rough size of one slide's rendered image, PDF page and encoded segments
+HOT_BYTES_PER_SLIDE = 6 * 1024 ** 2
+DEFAULT_HOT_MAX_AGE_HOURS = 24
+
+def hot_root() -> Optional[Path]:
+    """tmpfs directory for hot intermediates, from SCRATCH_TMPFS_DIR (e.g. /dev/shm/pptx)"""
+    root = os.environ.get('SCRATCH_TMPFS_DIR')
+    return Path(root) if root else None
+
+def path_bytes(path: Path) -> int:
+    """Bytes held by a file or everything under a directory"""
+    try:
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+        total = 0
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    total += path_bytes(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+        return total
+    except FileNotFoundError:
+        return 0
+
+class ScratchSpace:
+    """A job's intermediates: where they go, how big they get and when they are freed
+    
+    Everything lives in the job's work dir except hot intermediates, the slide
+    images and segments that exist only while the video is rendered. Those go to
+    tmpfs when SCRATCH_TMPFS_DIR is set and has room, unless the job's files must
+    be readable by workers on other hosts.
+    """
+    
+    def __init__(self, job_id: str, work_dir: Path, metrics=None, shared: bool = False):
+        self.job_id = job_id
+        self.work_dir = Path(work_dir)
+        self.metrics = metrics
+        self.shared = shared
+        self.hot_dirs = {}
+        self.peak_bytes = 0
+    
+    def hot_dir(self, name: str, expected_bytes: int = 0) -> Path:
+        """An empty directory for intermediates that do not outlive the current stage"""
+        if name in self.hot_dirs:
+            return self.hot_dirs[name]
+        
+        directory = self.work_dir / name
+        root = hot_root()
+        if root and not self.shared:
+            try:
+                root.mkdir(parents=True, exist_ok=True)
+                if shutil.disk_usage(root).free >= expected_bytes:
+                    directory = root / self.job_id / name
+                else:
+                    print(f"Not enough room on {root} for {name}; using the work dir")
+            except OSError as e:
+                print(f"Warning: Could not use {root} for scratch files: {e}")
+        
+        # Leftovers of an interrupted attempt are never reused
+        shutil.rmtree(directory, ignore_errors=True)
+        directory.mkdir(parents=True)
+        self.hot_dirs[name] = directory
+        return directory
+    
+    def usage(self) -> int:
+        """Bytes the job currently holds in its work dir and hot dirs"""
+        total = path_bytes(self.work_dir)
+        for directory in self.hot_dirs.values():
+            if not directory.is_relative_to(self.work_dir):
+                total += path_bytes(directory)
+        return total
+    
+    def measure(self, stage: str) -> int:
+        """Record the job's scratch bytes at the end of a stage"""
+        used = self.usage()
+        self.peak_bytes = max(self.peak_bytes, used)
+        if self.metrics is not None:
+            self.metrics.record_scratch(stage, used)
+        return used
+    
+    def release(self, *names: str) -> int:
+        """Delete intermediates nothing reads any more: hot dirs by name, or work dir globs"""
+        freed = 0
+        for name in names:
+            if name in self.hot_dirs:
+                paths = [self.hot_dirs.pop(name)]
+            else:
+                paths = list(self.work_dir.glob(name))
+            
+            for path in paths:
+                freed += path_bytes(path)
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    path.unlink(missing_ok=True)
+        return freed
+    
+    def close(self):
+        """Remove the hot dirs; they are never needed by a later attempt"""
+        self.release(*list(self.hot_dirs))
+        root = hot_root()
+        if root:
+            try:
+                (root / self.job_id).rmdir()
+            except OSError:
+                pass
+
+def prune_hot_dirs(max_age_hours: float = None, keep=()) -> int:
+    """Delete tmpfs directories left behind by processes that were killed"""
+    
+    root = hot_root()
+    if not root or not root.exists():
+        return 0
+    if max_age_hours is None:
+        max_age_hours = float(os.environ.get('SCRATCH_TMPFS_MAX_AGE_HOURS') or DEFAULT_HOT_MAX_AGE_HOURS)
+    
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for directory in root.iterdir():
+        if directory.name in keep or not directory.is_dir():
+            continue
+        if directory.stat().st_mtime < cutoff:
+            shutil.rmtree(directory, ignore_errors=True)
+            removed += 1
+    return removed
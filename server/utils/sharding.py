@@ -0,0 +1,259 @@
+"""
+Sharded processing of large decks
+Splits a job into slide ranges that worker processes, on this host or others, claim from a shared directory
+"""
+
+import os
+import json
+import time
+import socket
+import zipfile
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from utils.preflight import slide_part_names
+
+MANIFEST_NAME = "shards.json"
+RESULT_NAME = "result.json"
+ERROR_NAME = "error.json"
+CLAIM_PREFIX = "claim."
+DEFAULT_MAX_WORKERS = 4
+HEARTBEAT_INTERVAL = 5.0
+# A claim whose worker stopped touching it for this long is taken over by another worker
+CLAIM_TIMEOUT = 60.0
+
+# Record fields holding paths, stored relative to the shard directory
+PATH_FIELDS = ('slide_image_path', 'audio_file')
+
+def shard_worker_count() -> int:
+    """Local worker processes per sharded job; 0 leaves every shard to workers on other hosts"""
+    workers = os.environ.get('SHARD_WORKERS')
+    if workers:
+        return max(0, int(workers))
+    return max(1, min(DEFAULT_MAX_WORKERS, (os.cpu_count() or 1) // 2))
+
+def deck_slide_count(file_path: str) -> int:
+    with zipfile.ZipFile(file_path) as archive:
+        return len(slide_part_names(archive))
+
+def plan_shards(slide_count: int, shard_size: int) -> List[Dict[str, int]]:
+    """Consecutive slide ranges of at most shard_size slides, numbered from 1"""
+    return [
+        {'index': index, 'first_slide': first, 'last_slide': min(first + shard_size - 1, slide_count)}
+        for index, first in enumerate(range(1, slide_count + 1, shard_size))
+    ]
+
+def write_sub_deck(source: str, destination: Path, first_slide: int, last_slide: int):
+    """Save a copy of the deck holding only slides first_slide..last_slide"""
+    from pptx import Presentation
+    
+    prs = Presentation(source)
+    slide_ids = prs.element.sldIdLst
+    for position, slide_id in enumerate(list(slide_ids), start=1):
+        if not first_slide <= position <= last_slide:
+            # Saving writes only parts reachable through relationships, so the slide,
+            # its notes and media nothing else uses are left out
+            prs.part.drop_rel(slide_id.rId)
+            slide_ids.remove(slide_id)
+    prs.save(str(destination))
+
+def _write_json(path: Path, data: Dict[str, Any]):
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
+
+class ShardClaim:
+    """A worker's hold on one shard, kept alive by touching the claim file"""
+    
+    def __init__(self, index: int, path: Path):
+        self.index = index
+        self.path = path
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, name=f"shard-{index}-heartbeat", daemon=True)
+        self._thread.start()
+    
+    def _heartbeat(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                os.utime(self.path)
+            except OSError:
+                return
+    
+    def release(self):
+        self._stop.set()
+        self._thread.join()
+
+class ShardSet:
+    """The slide ranges of one job, in a directory every worker can reach
+    
+    Each shard has a subdirectory. A worker claims a shard by creating the next
+    numbered claim file there with O_EXCL and keeps touching it while it works;
+    a claim that goes stale is taken over by creating the following number, so
+    every shard is processed at least once. A shard is finished once its
+    result.json exists and failed while its error.json does.
+    """
+    
+    def __init__(self, directory: Path):
+        self.directory = Path(directory).resolve()
+        self.manifest_path = self.directory / MANIFEST_NAME
+        self.manifest = None
+    
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+    
+    def create(self, job_id: str, file_path: str, shard_size: int, config: Dict[str, Any], cancel_path: Path):
+        """Plan the shards of a deck; config must not hold API keys, workers get those separately"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        slide_count = deck_slide_count(file_path)
+        self.manifest = {
+            'job_id': job_id,
+            'file_path': str(Path(file_path).resolve()),
+            'config': config,
+            'cancel_path': str(Path(cancel_path).resolve()),
+            'slide_count': slide_count,
+            'shard_size': shard_size,
+            'shards': plan_shards(slide_count, shard_size),
+            'created_at': time.time(),
+        }
+        _write_json(self.manifest_path, self.manifest)
+    
+    def load(self) -> Dict[str, Any]:
+        if not self.exists():
+            raise Exception(f"No shard manifest in {self.directory}")
+        with open(self.manifest_path, 'r') as f:
+            self.manifest = json.load(f)
+        return self.manifest
+    
+    def _loaded(self) -> Dict[str, Any]:
+        if self.manifest is None:
+            self.load()
+        return self.manifest
+    
+    @property
+    def job_id(self) -> str:
+        return self._loaded()['job_id']
+    
+    @property
+    def shards(self) -> List[Dict[str, int]]:
+        return self._loaded()['shards']
+    
+    @property
+    def file_path(self) -> str:
+        return self._loaded()['file_path']
+    
+    @property
+    def config(self) -> Dict[str, Any]:
+        return self._loaded()['config']
+    
+    @property
+    def cancel_path(self) -> Path:
+        return Path(self._loaded()['cancel_path'])
+    
+    def shard_dir(self, index: int) -> Path:
+        return self.directory / f"shard_{index:03d}"
+    
+    def _claim_numbers(self, shard_dir: Path) -> List[int]:
+        numbers = []
+        for path in shard_dir.glob(f"{CLAIM_PREFIX}*"):
+            suffix = path.name[len(CLAIM_PREFIX):]
+            if suffix.isdigit():
+                numbers.append(int(suffix))
+        return sorted(numbers)
+    
+    def _live_claim(self, shard_dir: Path, numbers: List[int]) -> bool:
+        if not numbers:
+            return False
+        try:
+            touched = (shard_dir / f"{CLAIM_PREFIX}{numbers[-1]}").stat().st_mtime
+        except FileNotFoundError:
+            return False
+        return time.time() - touched < CLAIM_TIMEOUT
+    
+    def claim_next(self) -> Optional[ShardClaim]:
+        """Claim the first shard that is neither finished, failed nor held by a live worker"""
+        for shard in self.shards:
+            shard_dir = self.shard_dir(shard['index'])
+            shard_dir.mkdir(exist_ok=True)
+            if (shard_dir / RESULT_NAME).exists() or (shard_dir / ERROR_NAME).exists():
+                continue
+            numbers = self._claim_numbers(shard_dir)
+            if self._live_claim(shard_dir, numbers):
+                continue
+            
+            # Of several workers taking over the same stale claim, only one creates the next number
+            claim_path = shard_dir / f"{CLAIM_PREFIX}{numbers[-1] + 1 if numbers else 1}"
+            try:
+                fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'host': socket.gethostname(), 'pid': os.getpid(), 'claimed_at': time.time()}, f)
+            return ShardClaim(shard['index'], claim_path)
+        return None
+    
+    def states(self) -> List[str]:
+        """'done', 'failed', 'running' or 'pending' for each shard, in slide order"""
+        states = []
+        for shard in self.shards:
+            shard_dir = self.shard_dir(shard['index'])
+            if (shard_dir / RESULT_NAME).exists():
+                states.append('done')
+            elif (shard_dir / ERROR_NAME).exists():
+                states.append('failed')
+            elif shard_dir.exists() and self._live_claim(shard_dir, self._claim_numbers(shard_dir)):
+                states.append('running')
+            else:
+                states.append('pending')
+        return states
+    
+    def mark_done(self, index: int, result: Dict[str, Any]):
+        """Publish a shard's records and segments; paths are stored relative to this directory"""
+        result = dict(result)
+        for name in ('slides_data', 'transcripts', 'audio_files'):
+            result[name] = [self._relative_record(record) for record in result[name]]
+        result['segments'] = [os.path.relpath(segment, self.directory) for segment in result['segments']]
+        _write_json(self.shard_dir(index) / RESULT_NAME, result)
+    
+    def mark_failed(self, index: int, error_message: str):
+        _write_json(self.shard_dir(index) / ERROR_NAME, {'error_message': error_message, 'host': socket.gethostname()})
+    
+    def errors(self) -> Dict[int, str]:
+        errors = {}
+        for shard in self.shards:
+            error_path = self.shard_dir(shard['index']) / ERROR_NAME
+            if error_path.exists():
+                with open(error_path, 'r') as f:
+                    errors[shard['index']] = json.load(f)['error_message']
+        return errors
+    
+    def reset_failed(self):
+        """Let failed shards be claimed again, e.g. when their job is resumed"""
+        for shard in self.shards:
+            shard_dir = self.shard_dir(shard['index'])
+            error_path = shard_dir / ERROR_NAME
+            if error_path.exists():
+                for number in self._claim_numbers(shard_dir):
+                    (shard_dir / f"{CLAIM_PREFIX}{number}").unlink(missing_ok=True)
+                error_path.unlink()
+    
+    def results(self) -> List[Dict[str, Any]]:
+        """Every shard's result in slide order, with absolute paths"""
+        results = []
+        for shard in self.shards:
+            with open(self.shard_dir(shard['index']) / RESULT_NAME, 'r') as f:
+                result = json.load(f)
+            for name in ('slides_data', 'transcripts', 'audio_files'):
+                result[name] = [self._absolute_record(record) for record in result[name]]
+            result['segments'] = [str(self.directory / segment) for segment in result['segments']]
+            results.append(result)
+        return results
+    
+    def _relative_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: os.path.relpath(value, self.directory) if key in PATH_FIELDS and value else value
+                for key, value in record.items()}
+    
+    def _absolute_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: str(self.directory / value) if key in PATH_FIELDS and value else value
+                for key, value in record.items()}
@@ -0,0 +1,100 @@
+"""
+Disk-backed per-slide records for memory-bounded processing
+Keeps only a bounded working set of slide records in RAM
+"""
+
+import os
+import copy
+import json
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Iterator
+
+DEFAULT_MEMORY_LIMIT_MB = 64
+
+def memory_limit_bytes() -> int:
+    """Memory ceiling for cached slide records, from the host environment"""
+    limit_mb = os.environ.get('SLIDE_MEMORY_LIMIT_MB') or DEFAULT_MEMORY_LIMIT_MB
+    return int(float(limit_mb) * 1024 * 1024)
+
+class SlideRecordList:
+    """A list of JSON-serializable records stored one file per entry
+    
+    Reads return a deep copy, so changing a record only persists once it is assigned
+    back with records[i] = record. Reopening an existing directory picks up the
+    records already written there.
+    """
+    
+    def __init__(self, directory: Path, memory_limit_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.memory_limit_bytes = memory_limit_bytes
+        
+        self._count = len(list(self.directory.glob("*.json")))
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+    
+    def _path(self, index: int) -> Path:
+        return self.directory / f"{index:05d}.json"
+    
+    def _normalize_index(self, index: int) -> int:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("slide record index out of range")
+        return index
+    
+    def _remember(self, index: int, record: Dict[str, Any], size: int):
+        """Cache a record, evicting the least recently used ones past the memory ceiling"""
+        
+        if index in self._cache:
+            self._cached_bytes -= self._cache.pop(index)[1]
+        
+        if size > self.memory_limit_bytes:
+            return
+        
+        self._cache[index] = (record, size)
+        self._cached_bytes += size
+        while self._cached_bytes > self.memory_limit_bytes:
+            _, (_, evicted_size) = self._cache.popitem(last=False)
+            self._cached_bytes -= evicted_size
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        index = self._normalize_index(index)
+        
+        if index in self._cache:
+            self._cache.move_to_end(index)
+            return copy.deepcopy(self._cache[index][0])
+        
+        with open(self._path(index), 'r') as f:
+            data = f.read()
+        record = json.loads(data)
+        self._remember(index, record, len(data))
+        return copy.deepcopy(record)
+    
+    def __setitem__(self, index: int, record: Dict[str, Any]):
+        index = self._normalize_index(index)
+        self._write(index, record)
+    
+    def _write(self, index: int, record: Dict[str, Any]):
+        data = json.dumps(record)
+        
+        # Write then rename so a crash never leaves a truncated record behind
+        temp_path = self._path(index).with_suffix(".tmp")
+        with open(temp_path, 'w') as f:
+            f.write(data)
+        os.replace(temp_path, self._path(index))
+        
+        # Cached as read back from disk, so it shares no nested objects with the caller's record
+        self._remember(index, json.loads(data), len(data))
+    
+    def append(self, record: Dict[str, Any]):
+        self._write(self._count, record)
+        self._count += 1
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self._count):
+            yield self[index]
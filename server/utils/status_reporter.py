@@ -0,0 +1,126 @@
+"""
+Background job status reporting
+Coalesces progress updates to the API server so a slow server never stalls processing
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, Optional
+
+from utils.clients import http_session
+
+DEFAULT_MIN_INTERVAL = 1.0
+FINAL_RETRIES = 4
+FLUSH_TIMEOUT = 30.0
+
+def status_base_url() -> str:
+    """API server that receives job updates, from JOB_STATUS_URL or the server's PORT"""
+    return (os.environ.get('JOB_STATUS_URL') or f"http://localhost:{os.environ.get('PORT') or 5000}").rstrip('/')
+
+class StatusReporter:
+    """Sends job updates from a background thread, latest update wins
+    
+    Updates arriving faster than min_interval are merged into one PATCH. A final
+    update (completed or error) is sent with retries, and report() waits for it,
+    after which later non-final updates are dropped so the status never regresses.
+    """
+    
+    def __init__(self, job_id: str, base_url: Optional[str] = None, min_interval: Optional[float] = None):
+        self.job_id = job_id
+        self.url = f"{base_url or status_base_url()}/api/jobs/{job_id}"
+        if min_interval is None:
+            min_interval = float(os.environ.get('STATUS_MIN_INTERVAL') or DEFAULT_MIN_INTERVAL)
+        self.min_interval = min_interval
+        
+        self._condition = threading.Condition()
+        self._pending = None
+        self._in_flight = False
+        self._finalized = False
+        self._closed = False
+        # Started by the first report, so a processor that fails to initialize leaves no thread behind
+        self._thread = None
+    
+    def report(self, update: Dict[str, Any], final: bool = False):
+        """Queue an update; final updates block until sent or FLUSH_TIMEOUT passes"""
+        
+        with self._condition:
+            if self._finalized or self._closed:
+                return
+            if self._pending is None:
+                self._pending = {}
+            if 'output_files' in update:
+                # The API replaces output_files wholesale, so merge coalesced file maps
+                update = dict(update, output_files={**self._pending.get('output_files', {}), **update['output_files']})
+            self._pending.update(update)
+            self._finalized = final
+            self._condition.notify_all()
+            
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"status-{self.job_id}", daemon=True)
+                self._thread.start()
+        
+        if final:
+            self.flush()
+    
+    def flush(self, timeout: float = FLUSH_TIMEOUT):
+        """Wait until every queued update has been sent"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._pending is not None or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"Warning: Gave up waiting for status updates of job {self.job_id}")
+                    return
+                self._condition.wait(remaining)
+    
+    def close(self):
+        """Send whatever is still queued and stop the reporter thread"""
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=FLUSH_TIMEOUT)
+    
+    def _run(self):
+        last_sent = 0.0
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                
+                # Hold progress updates back so the ones behind them can be merged in
+                delay = last_sent + self.min_interval - time.monotonic()
+                if delay > 0 and not self._finalized and not self._closed:
+                    self._condition.wait(delay)
+                    continue
+                
+                update = self._pending
+                final = self._finalized
+                self._pending = None
+                self._in_flight = True
+            
+            self._send(update, FINAL_RETRIES if final else 1)
+            last_sent = time.monotonic()
+            
+            with self._condition:
+                self._in_flight = False
+                self._condition.notify_all()
+    
+    def _send(self, update: Dict[str, Any], attempts: int):
+        for attempt in range(attempts):
+            try:
+                response = http_session().patch(self.url, json=update, timeout=10)
+                if response.status_code == 200:
+                    return
+                print(f"Failed to update job status: HTTP {response.status_code}")
+                if response.status_code < 500:
+                    # The job is gone or the update was rejected; retrying will not help
+                    return
+            except Exception as e:
+                print(f"Failed to update job status: {e}")
+            if attempt + 1 < attempts:
+                time.sleep(2 ** attempt)
@@ -0,0 +1,482 @@
+"""
+Work queue for stage tasks
+Lets OCR, narration, speech synthesis and segment encoding run on separate worker nodes
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from pathlib import Path
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+from utils.checkpoint import without_secrets
+
+DEFAULT_LEASE_SECONDS = 120.0
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 0.5
+
+# CPU-bound and API-bound tasks go to separate queues, so encoder nodes and
+# API-calling nodes can be scaled independently
+TASK_QUEUES = {
+    'ocr': 'cpu',
+    'encode': 'cpu',
+    'narration': 'api',
+    'refine': 'api',
+    'tts': 'api',
+}
+
+def _worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+class WorkQueue(ABC):
+    """Durable queue of stage tasks with at-least-once delivery
+    
+    A claimed task is leased to one worker; if the worker does not complete, fail
+    or extend it before the lease runs out, the task is delivered again. Task ids
+    are derived from the job and the slide, so submitting a task twice is a no-op
+    and a job that is resumed picks up the results of tasks that already ran.
+    Handlers must therefore produce the same output when run more than once.
+    
+    Tasks are dicts with id, kind, job_id, payload, attempts and lease_token.
+    """
+    
+    @abstractmethod
+    def put(self, task_id: str, kind: str, queue: str, job_id: str, payload: str):
+        """Queue a task unless it is queued, running or done already"""
+    
+    @abstractmethod
+    def claim(self, queues: List[str], lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        """Lease the oldest queued or expired task of the queues, or return None"""
+    
+    @abstractmethod
+    def extend(self, task: Dict[str, Any], lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        """Push back the end of a task's lease, unless the lease was lost"""
+    
+    @abstractmethod
+    def complete(self, task: Dict[str, Any], result: Dict[str, Any]):
+        """Record a task's result; the first result of a redelivered task stands"""
+    
+    @abstractmethod
+    def fail(self, task: Dict[str, Any], error_message: str):
+        """Give up on one attempt; the task is retried until it has had MAX_ATTEMPTS"""
+    
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """State, result and error of a task, or None if it was never queued"""
+    
+    @abstractmethod
+    def cancel_job(self, job_id: str) -> int:
+        """Withdraw a job's tasks that have not been claimed yet"""
+    
+    @abstractmethod
+    def purge_job(self, job_id: str):
+        """Forget every task of a finished job"""
+    
+    def submit(self, job_id: str, kind: str, key, payload: Dict[str, Any]) -> str:
+        """Queue a stage task of a job, returning its id; API keys are never written to the queue"""
+        if 'config' in payload:
+            payload = dict(payload, config=without_secrets(payload['config']))
+        task_id = f"{job_id}:{kind}:{key}"
+        self.put(task_id, kind, TASK_QUEUES[kind], job_id, json.dumps(payload))
+        return task_id
+    
+    def wait(self, task_id: str, cancellation=None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Block until a task is done and return its result
+        
+        The timeout runs while the task makes no progress, i.e. its state and attempts
+        stay the same. By default it covers every attempt running out its lease, plus one
+        lease of queueing, so a task no worker ever picks up does not hang the job.
+        """
+        if timeout is None:
+            timeout = DEFAULT_LEASE_SECONDS * (MAX_ATTEMPTS + 1)
+        
+        progress = None
+        deadline = time.monotonic() + timeout
+        while True:
+            task = self.get(task_id)
+            if task is None:
+                raise Exception(f"Task {task_id} is not in the work queue")
+            if task['state'] == 'done':
+                return task['result']
+            if task['state'] in ('failed', 'cancelled'):
+                raise Exception(f"Task {task_id} {task['state']}: {task.get('error') or 'no details'}")
+            if (task['state'], task['attempts']) != progress:
+                progress = (task['state'], task['attempts'])
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                raise Exception(f"Task {task_id} timed out after {timeout:.0f}s in state '{task['state']}' "
+                                f"(attempt {task['attempts']} of {MAX_ATTEMPTS})")
+            if cancellation is not None:
+                cancellation.check()
+            time.sleep(POLL_INTERVAL)
+    
+    @contextmanager
+    def leased(self, task: Dict[str, Any], lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        """Keep extending a task's lease while its handler runs"""
+        stop = threading.Event()
+        
+        def renew():
+            while not stop.wait(lease_seconds / 3):
+                try:
+                    self.extend(task, lease_seconds)
+                except Exception as e:
+                    print(f"Warning: Could not extend the lease of task {task['id']}: {e}")
+        
+        thread = threading.Thread(target=renew, name=f"lease-{task['id']}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+class SqliteWorkQueue(WorkQueue):
+    """Work queue in a local SQLite file, shared by the processes of one host"""
+    
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                queue TEXT NOT NULL,
+                job_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_token TEXT,
+                lease_until REAL,
+                worker TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tasks_by_queue ON tasks (queue, state, created_at);
+            CREATE INDEX IF NOT EXISTS tasks_by_job ON tasks (job_id);
+        """)
+    
+    def _connection(self) -> sqlite3.Connection:
+        # Connections cannot be shared between threads, so each thread opens its own
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+    
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+    
+    def put(self, task_id: str, kind: str, queue: str, job_id: str, payload: str):
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT INTO tasks (id, kind, queue, job_id, payload, state, created_at) VALUES (?, ?, ?, ?, ?, 'queued', ?) "
+                "ON CONFLICT (id) DO UPDATE SET payload = excluded.payload, state = 'queued', attempts = 0, "
+                "error = NULL, lease_token = NULL WHERE state IN ('failed', 'cancelled')",
+                (task_id, kind, queue, job_id, payload, time.time())
+            )
+    
+    def claim(self, queues: List[str], lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        placeholders = ", ".join("?" for _ in queues)
+        with self._transaction() as connection:
+            # A task whose workers keep dying with it is not handed out forever
+            connection.execute(
+                f"UPDATE tasks SET state = 'failed', error = 'Task was abandoned by its workers {MAX_ATTEMPTS} times' "
+                f"WHERE queue IN ({placeholders}) AND state = 'leased' AND lease_until < ? AND attempts >= ?",
+                (*queues, now, MAX_ATTEMPTS)
+            )
+            row = connection.execute(
+                f"SELECT * FROM tasks WHERE queue IN ({placeholders}) "
+                "AND (state = 'queued' OR (state = 'leased' AND lease_until < ?)) ORDER BY created_at LIMIT 1",
+                (*queues, now)
+            ).fetchone()
+            if row is None:
+                return None
+            
+            lease_token = uuid.uuid4().hex
+            connection.execute(
+                "UPDATE tasks SET state = 'leased', attempts = attempts + 1, lease_token = ?, lease_until = ?, worker = ? WHERE id = ?",
+                (lease_token, now + lease_seconds, _worker_name(), row['id'])
+            )
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'job_id': row['job_id'],
+            'payload': json.loads(row['payload']),
+            'attempts': row['attempts'] + 1,
+            'lease_token': lease_token,
+        }
+    
+    def extend(self, task: Dict[str, Any], lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET lease_until = ? WHERE id = ? AND state = 'leased' AND lease_token = ?",
+                (time.time() + lease_seconds, task['id'], task['lease_token'])
+            )
+    
+    def complete(self, task: Dict[str, Any], result: Dict[str, Any]):
+        # A redelivered task may finish twice; the outputs are the same, so the first result stands
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET state = 'done', result = ?, error = NULL, lease_token = NULL, lease_until = NULL "
+                "WHERE id = ? AND state != 'done'",
+                (json.dumps(result), task['id'])
+            )
+    
+    def fail(self, task: Dict[str, Any], error_message: str):
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "error = ?, lease_token = NULL, lease_until = NULL "
+                "WHERE id = ? AND state = 'leased' AND lease_token = ?",
+                (MAX_ATTEMPTS, error_message, task['id'], task['lease_token'])
+            )
+    
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT state, attempts, result, error FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'state': row['state'],
+            'attempts': row['attempts'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+        }
+    
+    def cancel_job(self, job_id: str) -> int:
+        with self._transaction() as connection:
+            return connection.execute(
+                "UPDATE tasks SET state = 'cancelled', error = 'Job was cancelled' WHERE job_id = ? AND state = 'queued'",
+                (job_id,)
+            ).rowcount
+    
+    def purge_job(self, job_id: str):
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM tasks WHERE job_id = ?", (job_id,))
+
+# Each script runs atomically on the Redis server, which is what makes claims exclusive.
+# Scripts only touch the keys they are given in KEYS, as Redis Cluster requires.
+_PUT_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state')
+if state == 'queued' or state == 'leased' or state == 'done' then
+    return 0
+end
+redis.call('HDEL', KEYS[1], 'result', 'error', 'lease_token')
+redis.call('HSET', KEYS[1], 'kind', ARGV[2], 'queue', ARGV[3], 'job_id', ARGV[4], 'payload', ARGV[5],
+           'state', 'queued', 'attempts', 0, 'created_at', ARGV[6])
+redis.call('LPUSH', KEYS[2], ARGV[1])
+redis.call('SADD', KEYS[3], ARGV[1])
+return 1
+"""
+
+# Pops the task at the head of the queue, if it is still ARGV[1], and leases it.
+# Returns 1 when leased, 0 when the popped task was cancelled, -1 when the head moved
+_CLAIM_SCRIPT = """
+if redis.call('LINDEX', KEYS[1], -1) ~= ARGV[1] then
+    return -1
+end
+redis.call('RPOP', KEYS[1])
+-- Cancelled tasks are left in the list and skipped here
+if redis.call('HGET', KEYS[2], 'state') ~= 'queued' then
+    return 0
+end
+redis.call('HSET', KEYS[2], 'state', 'leased', 'lease_token', ARGV[3])
+redis.call('HINCRBY', KEYS[2], 'attempts', 1)
+redis.call('ZADD', KEYS[3], ARGV[2], ARGV[1])
+return 1
+"""
+
+_REQUEUE_EXPIRED_SCRIPT = """
+local lease_until = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not lease_until or tonumber(lease_until) > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+if redis.call('HGET', KEYS[2], 'state') ~= 'leased' then
+    return 0
+end
+if tonumber(redis.call('HGET', KEYS[2], 'attempts')) >= tonumber(ARGV[3]) then
+    redis.call('HSET', KEYS[2], 'state', 'failed', 'error', 'Task was abandoned by its workers ' .. ARGV[3] .. ' times')
+else
+    redis.call('HSET', KEYS[2], 'state', 'queued')
+    redis.call('HDEL', KEYS[2], 'lease_token')
+    redis.call('RPUSH', KEYS[3], ARGV[1])
+end
+return 1
+"""
+
+_EXTEND_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'lease_token') == ARGV[2] then
+    redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+end
+return 0
+"""
+
+_COMPLETE_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'state') ~= 'done' then
+    redis.call('HSET', KEYS[1], 'state', 'done', 'result', ARGV[2])
+    redis.call('HDEL', KEYS[1], 'lease_token')
+    redis.call('ZREM', KEYS[2], ARGV[1])
+end
+return 0
+"""
+
+_FAIL_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'state') ~= 'leased' or redis.call('HGET', KEYS[1], 'lease_token') ~= ARGV[2] then
+    return 0
+end
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[1], 'lease_token')
+redis.call('HSET', KEYS[1], 'error', ARGV[3])
+if tonumber(redis.call('HGET', KEYS[1], 'attempts')) >= tonumber(ARGV[4]) then
+    redis.call('HSET', KEYS[1], 'state', 'failed')
+else
+    redis.call('HSET', KEYS[1], 'state', 'queued')
+    redis.call('RPUSH', KEYS[3], ARGV[1])
+end
+return 0
+"""
+
+_CANCEL_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'state') ~= 'queued' then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'state', 'cancelled', 'error', 'Job was cancelled')
+return 1
+"""
+
+class RedisWorkQueue(WorkQueue):
+    """Work queue on a Redis-compatible server, for workers spread over several hosts"""
+    
+    def __init__(self, url: str, prefix: str = "{pptx}:"):
+        try:
+            import redis
+        except ImportError:
+            raise Exception("Redis library not installed. Install with: pip install redis")
+        
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        # The default's hash tag keeps every key in one cluster slot, so scripts may touch several
+        self.prefix = prefix
+        self.leases_key = f"{prefix}leases"
+        self._put = self.client.register_script(_PUT_SCRIPT)
+        self._claim = self.client.register_script(_CLAIM_SCRIPT)
+        self._requeue_expired = self.client.register_script(_REQUEUE_EXPIRED_SCRIPT)
+        self._extend = self.client.register_script(_EXTEND_SCRIPT)
+        self._complete = self.client.register_script(_COMPLETE_SCRIPT)
+        self._fail = self.client.register_script(_FAIL_SCRIPT)
+        self._cancel = self.client.register_script(_CANCEL_SCRIPT)
+    
+    def _task_key(self, task_id: str) -> str:
+        return f"{self.prefix}task:{task_id}"
+    
+    def _queue_key(self, queue: str) -> str:
+        return f"{self.prefix}queue:{queue}"
+    
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}job:{job_id}"
+    
+    def put(self, task_id: str, kind: str, queue: str, job_id: str, payload: str):
+        self._put(
+            keys=[self._task_key(task_id), self._queue_key(queue), self._job_key(job_id)],
+            args=[task_id, kind, queue, job_id, payload, time.time()]
+        )
+    
+    def claim(self, queues: List[str], lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        for task_id in self.client.zrangebyscore(self.leases_key, '-inf', now):
+            queue = self.client.hget(self._task_key(task_id), 'queue')
+            self._requeue_expired(keys=[self.leases_key, self._task_key(task_id), self._queue_key(queue or '')],
+                                  args=[task_id, now, MAX_ATTEMPTS])
+        
+        lease_token = uuid.uuid4().hex
+        for queue in queues:
+            queue_key = self._queue_key(queue)
+            while True:
+                task_id = self.client.lindex(queue_key, -1)
+                if task_id is None:
+                    break
+                claimed = int(self._claim(keys=[queue_key, self._task_key(task_id), self.leases_key],
+                                          args=[task_id, now + lease_seconds, lease_token]))
+                if claimed == 1:
+                    task = self.client.hgetall(self._task_key(task_id))
+                    return {
+                        'id': task_id,
+                        'kind': task['kind'],
+                        'job_id': task['job_id'],
+                        'payload': json.loads(task['payload']),
+                        'attempts': int(task['attempts']),
+                        'lease_token': lease_token,
+                    }
+        return None
+    
+    def extend(self, task: Dict[str, Any], lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self._extend(keys=[self._task_key(task['id']), self.leases_key],
+                     args=[task['id'], task['lease_token'], time.time() + lease_seconds])
+    
+    def complete(self, task: Dict[str, Any], result: Dict[str, Any]):
+        self._complete(keys=[self._task_key(task['id']), self.leases_key], args=[task['id'], json.dumps(result)])
+    
+    def fail(self, task: Dict[str, Any], error_message: str):
+        queue = self.client.hget(self._task_key(task['id']), 'queue')
+        self._fail(keys=[self._task_key(task['id']), self.leases_key, self._queue_key(queue or '')],
+                   args=[task['id'], task['lease_token'], error_message, MAX_ATTEMPTS])
+    
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        task = self.client.hmget(self._task_key(task_id), 'state', 'attempts', 'result', 'error')
+        if task[0] is None:
+            return None
+        return {
+            'state': task[0],
+            'attempts': int(task[1] or 0),
+            'result': json.loads(task[2]) if task[2] else None,
+            'error': task[3],
+        }
+    
+    def cancel_job(self, job_id: str) -> int:
+        return sum(
+            int(self._cancel(keys=[self._task_key(task_id)]))
+            for task_id in self.client.smembers(self._job_key(job_id))
+        )
+    
+    def purge_job(self, job_id: str):
+        job_key = self._job_key(job_id)
+        task_ids = self.client.smembers(job_key)
+        if task_ids:
+            self.client.zrem(self.leases_key, *task_ids)
+            self.client.delete(*[self._task_key(task_id) for task_id in task_ids])
+        self.client.delete(job_key)
+
+def open_work_queue(url: str = None) -> Optional[WorkQueue]:
+    """The queue named by WORK_QUEUE_URL; None runs every stage task inside the job's own process
+    
+    sqlite:///cache/work_queue.sqlite3 is a file on this host, redis://host:6379/0
+    a Redis-compatible server that workers on other hosts can reach.
+    """
+    url = url or os.environ.get('WORK_QUEUE_URL')
+    if not url:
+        return None
+    if url.startswith('sqlite:///'):
+        return SqliteWorkQueue(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisWorkQueue(url)
+    raise ValueError(f"Unsupported work queue URL: {url}")
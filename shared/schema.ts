@@ -8,7 +8,7 @@ export const jobs = pgTable("jobs", {
   id: serial("id").primaryKey(),
   uuid: text("uuid").notNull().unique(),
   filename: text("filename").notNull(),
-  status: text("status", { enum: ['uploading', 'extracting', 'generating_transcript', 'refining_transcript', 'synthesizing_audio', 'embedding_audio', 'converting_pdf', 'rendering_video', 'completed', 'error'] }).notNull(),
+  status: text("status", { enum: ['uploading', 'extracting', 'generating_transcript', 'refining_transcript', 'synthesizing_audio', 'embedding_audio', 'converting_pdf', 'rendering_video', 'completed', 'error', 'cancelled'] }).notNull(),
   progress: integer("progress").default(0).notNull(),
   error_message: text("error_message"),
   created_at: timestamp("created_at").defaultNow().notNull(),
@@ -19,6 +19,11 @@ export const jobs = pgTable("jobs", {
     pdf?: string;
     transcripts_json?: string;
     audio_zip?: string;
+    hls_playlist?: string;
+    audio_m4a?: string;
+    audio_dir?: string;
+    // Extra video renditions, keyed as video_<height>p
+    [rendition: string]: string | undefined;
   }>(),
   config: jsonb("config").$type<{
     tts_provider: string;
@@ -30,7 +35,7 @@ export const jobs = pgTable("jobs", {
 export const processingJobSchema = z.object({
   id: z.string(),
   filename: z.string(),
-  status: z.enum(['uploading', 'extracting', 'generating_transcript', 'refining_transcript', 'synthesizing_audio', 'embedding_audio', 'converting_pdf', 'rendering_video', 'completed', 'error']),
+  status: z.enum(['uploading', 'extracting', 'generating_transcript', 'refining_transcript', 'synthesizing_audio', 'embedding_audio', 'converting_pdf', 'rendering_video', 'completed', 'error', 'cancelled']),
   progress: z.number().min(0).max(100),
   error_message: z.string().optional(),
   created_at: z.string(),
@@ -41,7 +46,10 @@ export const processingJobSchema = z.object({
     pdf: z.string().optional(),
     transcripts_json: z.string().optional(),
     audio_zip: z.string().optional(),
-  }).optional(),
+    hls_playlist: z.string().optional(),
+    audio_m4a: z.string().optional(),
+    audio_dir: z.string().optional(),
+  }).catchall(z.string()).optional(),
 });
 
 // Upload request schema
@@ -55,6 +63,22 @@ export const uploadRequestSchema = z.object({
     stability: z.number().min(0).max(1).optional(),
     similarity_boost: z.number().min(0).max(1).optional(),
   }).optional(),
+  render_profile: z.enum(['draft', 'standard', 'archival']).optional(),
+  output_mode: z.enum(['mp4', 'hls']).optional(),
+  renditions: z.array(z.enum(['1080p', '720p', '480p', 'audio'])).optional(),
+  audio_bundle: z.enum(['eager', 'lazy']).optional(),
+  priority: z.enum(['high', 'normal', 'low']).optional(),
+  previous_job_id: z.string().uuid().optional(),
+  profiling: z.enum(['off', 'deterministic', 'sampling']).optional(),
+  // Decks with more slides than this are processed as parallel shards of this many slides
+  shard_size: z.number().int().min(1).optional(),
+});
+
+// Resume request schema; only the API keys, everything else comes from the checkpoint
+export const resumeRequestSchema = uploadRequestSchema.pick({
+  openai_api_key: true,
+  google_tts_api_key: true,
+  elevenlabs_api_key: true,
 });
 
 // API key validation schema
@@ -67,6 +91,7 @@ export const apiKeyValidationSchema = z.object({
 export type Job = typeof jobs.$inferSelect;
 export type ProcessingJob = z.infer<typeof processingJobSchema>;
 export type UploadRequest = z.infer<typeof uploadRequestSchema>;
+export type ResumeRequest = z.infer<typeof resumeRequestSchema>;
 export type ApiKeyValidation = z.infer<typeof apiKeyValidationSchema>;
 
 // Insert schemas